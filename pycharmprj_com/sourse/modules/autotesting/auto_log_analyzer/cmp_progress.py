@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      cmp_progress.py
+
+    @brief     Содержит ход сравнения логов прогона и признак его отмены
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import time
+
+
+class CmpProgress(object):
+    """Ход сравнения логов прогона (cmp_all_logs): сравнено пар из оценки общего числа и скорость
+
+    Результаты сравнения пар получаются через track: после каждой пары проверяется
+    признак отмены, а ход сравнения учитывается частями по CHUNK_PAIRS (функция хода
+    сравнения вызывается не чаще REPORT_INTERVAL).
+    Общее число пар заранее неизвестно (зависит от того, сколько логов попадет в группы),
+    поэтому оно оценивается заново после каждого лога-представителя (set_total).
+    Отмена кооперативная: сравнение останавливается после текущей пары,
+    уже полученные результаты сохраняются.
+
+    Attributes:
+        CHUNK_PAIRS: число пар, после которого учитывается ход сравнения (advance)
+        REPORT_INTERVAL: минимальный интервал между вызовами функции хода сравнения, с
+        run: директория прогона
+        done: обработано пар
+        total: оценка общего числа пар
+        __callback: функция хода сравнения callback(прогон, обработано пар, оценка числа пар, пар/с)
+        __cancel: признак отмены (threading.Event или None)
+        __start_time: время начала сравнения
+        __report_time: время последнего вызова функции хода сравнения
+
+    """
+
+    CHUNK_PAIRS = 256
+
+    REPORT_INTERVAL = 0.2
+
+    def __init__(self, run, callback=None, cancel=None):
+        """Конструктор класса
+
+        Attributes:
+            :arg run -- Директория прогона
+            :arg callback -- Функция хода сравнения callback(прогон, обработано пар, оценка числа пар, пар/с)
+            :arg cancel -- Признак отмены (threading.Event, None - без отмены)
+
+        """
+        self.run = run
+        self.done = 0
+        self.total = 0
+        self.__callback = callback
+        self.__cancel = cancel
+        self.__start_time = time.perf_counter()
+        self.__report_time = 0.0
+
+    @property
+    def cancelled(self):
+        """Сравнение отменено"""
+        return self.__cancel is not None and self.__cancel.is_set()
+
+    @property
+    def throughput(self):
+        """Скорость сравнения, пар/с"""
+        elapsed = time.perf_counter() - self.__start_time
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def set_total(self, total):
+        """Новая оценка общего числа пар
+
+        Attributes:
+            :arg total -- Оценка общего числа пар (не меньше уже обработанных)
+
+        """
+        self.total = max(int(total), self.done)
+
+    def advance(self, count, force=False):
+        """Учет обработанных пар
+
+        Attributes:
+            :arg count -- Число обработанных пар
+            :arg force -- Вызвать функцию хода сравнения без учета REPORT_INTERVAL
+
+        """
+        self.done += count
+        if self.total < self.done:
+            self.total = self.done
+        self.report(force)
+
+    def report(self, force=False):
+        """Вызов функции хода сравнения
+
+        Attributes:
+            :arg force -- Вызвать без учета REPORT_INTERVAL
+
+        """
+        if not self.__callback:
+            return
+        report_time = time.perf_counter()
+        if not force and report_time - self.__report_time < self.REPORT_INTERVAL:
+            return
+        self.__report_time = report_time
+        self.__callback(self.run, self.done, self.total, self.throughput)
+
+    def track(self, cmp_results):
+        """Получение результатов сравнения с учетом хода сравнения и отмены
+
+        Attributes:
+            :arg cmp_results -- Итератор результатов сравнения пар
+
+        Returns:
+            :return Итератор тех же результатов; завершается досрочно (после текущей пары),
+                    если сравнение отменено
+
+        """
+        chunk_count = 0
+        for cmp_result in cmp_results:
+            yield cmp_result
+            chunk_count += 1
+            if self.cancelled:
+                self.advance(chunk_count, force=True)
+                # Незапущенные части сравнения в пуле процессов отменяются при закрытии итератора
+                if hasattr(cmp_results, 'close'):
+                    cmp_results.close()
+                return
+            if chunk_count == self.CHUNK_PAIRS:
+                self.advance(chunk_count)
+                chunk_count = 0
+        self.advance(chunk_count)
+
+    def to_dict(self):
+        """Состояние хода сравнения
+
+        Returns:
+            :return Словарь: run - прогон, done - обработано пар, total - оценка числа пар,
+                    throughput - пар/с, time - время, с, cancelled - сравнение отменено
+
+        """
+        return {'run': self.run,
+                'done': self.done,
+                'total': self.total,
+                'throughput': self.throughput,
+                'time': time.perf_counter() - self.__start_time,
+                'cancelled': self.cancelled}
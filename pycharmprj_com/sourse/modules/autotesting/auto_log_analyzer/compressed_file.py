@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      compressed_file.py
+
+    @brief     Содержит чтение логов прогонов, сжатых gzip, bz2 или xz, без распаковки на диск
+
+    Сжатый файл определяется по расширению (log_123.log.gz, parse_case_123.txt.xz) и читается
+    потоком через модули стандартной библиотеки: распаковывается только прочитанная часть.
+    Несжатые файлы открываются обычным open.
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import bz2
+import gzip
+import lzma
+
+# Модули распаковки по расширению сжатого файла
+COMPRESSED_EXTENSIONS = {'.gz': gzip,
+                         '.bz2': bz2,
+                         '.xz': lzma,
+                         '.lzma': lzma}
+
+# Расширение лога теста (без расширения сжатия)
+LOG_EXTENSION = '.log'
+
+
+def get_codec(path):
+    """Модуль распаковки файла
+
+    Attributes:
+        :arg path -- Путь до файла
+
+    Returns:
+        :return Модуль (gzip, bz2 или lzma) или None, если файл не сжат
+
+    """
+    for extension, codec in COMPRESSED_EXTENSIONS.items():
+        if path.endswith(extension):
+            return codec
+    return None
+
+
+def is_compressed(path):
+    """Проверка, что файл сжат (по расширению)
+
+    Attributes:
+        :arg path -- Путь до файла
+
+    Returns:
+        :return True, если расширение файла - расширение сжатия
+
+    """
+    return get_codec(path) is not None
+
+
+def strip_extension(path):
+    """Путь без расширения сжатия (log_123.log.gz -> log_123.log)
+
+    Attributes:
+        :arg path -- Путь до файла
+
+    Returns:
+        :return Путь без расширения сжатия (несжатый путь не меняется)
+
+    """
+    for extension in COMPRESSED_EXTENSIONS:
+        if path.endswith(extension):
+            return path[:-len(extension)]
+    return path
+
+
+def is_log_file(path):
+    """Проверка, что файл - лог теста (.log, в том числе сжатый: .log.gz, .log.bz2, .log.xz)
+
+    Attributes:
+        :arg path -- Путь до файла
+
+    Returns:
+        :return True для лога теста
+
+    """
+    return strip_extension(path).endswith(LOG_EXTENSION)
+
+
+def open_file(path, mode='r', fileobj=None, **kwargs):
+    """Открытие файла с распаковкой при чтении
+
+    Attributes:
+        :arg path -- Путь до файла
+        :arg mode -- Режим ('r' - текст, 'rb' - байты)
+        :arg fileobj -- Уже открытый в режиме 'rb' файл path для распаковки (None - открыть по пути);
+                        позиция в нем - число прочитанных сжатых байт
+        :arg kwargs -- Аргументы текстового режима (encoding, errors, newline), как у open
+
+    Returns:
+        :return Открытый файл (поток распаковки для сжатого файла)
+
+    """
+    codec = get_codec(path)
+    if codec is None:
+        return open(path, mode, **kwargs)
+    if 'b' not in mode:
+        mode = mode.replace('t', '') + 't'
+    return codec.open(fileobj if fileobj is not None else path, mode, **kwargs)
+
+
+def is_empty(path):
+    """Проверка, что файл пуст (у сжатого файла - распакованное содержимое)
+
+    Attributes:
+        :arg path -- Путь до файла
+
+    Returns:
+        :return True, если в файле нет данных
+
+    """
+    with open_file(path, 'rb') as data_file:
+        return not data_file.read(1)
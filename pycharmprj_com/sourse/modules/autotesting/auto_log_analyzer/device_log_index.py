@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      device_log_index.py
+
+    @brief     Содержит индекс логов устройства по номеру кейса
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import hashlib
+import os
+import re
+import threading
+import source.modules.autotesting.auto_log_analyzer.compressed_file as compressed_file
+
+
+class DeviceLogIndex(object):
+    """Индекс логов устройства директории прогона: {номер кейса: файл лога устройства}
+
+    Директория просматривается один раз (os.scandir). Номер кейса в имени файла
+    сравнивается целиком: case_12 не совпадает с case_1204, а showcase_12 не считается
+    кейсом 12 (перед case_ не должно быть буквы или цифры). Если кейсу соответствуют
+    несколько файлов, используется первый найденный. Отпечатки и сигнатуры текста
+    логов устройства строятся при первом использовании потоково (файл не читается
+    в память целиком, сжатый файл распаковывается по частям) и кэшируются.
+
+    Attributes:
+        DEVICE_LOG_MARK: признак лога устройства в имени файла
+        dev_log_dir: директория логов устройства
+        __shingles_parser: парсер шинглов (ShinglesParser)
+        __stage_stats: статистика этапов сравнения (StageStats; учитываются прочитанные файлы)
+        __lock: блокировка кэшей
+        __files: словарь {номер кейса: путь до лога устройства}
+        __fingerprints: кэш {номер кейса: отпечаток текста} (None - пустой лог)
+        __signatures: кэш {номер кейса: MinHash сигнатура текста} (None - пустой лог)
+        __hashes: кэш {номер кейса: хэш содержимого лога}
+
+    """
+
+    DEVICE_LOG_MARK = 'parse_'
+
+    __CASE_RE = re.compile(r'(?<![A-Za-z0-9])case_(\d+)(?!\d)')
+
+    def __init__(self, dev_log_dir, shingles_parser, files=None, stage_stats=None):
+        """Конструктор класса
+
+        Attributes:
+            :arg dev_log_dir -- Директория логов устройства
+            :arg shingles_parser -- Парсер шинглов (ShinglesParser)
+            :arg files -- Готовый словарь {номер кейса: путь} (None - просмотреть директорию)
+            :arg stage_stats -- Статистика этапов сравнения (StageStats, None - не учитывать)
+
+        """
+        self.dev_log_dir = dev_log_dir
+        self.__shingles_parser = shingles_parser
+        self.__stage_stats = stage_stats
+        self.__lock = threading.Lock()
+        self.__files = files if files is not None else self.__scan(dev_log_dir)
+        self.__fingerprints = dict()
+        self.__signatures = dict()
+        self.__hashes = dict()
+
+    def __len__(self):
+        return len(self.__files)
+
+    def __scan(self, dev_log_dir):
+        """Просмотр директории логов устройства
+
+        Attributes:
+            :arg dev_log_dir -- Директория логов устройства
+
+        Returns:
+            :return Словарь {номер кейса: путь до лога устройства}
+
+        """
+        files = dict()
+        if not dev_log_dir or not os.path.isdir(dev_log_dir):
+            return files
+        with os.scandir(dev_log_dir) as entries:
+            for entry in entries:
+                if entry.name.find(self.DEVICE_LOG_MARK) == -1:
+                    continue
+                for case_id in self.__CASE_RE.findall(entry.name):
+                    files.setdefault(int(case_id), '%s/%s' % (dev_log_dir, entry.name))
+        return files
+
+    @property
+    def files(self):
+        """Словарь {номер кейса: путь до лога устройства} (для передачи в другие процессы)"""
+        return dict(self.__files)
+
+    def refresh(self):
+        """Повторный просмотр директории: добавляются логи устройства кейсов, которых не было в индексе
+
+        Returns:
+            :return Число добавленных кейсов
+
+        """
+        files = self.__scan(self.dev_log_dir)
+        with self.__lock:
+            added = [case_id for case_id in files if case_id not in self.__files]
+            for case_id in added:
+                self.__files[case_id] = files[case_id]
+                # Для кейса без лога в кэшах могло быть сохранено None
+                for cache in (self.__fingerprints, self.__signatures, self.__hashes):
+                    cache.pop(case_id, None)
+        return len(added)
+
+    def get_path(self, case_id):
+        """Получить путь до лога устройства кейса
+
+        Attributes:
+            :arg case_id -- Номер кейса
+
+        Returns:
+            :return Путь до файла или None, если лог не найден
+
+        """
+        return self.__files.get(case_id)
+
+    def __get_cached(self, cache, case_id, build, skip_empty=True):
+        """Получить значение из кэша или построить его по файлу лога устройства
+
+        Attributes:
+            :arg cache -- Кэш {номер кейса: значение}
+            :arg case_id -- Номер кейса
+            :arg build -- Функция потокового построения значения по пути до файла
+            :arg skip_empty -- Не строить значение для пустого файла
+
+        Returns:
+            :return Значение (None, если лог не найден или пуст и skip_empty)
+
+        """
+        with self.__lock:
+            if case_id in cache:
+                return cache[case_id]
+        path = self.__files.get(case_id)
+        size = os.path.getsize(path) if path else 0
+        value = None
+        # Пустой сжатый файл имеет ненулевой размер: проверяется распакованное содержимое
+        if path and (not skip_empty or size > 0 and not (compressed_file.is_compressed(path) and
+                                                         compressed_file.is_empty(path))):
+            value = build(path)
+        if value is not None and self.__stage_stats and self.__stage_stats.enabled:
+            # Лог устройства читается целиком: прочитан весь файл (у сжатого - все сжатые байты)
+            self.__stage_stats.count(self.__stage_stats.COUNTER_FILES_OPENED)
+            self.__stage_stats.count(self.__stage_stats.COUNTER_BYTES_READ, size)
+        with self.__lock:
+            cache[case_id] = value
+        return value
+
+    def fingerprint(self, case_id):
+        """Получить отпечаток текста лога устройства по шинглам
+
+        Attributes:
+            :arg case_id -- Номер кейса
+
+        Returns:
+            :return Отпечаток (ShingleFingerprint) или None, если лог не найден или пуст
+
+        """
+        return self.__get_cached(self.__fingerprints, case_id, self.__shingles_parser.fingerprint_file)
+
+    def signature(self, case_id):
+        """Получить MinHash сигнатуру текста лога устройства
+
+        Attributes:
+            :arg case_id -- Номер кейса
+
+        Returns:
+            :return Сигнатура (MinHashSignature) или None, если лог не найден или пуст
+
+        """
+        return self.__get_cached(self.__signatures, case_id, self.__shingles_parser.minhash_file)
+
+    def content_hash(self, case_id):
+        """Получить хэш содержимого лога устройства
+
+        Attributes:
+            :arg case_id -- Номер кейса
+
+        Returns:
+            :return Хэш SHA-1 (hex) или None, если лог не найден
+
+        """
+        return self.__get_cached(self.__hashes, case_id, self.__hash_file, skip_empty=False)
+
+    @staticmethod
+    def __hash_file(path):
+        """Хэш содержимого файла (файл читается частями, у сжатого файла - распакованное содержимое)
+
+        Attributes:
+            :arg path -- Путь до файла
+
+        Returns:
+            :return Хэш SHA-1 (hex)
+
+        """
+        digest = hashlib.sha1()
+        with compressed_file.open_file(path, 'rb') as hashed_file:
+            for block in iter(lambda: hashed_file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      fail_prefilter.py
+
+    @brief     Содержит предварительный отбор пар логов по нормализованным FAIL строкам
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import collections
+import re
+
+
+class FailPrefilter(object):
+    """Предварительный отбор пар логов по FAIL строкам
+
+    FAIL строка нормализуется: время, даты, адреса и числа заменяются метками.
+    Логи с одинаковым набором слов нормализованной строки попадают в одну группу.
+    Группы считаются соседними, если их нормализованные строки похожи (сравнение
+    строк LogAnalyzer) не меньше порога neighbour_threshold, который ниже порога
+    отсева по FAIL строке (0.65). Полное сравнение выполняется только для логов
+    одной группы или соседних групп.
+
+    Отбор приближенный: в режиме MODE_AUDIT пропускаемые пары все равно сравниваются,
+    а пары, которые объединились бы в одну группу результата, попадают в отчет.
+
+    Attributes:
+        MODE_FILTER: пропускать пары логов из несоседних групп
+        MODE_AUDIT: сравнивать все пары и сообщать о пропускаемых парах с высоким результатом
+        NEIGHBOUR_THRESHOLD: порог схожести нормализованных строк соседних групп по умолчанию
+        mode: режим работы
+        __cmp_lines: функция сравнения двух строк
+        __neighbour_threshold: порог схожести соседних групп
+        __buckets: словарь {набор слов: список ключей группы}
+        __representatives: словарь {набор слов: нормализованная строка группы}
+        __key_buckets: словарь {ключ: набор слов группы}
+        __neighbours: словарь {набор слов: множество соседних групп} (None - не построен)
+        __neighbour_pairs: число пар соседних групп
+
+    """
+
+    MODE_FILTER = 'filter'
+    MODE_AUDIT = 'audit'
+
+    NEIGHBOUR_THRESHOLD = 0.5
+
+    # Метки нормализации (порядок важен: время и даты заменяются раньше чисел)
+    __MASKS = [(re.compile(r'\d{1,4}[-./]\d{1,2}[-./]\d{1,4}'), '<date>'),
+               (re.compile(r'\d{1,2}:\d{2}(?::\d{2})?(?:[.,]\d+)?'), '<time>'),
+               (re.compile(r'0x[0-9a-f]+'), '<addr>'),
+               (re.compile(r'\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{4,}\b'), '<addr>'),
+               (re.compile(r'\d+'), '<num>')]
+
+    def __init__(self, cmp_lines, mode=MODE_FILTER, neighbour_threshold=NEIGHBOUR_THRESHOLD):
+        """Конструктор класса
+
+        Attributes:
+            :arg cmp_lines -- Функция сравнения двух строк, возвращает процент схожести
+            :arg mode -- Режим работы (MODE_FILTER или MODE_AUDIT)
+            :arg neighbour_threshold -- Порог схожести нормализованных строк соседних групп
+
+        """
+        if mode not in (self.MODE_FILTER, self.MODE_AUDIT):
+            raise ValueError(u'Неизвестный режим префильтра: %s' % str(mode))
+        self.mode = mode
+        self.__cmp_lines = cmp_lines
+        self.__neighbour_threshold = neighbour_threshold
+        self.__buckets = dict()
+        self.__representatives = dict()
+        self.__key_buckets = dict()
+        self.__neighbours = None
+        self.__neighbour_pairs = 0
+
+    def __len__(self):
+        return len(self.__key_buckets)
+
+    @property
+    def audit(self):
+        """Режим проверки: пропускаемые пары сравниваются"""
+        return self.mode == self.MODE_AUDIT
+
+    @classmethod
+    def normalize(cls, line):
+        """Нормализация FAIL строки
+
+        Attributes:
+            :arg line -- FAIL строка
+
+        Returns:
+            :return Строка в нижнем регистре с замененными временем, датами, адресами и числами
+
+        """
+        line = line.lower()
+        for mask_re, mask in cls.__MASKS:
+            line = mask_re.sub(mask, line)
+        return line
+
+    def add(self, key, fail_line):
+        """Добавление лога в группу
+
+        Attributes:
+            :arg key -- Ключ лога
+            :arg fail_line -- FAIL строка лога (логи без FAIL строки не добавляются)
+
+        """
+        if not fail_line:
+            return
+        normalized = self.normalize(fail_line)
+        bucket = tuple(sorted(collections.Counter(normalized.split()).items()))
+        if bucket not in self.__buckets:
+            self.__buckets[bucket] = list()
+            self.__representatives[bucket] = normalized
+        self.__buckets[bucket].append(key)
+        self.__key_buckets[key] = bucket
+        self.__neighbours = None
+
+    def __build_neighbours(self):
+        """Поиск соседних групп (попарное сравнение нормализованных строк групп)"""
+        buckets = list(self.__buckets.keys())
+        self.__neighbours = dict((bucket, set()) for bucket in buckets)
+        self.__neighbour_pairs = 0
+        for first_id, first_bucket in enumerate(buckets):
+            for second_bucket in buckets[first_id + 1:]:
+                first_line = self.__representatives[first_bucket]
+                second_line = self.__representatives[second_bucket]
+                # Сравнение строк несимметрично: берется лучший из двух порядков
+                if (self.__cmp_lines(first_line, second_line) >= self.__neighbour_threshold or
+                        self.__cmp_lines(second_line, first_line) >= self.__neighbour_threshold):
+                    self.__neighbours[first_bucket].add(second_bucket)
+                    self.__neighbours[second_bucket].add(first_bucket)
+                    self.__neighbour_pairs += 1
+
+    def candidates(self, key):
+        """Получить логи, с которыми нужно сравнивать лог
+
+        Attributes:
+            :arg key -- Ключ лога
+
+        Returns:
+            :return Множество ключей логов той же и соседних групп (без самого ключа)
+
+        """
+        bucket = self.__key_buckets.get(key)
+        if bucket is None:
+            return set()
+        if self.__neighbours is None:
+            self.__build_neighbours()
+        result = set(self.__buckets[bucket])
+        for neighbour in self.__neighbours[bucket]:
+            result.update(self.__buckets[neighbour])
+        result.discard(key)
+        return result
+
+    def stats(self):
+        """Статистика групп
+
+        Returns:
+            :return Словарь: число логов, групп, пар соседних групп, пар логов для сравнения
+
+        """
+        if self.__neighbours is None:
+            self.__build_neighbours()
+        sizes = dict((bucket, len(keys)) for bucket, keys in self.__buckets.items())
+        candidate_pairs = sum(size * (size - 1) // 2 for size in sizes.values())
+        candidate_pairs += sum(sizes[bucket] * sizes[neighbour] for bucket, neighbours in self.__neighbours.items()
+                               for neighbour in neighbours) // 2
+        return {'keys': len(self.__key_buckets),
+                'buckets': len(self.__buckets),
+                'neighbour_pairs': self.__neighbour_pairs,
+                'candidate_pairs': candidate_pairs}
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      history_index.py
+
+    @brief     Содержит индекс логов прошлых прогонов для поиска похожих падений
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import array
+import bisect
+import os
+import pickle
+import time
+import source.modules.autotesting.auto_log_analyzer.compressed_file as compressed_file
+import source.modules.autotesting.auto_log_analyzer.fail_prefilter as fail_prefilter
+import source.modules.autotesting.auto_log_analyzer.shingles_parser as shingles_parser
+import source.modules.autotesting.auto_log_analyzer.signature_store as signature_store
+
+
+class HistoryIndex(object):
+    """Индекс логов прошлых прогонов (директорий failed_logs/<номер прогона>)
+
+    Для каждого лога с FAIL строкой хранятся директория прогона, нормализованная
+    FAIL строка (FailPrefilter.normalize) и MinHash сигнатура очищенного текста.
+    Запрос выполняется в три этапа:
+        1. кандидаты - логи с той же нормализованной FAIL строкой и логи, у которых
+           совпала хотя бы одна полоса LSH (метод полос, как в LshIndex);
+        2. кандидаты упорядочиваются: сначала с той же FAIL строкой, затем по оценке
+           коэффициента Жаккара сигнатур; дальше проходят первые rerank;
+        3. итоговый результат - взвешенное сравнение LogAnalyzer.cmp_profiles (как
+           в cmp_log_files) с порогом досрочного завершения по k-му результату.
+    Профили логов при повторном сравнении берутся из хранилищ прогонов (SignatureStore),
+    если они есть.
+
+    Полосы LSH хранятся не словарями, как в LshIndex, а отсортированными массивами
+    хэшей значений полосы (поиск делением пополам): на десятках тысяч логов такие
+    таблицы сохраняются в файл индекса и загружаются без перестроения. Совпадение
+    хэшей разных значений дает лишнего кандидата, но не теряет похожие логи.
+
+    Attributes:
+        FORMAT_VERSION: версия формата файла индекса
+        BANDS: число полос LSH по умолчанию
+        ROWS: число значений сигнатуры в полосе LSH по умолчанию
+        RERANK: число кандидатов, сравниваемых через cmp_profiles, по умолчанию
+        __analyzer: движок сравнения логов (LogAnalyzer)
+        __bands: число полос LSH
+        __rows: число значений сигнатуры в полосе LSH
+        __entries: словарь {путь до лога: (директория прогона, нормализованная FAIL строка, сигнатура)}
+        __paths: отсортированный список путей, на который ссылаются таблицы полос
+        __tables: таблицы полос [(хэши значений полосы, номера путей)] (None - не построены)
+        __unindexed: пути логов с пустой сигнатурой (кандидаты для любого запроса)
+        __fails: словарь {нормализованная FAIL строка: множество путей} (None - не построен)
+        __stores: открытые хранилища прогонов {директория прогона: SignatureStore или None}
+        __query_stats: статистика последнего запроса
+
+    """
+
+    FORMAT_VERSION = 1
+
+    BANDS = 32
+    ROWS = 4
+
+    RERANK = 256
+
+    def __init__(self, analyzer, bands=BANDS, rows=ROWS):
+        """Конструктор класса
+
+        Attributes:
+            :arg analyzer -- Движок сравнения логов (LogAnalyzer)
+            :arg bands -- Число полос LSH
+            :arg rows -- Число значений сигнатуры в полосе LSH
+
+        """
+        self.__analyzer = analyzer
+        self.__bands = bands
+        self.__rows = rows
+        self.__entries = dict()
+        self.__paths = list()
+        self.__tables = None
+        self.__unindexed = list()
+        self.__fails = None
+        self.__stores = dict()
+        self.__query_stats = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    @property
+    def runs(self):
+        """Отсортированный список директорий прогонов в индексе"""
+        return sorted(set(entry[0] for entry in self.__entries.values()))
+
+    def close(self):
+        """Закрытие хранилищ прогонов"""
+        for store in self.__stores.values():
+            if store:
+                store.close()
+        self.__stores.clear()
+
+    def __invalidate(self):
+        """Сброс построенных по записям индексов (после изменения записей)"""
+        self.__tables = None
+        self.__fails = None
+
+    def remove_run(self, run_dir):
+        """Удаление логов прогона из индекса
+
+        Attributes:
+            :arg run_dir -- Директория прогона
+
+        Returns:
+            :return Число удаленных логов
+
+        """
+        run_dir = os.path.abspath(run_dir)
+        removed = [path for path, entry in self.__entries.items() if entry[0] == run_dir]
+        for path in removed:
+            del self.__entries[path]
+        if removed:
+            self.__invalidate()
+        return len(removed)
+
+    def add_run(self, run_dir, store=True):
+        """Добавление (обновление) логов прогона в индексе
+
+        Кэш профилей LogAnalyzer очищается после прогона, чтобы при индексации
+        большого числа прогонов профили не накапливались в памяти.
+
+        Attributes:
+            :arg run_dir -- Директория прогона
+            :arg store -- Брать и сохранять профили в хранилище прогона (SignatureStore)
+
+        Returns:
+            :return Число добавленных логов (с FAIL строкой)
+
+        """
+        run_dir = os.path.abspath(run_dir)
+        if not os.path.isdir(run_dir):
+            raise ValueError(u'Директория %s не найдена' % run_dir)
+        self.remove_run(run_dir)
+        files = [os.path.join(run_dir, file) for file in sorted(os.listdir(run_dir))]
+        files = [file for file in files if os.path.isfile(file) and compressed_file.is_log_file(file)]
+        run_store = signature_store.SignatureStore(run_dir, self.__analyzer.shingles_parser.config) if store else None
+        added = 0
+        try:
+            for file in files:
+                profile = self.__analyzer.get_log_profile(None, file, run_store)
+                if not profile or not profile.fail_line:
+                    continue
+                had_signature = profile.signature is not None
+                self.__entries[file] = (run_dir,
+                                        fail_prefilter.FailPrefilter.normalize(profile.fail_line),
+                                        self.__analyzer.get_log_signature(profile))
+                if run_store and (not run_store.is_current(file) or not had_signature):
+                    run_store.put_profile(file, profile.to_stored())
+                added += 1
+            if run_store:
+                run_store.commit()
+        finally:
+            if run_store:
+                run_store.close()
+            self.__analyzer.clear_log_profiles()
+        # Открытое ранее хранилище прогона могло устареть
+        cached_store = self.__stores.pop(run_dir, None)
+        if cached_store:
+            cached_store.close()
+        self.__invalidate()
+        return added
+
+    def save(self, path):
+        """Сохранение индекса в файл (через временный файл)
+
+        Attributes:
+            :arg path -- Путь до файла индекса
+
+        """
+        self.__build_tables()
+        data = {'version': self.FORMAT_VERSION,
+                'config': self.__analyzer.shingles_parser.config,
+                'bands': self.__bands,
+                'rows': self.__rows,
+                'entries': self.__entries,
+                'paths': self.__paths,
+                'tables': self.__tables,
+                'unindexed': self.__unindexed}
+        tmp_path = '%s.tmp' % path
+        with open(tmp_path, 'wb') as index_file:
+            pickle.dump(data, index_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, analyzer):
+        """Загрузка индекса из файла
+
+        Если файла нет или он построен с другим форматом или параметрами шинглов,
+        возвращается пустой индекс (прогоны нужно добавить заново).
+
+        Attributes:
+            :arg path -- Путь до файла индекса
+            :arg analyzer -- Движок сравнения логов (LogAnalyzer)
+
+        Returns:
+            :return Индекс (HistoryIndex)
+
+        """
+        if not os.path.isfile(path):
+            return cls(analyzer)
+        with open(path, 'rb') as index_file:
+            data = pickle.load(index_file)
+        if data.get('version') != cls.FORMAT_VERSION or data.get('config') != analyzer.shingles_parser.config:
+            return cls(analyzer)
+        index = cls(analyzer, data['bands'], data['rows'])
+        index.__entries = data['entries']
+        index.__paths = data['paths']
+        index.__tables = data['tables']
+        index.__unindexed = data['unindexed']
+        return index
+
+    def __band_hash(self, values, band):
+        """Хэш значений полосы сигнатуры"""
+        return hash(tuple(values[band * self.__rows:(band + 1) * self.__rows]))
+
+    def __build_tables(self):
+        """Построение таблиц полос LSH (при сохранении или первом запросе после изменения записей)"""
+        if self.__tables is not None:
+            return
+        self.__paths = sorted(self.__entries)
+        self.__unindexed = list()
+        indexed = list()
+        for path_id, path in enumerate(self.__paths):
+            signature = self.__entries[path][2]
+            if len(signature) < 1:
+                self.__unindexed.append(path)
+                continue
+            if len(signature) < self.__bands * self.__rows:
+                raise ValueError(u'Длина сигнатуры %d меньше %d полос по %d значений'
+                                 % (len(signature), self.__bands, self.__rows))
+            indexed.append((path_id, signature.values))
+        self.__tables = list()
+        for band in range(self.__bands):
+            band_keys = sorted((self.__band_hash(values, band), path_id) for path_id, values in indexed)
+            self.__tables.append((array.array('q', [band_key[0] for band_key in band_keys]),
+                                  array.array('q', [band_key[1] for band_key in band_keys])))
+
+    def __lsh_candidates(self, signature):
+        """Поиск логов, у которых совпала хотя бы одна полоса сигнатуры
+
+        Attributes:
+            :arg signature -- MinHash сигнатура лога запроса
+
+        Returns:
+            :return Множество путей (для пустой сигнатуры - все пути)
+
+        """
+        self.__build_tables()
+        if len(signature) < 1:
+            return set(self.__paths)
+        result = set(self.__unindexed)
+        values = signature.values
+        for band, (hashes, path_ids) in enumerate(self.__tables):
+            band_hash = self.__band_hash(values, band)
+            position = bisect.bisect_left(hashes, band_hash)
+            while position < len(hashes) and hashes[position] == band_hash:
+                result.add(self.__paths[path_ids[position]])
+                position += 1
+        return result
+
+    def __get_fails(self):
+        """Получить словарь {нормализованная FAIL строка: множество путей}"""
+        if self.__fails is None:
+            self.__fails = dict()
+            for path, entry in self.__entries.items():
+                self.__fails.setdefault(entry[1], set()).add(path)
+        return self.__fails
+
+    def __get_store(self, run_dir):
+        """Получить хранилище прогона (None - у прогона нет хранилища)"""
+        if run_dir not in self.__stores:
+            store = None
+            if os.path.isfile(os.path.join(run_dir, signature_store.SignatureStore.STORE_NAME)):
+                store = signature_store.SignatureStore(run_dir, self.__analyzer.shingles_parser.config)
+            self.__stores[run_dir] = store
+        return self.__stores[run_dir]
+
+    def query(self, file_name, k=10, **kwargs):
+        """Поиск k самых похожих логов прошлых прогонов
+
+        Attributes:
+            :arg file_name -- Путь до лога
+            :arg k -- Число результатов
+            :arg rerank -- Число кандидатов, сравниваемых через cmp_profiles (по умолчанию RERANK)
+            :arg shingles_mode -- Режим сравнения по шинглам (ShinglesParser.MODE_EXACT или MODE_MINHASH)
+
+        Returns:
+            :return Список (путь до лога, процент сходства) по убыванию сходства
+                    (логи с нулевым результатом не включаются, сам лог исключается)
+
+        """
+        rerank = kwargs.get('rerank', self.RERANK)
+        shingles_mode = kwargs.get('shingles_mode', shingles_parser.ShinglesParser.MODE_EXACT)
+        start_time = time.perf_counter()
+        self.__query_stats = {'candidates': 0, 'reranked': 0, 'time': 0.0}
+        file_name = os.path.abspath(file_name)
+        profile = self.__analyzer.get_log_profile(None, file_name)
+        if not profile or not profile.fail_line or k < 1:
+            return list()
+        signature = self.__analyzer.get_log_signature(profile)
+        normalized = fail_prefilter.FailPrefilter.normalize(profile.fail_line)
+        candidates = self.__lsh_candidates(signature) | self.__get_fails().get(normalized, set())
+        candidates.discard(file_name)
+        ranked = sorted(candidates, key=lambda path: (self.__entries[path][1] != normalized,
+                                                      -signature.jaccard(self.__entries[path][2]),
+                                                      path))[:rerank]
+        # Лог устройства запроса ищется в директории его прогона, кандидата - в директории прогона кандидата
+        dev_log_dir = os.path.dirname(file_name)
+        ranking = list()
+        for path in ranked:
+            candidate = self.__analyzer.get_log_profile(None, path, self.__get_store(self.__entries[path][0]))
+            if not candidate:
+                continue
+            # Порог - k-й результат: сравнение, которое не попадет в первые k, прерывается
+            cutoff = -ranking[k - 1][0] if len(ranking) >= k else None
+            result = self.__analyzer.cmp_profiles(profile, candidate, dev_log_dir,
+                                                  second_dev_log_dir=self.__entries[path][0],
+                                                  shingles_mode=shingles_mode, cutoff=cutoff)
+            if result <= 0.0 or (cutoff is not None and result < cutoff):
+                continue
+            bisect.insort(ranking, (-result, path))
+            del ranking[k:]
+        self.__query_stats = {'candidates': len(candidates),
+                              'reranked': len(ranked),
+                              'time': time.perf_counter() - start_time}
+        return [(path, -result) for result, path in ranking]
+
+    def get_query_stats(self):
+        """Статистика последнего запроса
+
+        Returns:
+            :return Словарь: candidates - кандидатов LSH и FAIL строки, reranked - сравнено через
+                    cmp_profiles, time - время запроса, с
+
+        """
+        return dict(self.__query_stats)
@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      job_scheduler.py
+
+    @brief     Содержит очередь заданий анализа прогонов с ходом выполнения и отменой
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import collections
+import os
+import queue
+import threading
+import time
+import traceback
+
+
+class AnalysisJob(object):
+    """Задание анализа (cmp_all_logs, cmp_logs_from_runs или другая функция с ходом выполнения и отменой)
+
+    Функция задания вызывается с аргументами progress (функция хода сравнения
+    progress(прогон, обработано пар, оценка числа пар, пар/с)) и cancel (threading.Event).
+    Ход задания складывается по всем прогонам, о которых сообщила функция.
+
+    Attributes:
+        STATE_QUEUED: задание в очереди
+        STATE_RUNNING: задание выполняется
+        STATE_DONE: задание выполнено
+        STATE_CANCELLED: задание отменено (result - неполный результат или None)
+        STATE_FAILED: задание завершилось с ошибкой (error)
+        job_id: номер задания
+        name: имя задания
+        state: состояние
+        result: результат функции задания
+        error: исключение функции задания
+        cancel_event: признак отмены (передается в функцию как cancel)
+        start_time: время запуска
+        finish_time: время завершения
+        __func: функция задания
+        __args: позиционные аргументы функции
+        __kwargs: именованные аргументы функции
+        __runs: ход по прогонам {прогон: (обработано пар, оценка числа пар, пар/с)}
+        __finished: признак завершения
+        __lock: блокировка хода задания
+
+    """
+
+    STATE_QUEUED = 'queued'
+    STATE_RUNNING = 'running'
+    STATE_DONE = 'done'
+    STATE_CANCELLED = 'cancelled'
+    STATE_FAILED = 'failed'
+
+    def __init__(self, job_id, name, func, args, kwargs):
+        """Конструктор класса
+
+        Attributes:
+            :arg job_id -- Номер задания
+            :arg name -- Имя задания
+            :arg func -- Функция задания (принимает аргументы progress и cancel)
+            :arg args -- Позиционные аргументы функции
+            :arg kwargs -- Именованные аргументы функции
+
+        """
+        self.job_id = job_id
+        self.name = name
+        self.state = self.STATE_QUEUED
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.start_time = None
+        self.finish_time = None
+        self.__func = func
+        self.__args = args
+        self.__kwargs = kwargs
+        self.__runs = collections.OrderedDict()
+        self.__finished = threading.Event()
+        self.__lock = threading.Lock()
+
+    @property
+    def finished(self):
+        """Задание завершено (выполнено, отменено или завершилось с ошибкой)"""
+        return self.__finished.is_set()
+
+    def cancel(self):
+        """Отмена задания: задание из очереди не запускается, выполняемое останавливается после текущей части"""
+        self.cancel_event.set()
+
+    def wait(self, timeout=None):
+        """Ожидание завершения задания
+
+        Attributes:
+            :arg timeout -- Время ожидания, с (None - без ограничения)
+
+        Returns:
+            :return Задание завершено
+
+        """
+        return self.__finished.wait(timeout)
+
+    def set_run_progress(self, run, done, total, throughput):
+        """Учет хода сравнения прогона
+
+        Attributes:
+            :arg run -- Прогон
+            :arg done -- Обработано пар
+            :arg total -- Оценка числа пар
+            :arg throughput -- Скорость, пар/с
+
+        """
+        with self.__lock:
+            self.__runs[run] = (done, total, throughput)
+
+    def progress(self):
+        """Ход задания по всем прогонам
+
+        Returns:
+            :return (обработано пар, оценка числа пар, пар/с)
+
+        """
+        with self.__lock:
+            runs = list(self.__runs.values())
+        return (sum(run[0] for run in runs), sum(run[1] for run in runs), sum(run[2] for run in runs))
+
+    def execute(self, progress):
+        """Выполнение задания в потоке планировщика
+
+        Attributes:
+            :arg progress -- Функция хода сравнения, передаваемая в функцию задания
+
+        """
+        self.start_time = time.perf_counter()
+        if self.cancel_event.is_set():
+            self.state = self.STATE_CANCELLED
+        else:
+            self.state = self.STATE_RUNNING
+            try:
+                self.result = self.__func(*self.__args, progress=progress, cancel=self.cancel_event, **self.__kwargs)
+                self.state = self.STATE_CANCELLED if self.cancel_event.is_set() else self.STATE_DONE
+            except Exception as error:
+                self.error = error
+                self.state = self.STATE_FAILED
+        self.finish_time = time.perf_counter()
+        self.__finished.set()
+
+    def to_dict(self):
+        """Состояние задания
+
+        Returns:
+            :return Словарь: job_id, name, state, done, total, throughput, time - время выполнения, с, error
+
+        """
+        done, total, throughput = self.progress()
+        elapsed = 0.0
+        if self.start_time is not None:
+            elapsed = (self.finish_time or time.perf_counter()) - self.start_time
+        return {'job_id': self.job_id,
+                'name': self.name,
+                'state': self.state,
+                'done': done,
+                'total': total,
+                'throughput': throughput,
+                'time': elapsed,
+                'error': str(self.error) if self.error else None}
+
+
+class JobScheduler(object):
+    """Планировщик заданий анализа прогонов
+
+    Задания ставятся в ограниченную очередь (submit блокируется или выбрасывает queue.Full,
+    когда очередь заполнена) и выполняются потоками планировщика: max_parallel = 1 - по одному,
+    больше 1 - одновременно. Потоков не больше числа ядер, а число процессов сравнения задания
+    (аргумент workers) ограничивается так, чтобы все одновременные задания вместе не занимали
+    больше ядер. Потоки создаются при первой постановке задания.
+
+    Ход заданий и их завершение передаются функциям on_progress(задание) и on_finished(задание),
+    которые вызываются в потоках планировщика (AutoLogParser передает их в сигналы Qt).
+    Исключение этих функций записывается в лог и не останавливает поток планировщика.
+    Хранится не больше history_size завершенных заданий: более старые удаляются
+    из списка заданий при постановке нового.
+
+    Attributes:
+        QUEUE_SIZE: размер очереди заданий по умолчанию
+        HISTORY_SIZE: число хранимых завершенных заданий по умолчанию
+        max_parallel: число одновременно выполняемых заданий
+        __cores: число ядер
+        __queue: очередь заданий
+        __on_progress: функция хода задания
+        __on_finished: функция завершения задания
+        __logger: ссылка на logger (None - вывод через print)
+        __history_size: число хранимых завершенных заданий
+        __jobs: задания {номер: AnalysisJob}
+        __job_count: число поставленных заданий (номер последнего задания)
+        __threads: потоки планировщика
+        __lock: блокировка списка заданий и потоков
+        __closed: планировщик остановлен
+
+    """
+
+    QUEUE_SIZE = 16
+    HISTORY_SIZE = 100
+
+    def __init__(self, max_parallel=None, queue_size=QUEUE_SIZE, on_progress=None, on_finished=None, logger=None,
+                 history_size=HISTORY_SIZE):
+        """Конструктор класса
+
+        Attributes:
+            :arg max_parallel -- Число одновременно выполняемых заданий (None - по числу ядер)
+            :arg queue_size -- Размер очереди заданий
+            :arg on_progress -- Функция хода задания on_progress(задание)
+            :arg on_finished -- Функция завершения задания on_finished(задание)
+            :arg logger -- Ссылка на logger для ошибок функций on_progress и on_finished (None - вывод через print)
+            :arg history_size -- Число хранимых завершенных заданий
+
+        """
+        self.__cores = os.cpu_count() or 1
+        self.max_parallel = max(1, min(max_parallel or self.__cores, self.__cores))
+        self.__queue = queue.Queue(queue_size)
+        self.__on_progress = on_progress
+        self.__on_finished = on_finished
+        self.__logger = logger
+        self.__history_size = max(0, history_size)
+        self.__jobs = collections.OrderedDict()
+        self.__job_count = 0
+        self.__threads = list()
+        self.__lock = threading.Lock()
+        self.__closed = False
+
+    @property
+    def workers_per_job(self):
+        """Число процессов сравнения на одно задание"""
+        return max(1, self.__cores // self.max_parallel)
+
+    def __start_threads(self):
+        """Создание потоков планировщика (при первой постановке задания)"""
+        while len(self.__threads) < self.max_parallel:
+            thread = threading.Thread(target=self.__worker, name='JobScheduler-%d' % len(self.__threads), daemon=True)
+            self.__threads.append(thread)
+            thread.start()
+
+    def __worker(self):
+        """Цикл потока планировщика: выполнение заданий из очереди до остановки"""
+        while True:
+            job = self.__queue.get()
+            try:
+                if job is None:
+                    return
+                job.execute(lambda run, done, total, throughput: self.__report(job, run, done, total, throughput))
+                self.__notify(self.__on_finished, job)
+            finally:
+                self.__queue.task_done()
+
+    def __notify(self, callback, job):
+        """Вызов функции хода или завершения задания (исключение функции записывается в лог)
+
+        Attributes:
+            :arg callback -- Функция (None - не вызывается)
+            :arg job -- Задание
+
+        """
+        if not callback:
+            return
+        try:
+            callback(job)
+        except Exception:
+            message = u'JOB SCHEDULER :: Ошибка обработчика задания %s:\n%s' % (job.name, traceback.format_exc())
+            if self.__logger:
+                self.__logger.info_log(message)
+            else:
+                print(message)
+
+    def __report(self, job, run, done, total, throughput):
+        """Учет хода сравнения прогона задания
+
+        Attributes:
+            :arg job -- Задание
+            :arg run -- Прогон
+            :arg done -- Обработано пар
+            :arg total -- Оценка числа пар
+            :arg throughput -- Скорость, пар/с
+
+        """
+        job.set_run_progress(run, done, total, throughput)
+        self.__notify(self.__on_progress, job)
+
+    def submit(self, name, func, *args, **kwargs):
+        """Постановка задания в очередь
+
+        Attributes:
+            :arg name -- Имя задания
+            :arg func -- Функция задания (принимает аргументы progress и cancel)
+            :arg args -- Позиционные аргументы функции
+            :arg block -- Ждать места в очереди (False - выбросить queue.Full)
+            :arg timeout -- Время ожидания места в очереди, с
+            :arg kwargs -- Именованные аргументы функции (workers ограничивается workers_per_job)
+
+        Returns:
+            :return Задание (AnalysisJob)
+
+        """
+        block = kwargs.pop('block', True)
+        timeout = kwargs.pop('timeout', None)
+        if list(kwargs.keys()).count('workers') != 0:
+            kwargs['workers'] = max(1, min(kwargs['workers'] or 1, self.workers_per_job))
+        with self.__lock:
+            if self.__closed:
+                raise RuntimeError(u'Планировщик заданий остановлен')
+            self.__job_count += 1
+            job = AnalysisJob(self.__job_count, name, func, args, kwargs)
+            finished_ids = [job_id for job_id, finished_job in self.__jobs.items() if finished_job.finished]
+            for job_id in finished_ids[:max(0, len(finished_ids) - self.__history_size)]:
+                del self.__jobs[job_id]
+            self.__jobs[job.job_id] = job
+            self.__start_threads()
+        try:
+            self.__queue.put(job, block, timeout)
+        except queue.Full:
+            with self.__lock:
+                del self.__jobs[job.job_id]
+            raise
+        return job
+
+    def submit_all_logs(self, analyzer, file_dir, **kwargs):
+        """Постановка в очередь сравнения всех логов прогона (cmp_all_logs)
+
+        Attributes:
+            :arg analyzer -- Движок сравнения логов (LogAnalyzer)
+            :arg file_dir -- Директория логов прогона
+            :arg kwargs -- Аргументы cmp_all_logs и submit
+
+        Returns:
+            :return Задание (AnalysisJob)
+
+        """
+        return self.submit(file_dir, analyzer.cmp_all_logs, file_dir, **kwargs)
+
+    def submit_runs(self, analyzer, first_file_dir, second_file_dir, **kwargs):
+        """Постановка в очередь сравнения двух прогонов (cmp_logs_from_runs)
+
+        Attributes:
+            :arg analyzer -- Движок сравнения логов (LogAnalyzer)
+            :arg first_file_dir -- Директория логов первого прогона
+            :arg second_file_dir -- Директория логов второго прогона
+            :arg kwargs -- Аргументы cmp_logs_from_runs и submit
+
+        Returns:
+            :return Задание (AnalysisJob)
+
+        """
+        return self.submit('%s, %s' % (first_file_dir, second_file_dir), analyzer.cmp_logs_from_runs,
+                           first_file_dir, second_file_dir, **kwargs)
+
+    def jobs(self):
+        """Список заданий в порядке постановки (незавершенные и не больше history_size завершенных)
+
+        Returns:
+            :return Список AnalysisJob
+
+        """
+        with self.__lock:
+            return list(self.__jobs.values())
+
+    def cancel(self, job=None):
+        """Отмена задания или всех заданий
+
+        Attributes:
+            :arg job -- Задание (None - все незавершенные задания)
+
+        """
+        jobs = [job] if job else self.jobs()
+        for cancel_job in jobs:
+            if not cancel_job.finished:
+                cancel_job.cancel()
+
+    def wait(self, timeout=None):
+        """Ожидание завершения всех поставленных заданий
+
+        Attributes:
+            :arg timeout -- Время ожидания, с (None - без ограничения)
+
+        Returns:
+            :return Все задания завершены
+
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        for job in self.jobs():
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            if not job.wait(remaining):
+                return False
+        return True
+
+    def shutdown(self, cancel=False):
+        """Остановка планировщика после выполнения поставленных заданий
+
+        Attributes:
+            :arg cancel -- Отменить незавершенные задания
+
+        """
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+            threads = list(self.__threads)
+        if cancel:
+            self.cancel()
+        for _ in threads:
+            self.__queue.put(None)
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,1742 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      log_analyzer.py
+
+    @brief     Содержит класс для автоматического парсинга логов тестов (без зависимости от Qt)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import collections
+import concurrent.futures
+import copy
+import hashlib
+import itertools
+import os
+import re
+import sqlite3
+import time
+import source.modules.autotesting.auto_log_analyzer.cmp_progress as cmp_progress
+import source.modules.autotesting.auto_log_analyzer.compressed_file as compressed_file
+import source.modules.autotesting.auto_log_analyzer.device_log_index as device_log_index
+import source.modules.autotesting.auto_log_analyzer.fail_prefilter as fail_prefilter
+import source.modules.autotesting.auto_log_analyzer.log_profile as log_profile
+import source.modules.autotesting.auto_log_analyzer.log_scanner as log_scanner
+import source.modules.autotesting.auto_log_analyzer.lsh_index as lsh_index
+import source.modules.autotesting.auto_log_analyzer.numpy_line_cmp as numpy_line_cmp
+import source.modules.autotesting.auto_log_analyzer.result_sink as result_sink
+import source.modules.autotesting.auto_log_analyzer.shingles_parser as shingles_parser
+import source.modules.autotesting.auto_log_analyzer.signature_store as signature_store
+import source.modules.autotesting.auto_log_analyzer.stage_stats as stage_stats
+import source.modules.autotesting.auto_log_analyzer.token_vocabulary as token_vocabulary
+from source.modules.autotesting.logger_api import *
+
+
+# Состояние процесса-исполнителя параллельного сравнения (заполняется в _init_cmp_worker)
+_worker_state = dict()
+
+
+def _init_cmp_worker(compact_profiles, dev_log_dir, dev_log_files, shingles_mode, cutoff, collect_stats=False):
+    """Инициализация процесса-исполнителя: профили логов передаются один раз на процесс
+
+    Attributes:
+        :arg compact_profiles -- Список профилей логов в компактной форме (LogProfile.to_compact)
+        :arg dev_log_dir -- Директория логов устройства
+        :arg dev_log_files -- Индекс логов устройства {номер кейса: путь} (DeviceLogIndex.files)
+        :arg shingles_mode -- Режим сравнения по шинглам
+        :arg cutoff -- Порог досрочного завершения сравнения (cmp_profiles)
+        :arg collect_stats -- Собирать статистику этапов (StageStats)
+
+    """
+    _worker_state['parser'] = LogAnalyzer(verbose=False, collect_stats=collect_stats)
+    _worker_state['parser'].get_device_log_index(dev_log_dir, dev_log_files)
+    _worker_state['profiles'] = [log_profile.LogProfile.from_compact(profile) if profile else None
+                                 for profile in compact_profiles]
+    _worker_state['dev_log_dir'] = dev_log_dir
+    _worker_state['shingles_mode'] = shingles_mode
+    _worker_state['cutoff'] = cutoff
+
+
+def _cmp_profiles_worker(pair):
+    """Сравнение пары логов в процессе-исполнителе
+
+    Attributes:
+        :arg pair -- Номера профилей (первый, второй)
+
+    Returns:
+        :return (процент сходства, изменение статистики сравнения get_cmp_stats,
+                 статистика этапов сравнения пары StageStats.to_dict или None, если не собирается)
+
+    """
+    profiles = _worker_state['profiles']
+    parser = _worker_state['parser']
+    cmp_stats = parser.get_cmp_stats()
+    parser.stage_stats.reset()
+    result = parser.cmp_profiles(profiles[pair[0]], profiles[pair[1]], _worker_state['dev_log_dir'],
+                                 shingles_mode=_worker_state['shingles_mode'], cutoff=_worker_state['cutoff'])
+    return (result, dict((key, value - cmp_stats[key]) for key, value in parser.get_cmp_stats().items()),
+            parser.stage_stats.to_dict() if parser.stage_stats.enabled else None)
+
+
+def _cmp_profiles_chunk_worker(pairs):
+    """Сравнение части пар логов в процессе-исполнителе
+
+    Attributes:
+        :arg pairs -- Список номеров профилей [(первый, второй)]
+
+    Returns:
+        :return Список результатов _cmp_profiles_worker в порядке пар
+
+    """
+    return [_cmp_profiles_worker(pair) for pair in pairs]
+
+
+class LogAnalyzer(object):
+    """Класс, предназначенный для автоматического парсинга логов тестов
+
+    Не зависит от Qt: поток Qt (AutoLogParser) и консольный запуск (log_analyzer_cli)
+    используют этот класс. Модули TestRail импортируются только при загрузке логов прогона.
+
+    Attributes:
+        LINE_BACKEND_AUTO: сравнение строк через NumPy, если он установлен
+        LINE_BACKEND_PYTHON: сравнение строк на чистом Python
+        LINE_BACKEND_NUMPY: векторизованное сравнение строк через NumPy
+        NUMPY_MIN_TOKEN_PAIRS: минимальное число пар слов в логах, с которого используется NumPy
+        SAME_LOGS_THRESHOLD: результат сравнения, выше которого логи объединяются в одну группу
+        PENDING_CHUNKS_PER_WORKER: число частей пар в очереди пула процессов на один процесс
+        FAIL_MARKER: признак FAIL строки
+        CONFIG_END_MARKER: признак строки смены настроек
+        __logger: ссылка на logger
+        __verbose: выводить промежуточные результаты сравнения
+        __device_log_indexes: кэш индексов логов устройства {директория: DeviceLogIndex}
+        __numpy_cmp: векторизованное сравнение строк (None - сравнение на чистом Python)
+        __stage_stats: статистика времени и счетчиков этапов сравнения (StageStats)
+
+    """
+
+    LINE_BACKEND_AUTO = 'auto'
+    LINE_BACKEND_PYTHON = 'python'
+    LINE_BACKEND_NUMPY = 'numpy'
+
+    NUMPY_MIN_TOKEN_PAIRS = 256
+
+    SAME_LOGS_THRESHOLD = 0.50
+
+    # Число частей пар в очереди пула процессов на один процесс
+    PENDING_CHUNKS_PER_WORKER = 2
+
+    __CASE_RE = re.compile(r'log_(\d+)$')
+
+    # Запас на погрешность вычислений при сравнении верхней оценки результата с порогом
+    __BOUND_EPSILON = 1e-9
+
+    FAIL_MARKER = 'FAIL'
+    CONFIG_END_MARKER = 'Message code:    2'
+
+    def __init__(self, logger: LoggerApi=None, verbose=True, line_backend=LINE_BACKEND_AUTO, collect_stats=False):
+        """Конструктор класса
+
+        Attributes:
+            :arg logger -- Ссылка на logger
+            :arg verbose -- Выводить промежуточные результаты сравнения (вывод в файл output сохраняется)
+            :arg line_backend -- Способ сравнения строк (LINE_BACKEND_AUTO, LINE_BACKEND_PYTHON или LINE_BACKEND_NUMPY)
+            :arg collect_stats -- Собирать статистику времени и счетчиков этапов сравнения (StageStats)
+
+        """
+        self.__logger = logger
+        self.__stage_stats = stage_stats.StageStats(collect_stats)
+        self.__verbose = verbose
+        self.__shingles_parser = shingles_parser.ShinglesParser(self.__logger)
+        self.__lsh_stats = dict()
+        self.__prefilter_stats = dict()
+        self.__cmp_stats = collections.Counter()
+        self.__progress_stats = dict()
+        self.__log_profiles = dict()
+        self.__device_log_indexes = dict()
+        self.__vocabulary = token_vocabulary.TokenVocabulary(self.__cmp_words)
+        self.__numpy_cmp = None
+        if line_backend == self.LINE_BACKEND_NUMPY or (line_backend == self.LINE_BACKEND_AUTO and numpy_line_cmp.is_available()):
+            self.__numpy_cmp = numpy_line_cmp.NumpyLineComparator(self.__vocabulary)
+
+    def __log_print(self,
+                    log_level,
+                    data,
+                    **kwargs):
+        """Вывод лога с добавлением префикса LOG PARSER в консоль или файл, если logger == None, вывод через print
+
+        Attributes:
+            :arg logger -- Ссылка на logger
+            :arg log_level -- Уровень логирования
+            :arg data -- Выводимые данные
+            :arg output -- Вывод результатов (ResultSink или путь до файла)
+
+        """
+        if list(kwargs.keys()).count('output') != 0:
+            output = kwargs['output']
+            if isinstance(output, result_sink.ResultSink):
+                output.write_text(data)
+            elif output:
+                file = open(output, 'a')
+                file.write(data)
+                file.close()
+        if not self.__verbose:
+            return
+        if not self.__logger:
+            print(data)
+        else:
+            if log_level == LogLevel.INFO:
+                self.__logger.info_log(u'LOG PARSER :: %s %s' % (data, str(kwargs)))
+            elif log_level == LogLevel.DEBUG:
+                self.__logger.debug_log(u'LOG PARSER :: %s %s' % (data, str(kwargs)))
+            else:
+                self.__logger.trace_log(u'LOG PARSER :: %s %s' % (data, str(kwargs)))
+
+    def __write_record(self, record, **kwargs):
+        """Вывод записи результата (JSON Lines) в ResultSink, переданный через output
+
+        Attributes:
+            :arg record -- Запись (словарь)
+            :arg output -- Вывод результатов (ResultSink; путь до файла или None - запись не выводится)
+
+        """
+        output = kwargs.get('output')
+        if isinstance(output, result_sink.ResultSink):
+            output.write_record(record)
+
+    def __cmp_words(self,
+                    first_word,
+                    second_word):
+        """Сравнение слов
+
+        Attributes:
+            :arg first_word -- Первое слово
+            :arg second_word -- Второе слово
+
+        Returns:
+            :return Процент схожести
+
+        """
+        # if type(first_word) != unicode or type(second_word) != unicode:
+        #     self.__log_print(self.__logger, source.modules.logger_api.LogLevel.INFO, u'Получено(ы) слово(а) не в unicode\n')
+        #     return None
+        maxt_word_len = max(len(first_word), len(second_word))
+        same_ch_count = 0
+        cmp_result = float()
+        # print('word_len', len(first_word), len(second_word), maxt_word_len)
+        for first_word_ch, second_word_ch in zip(first_word, second_word):
+            if first_word_ch == second_word_ch:
+                same_ch_count += 1
+        # print('same_ch_count', same_ch_count)
+        cmp_result = float(same_ch_count) / float(maxt_word_len)
+        # print('cmp_result', cmp_result, maxt_word_len - same_ch_count)
+        return (cmp_result, maxt_word_len - same_ch_count)
+
+    def __cmp_lines(self,
+                    first_line,
+                    second_line):
+        """Сравнение строк
+
+        Attributes:
+            :arg first_line -- Первая строка
+            :arg second_line -- Вторая строка
+
+        Returns:
+            :return Процент схожести
+
+        """
+        # if type(first_line) != unicode or type(second_line) != unicode:
+        #     self.__log_print(self.__logger, source.modules.logger_api.LogLevel.INFO, u'Получена(ы) строка(и) не в unicode\n')
+        #     return None
+        # self.__log_print(self.__logger, logger_api.LogLevel.INFO, u'Сравнение строк (%s, %s)\n' % (first_line, second_line))
+        return self.__cmp_line_chunks(self.__vocabulary.intern_counter(collections.Counter(first_line.lower().split())),
+                                      self.__vocabulary.intern_counter(collections.Counter(second_line.lower().split())))
+
+    def __cmp_line_chunks(self,
+                          first_line_chunks,
+                          second_line_chunks):
+        """Сравнение строк, разбитых на слова
+
+        Attributes:
+            :arg first_line_chunks -- Слова первой строки: список (номер слова в словаре, количество)
+            :arg second_line_chunks -- Слова второй строки: список (номер слова в словаре, количество)
+
+        Returns:
+            :return Процент схожести
+
+        """
+        result = float()
+        cmp_ids = self.__vocabulary.cmp_ids
+        intersection_line_buf = dict()
+        for first_line_chunk_key, first_line_chunk_val in first_line_chunks:
+            intersection_line_buf[first_line_chunk_key] = 0.0
+        for second_line_chunk_key, second_line_chunk_val in second_line_chunks:
+            intersection_line_buf[second_line_chunk_key] = 0.0
+        for first_line_chunk_key, first_line_chunk_val in first_line_chunks:
+            for second_line_chunk_key, second_line_chunk_val in second_line_chunks:
+                if first_line_chunk_key == second_line_chunk_key:
+                    # Одинаковые слова: 100% схожести без сравнения
+                    intersection_line_buf[first_line_chunk_key] = float(min(first_line_chunk_val,
+                                                                            second_line_chunk_val)) / max(
+                        first_line_chunk_val, second_line_chunk_val)
+                    continue
+                cmp_words_res = cmp_ids(first_line_chunk_key, second_line_chunk_key)
+                if cmp_words_res[0] > 0.75 and cmp_words_res[1] < 4:
+                    intersection_line_buf[first_line_chunk_key] = float(min(first_line_chunk_val,
+                                                                            second_line_chunk_val)) / max(
+                        first_line_chunk_val, second_line_chunk_val)
+                    if cmp_words_res[0] < 1.0 and second_line_chunk_key in intersection_line_buf:
+                        intersection_line_buf.pop(second_line_chunk_key)
+        # print('line_buf', intersection_line_buf)
+        if len(intersection_line_buf) > 0:
+            result = sum(intersection_line_buf.values())/len(intersection_line_buf)
+        # self.__log_print(self.__logger, logger_api.LogLevel.TRACE, u'Результат сравнения строк %f\n' % result)
+        return result
+
+    def __cmp_line_matches(self,
+                           first_line_chunks,
+                           second_line_chunks,
+                           matches):
+        """Сравнение строк по заранее найденным похожим парам слов (результат NumpyLineComparator)
+
+        Attributes:
+            :arg first_line_chunks -- Слова первой строки: список (номер слова в словаре, количество)
+            :arg second_line_chunks -- Слова второй строки: список (номер слова в словаре, количество)
+            :arg matches -- Похожие пары слов: список (индекс слова 1, индекс слова 2, слова различаются)
+
+        Returns:
+            :return Процент схожести
+
+        """
+        result = float()
+        intersection_line_buf = dict()
+        for first_line_chunk_key, first_line_chunk_val in first_line_chunks:
+            intersection_line_buf[first_line_chunk_key] = 0.0
+        for second_line_chunk_key, second_line_chunk_val in second_line_chunks:
+            intersection_line_buf[second_line_chunk_key] = 0.0
+        for first_index, second_index, partial in matches:
+            first_line_chunk_key, first_line_chunk_val = first_line_chunks[first_index]
+            second_line_chunk_key, second_line_chunk_val = second_line_chunks[second_index]
+            intersection_line_buf[first_line_chunk_key] = float(min(first_line_chunk_val,
+                                                                    second_line_chunk_val)) / max(
+                first_line_chunk_val, second_line_chunk_val)
+            if partial and second_line_chunk_key in intersection_line_buf:
+                intersection_line_buf.pop(second_line_chunk_key)
+        if len(intersection_line_buf) > 0:
+            result = sum(intersection_line_buf.values())/len(intersection_line_buf)
+        return result
+
+    def __find_fail_line(self, lines):
+        """Поиск первой FAIL строки
+
+        Attributes:
+            :arg lines -- Список строк
+
+        Returns:
+            :return Найденная строка
+
+        """
+        result = None
+        line_no = -1
+        for line in lines:
+            line_no += 1
+            fail_line = line.find(self.FAIL_MARKER)
+            if fail_line != -1:
+                result = line[fail_line:].strip('\n\r')
+                break
+        # self.__log_print(self.__logger, logger_api.LogLevel.TRACE,
+        #                  u'Строка найдена: %s (ID %d)\n' % (result, line_no))
+        if not result:
+            return None
+        else:
+            return (result, line_no)
+
+    def __get_config_end(self, lines):
+        """Получить номер первой строки, после смены настроек
+
+        Attributes:
+            :arg lines -- Список строк
+
+        Returns:
+            :return ID строки
+
+        """
+        line_id = 0
+        for line in lines:
+            line_id += 1
+            if line.find(self.CONFIG_END_MARKER) != -1:
+                return line_id
+        return 0
+
+    def __clear_log_tags(self, lines):
+        """Отчистка меток лога (время, дата)
+
+        Attributes:
+            :arg lines -- Список строк
+
+        Returns:
+            :return Отчищенный от меток список
+
+        """
+        line_delimiter = ""
+        lines_buf = list()
+        for line in lines:
+            line_delimiter = line.find('::')
+            if line_delimiter != -1:
+                lines_buf.append(line[line_delimiter:].strip('\n\r'))
+            else:
+                lines_buf.append(line.strip('\n\r'))
+        return lines_buf
+
+    def __get_file_path(self, file_dir, file_name):
+        """Получить путь до файла
+
+        Attributes:
+            :arg file_dir -- Директория файла
+            :arg file_name -- Имя файла
+
+        Returns:
+            :return Путь до файла
+
+        """
+        if file_dir and not file_name.startswith(file_dir):
+            return '%s/%s' % (file_dir, file_name)
+        return file_name
+
+    def __build_log_profile(self, file_name):
+        """Разбор лога теста
+
+        FAIL строка и строка смены настроек ищутся побайтно в отображенном в память файле,
+        декодируется только участок между ними. Если кодировка по умолчанию не позволяет
+        побайтный поиск или файл нельзя отобразить в память, файл читается целиком.
+        Сжатый файл (compressed_file) распаковывается потоком до FAIL строки.
+
+        Attributes:
+            :arg file_name -- Путь до файла
+
+        Returns:
+            :return Профиль лога (LogProfile)
+
+        """
+        self.__stage_stats.count(stage_stats.StageStats.COUNTER_FILES_OPENED)
+        if compressed_file.is_compressed(file_name):
+            return self.__stream_log_profile(file_name)
+        if log_scanner.LogScanner.is_supported():
+            try:
+                with self.__stage_stats.timer(stage_stats.StageStats.STAGE_FILE_IO):
+                    scanner = log_scanner.LogScanner(file_name)
+                with scanner:
+                    return self.__scan_log_profile(file_name, scanner)
+            except (OSError, ValueError):
+                pass
+        return self.__read_log_profile(file_name)
+
+    def __scan_log_profile(self, file_name, scanner):
+        """Разбор лога теста побайтным поиском (LogScanner)
+
+        Attributes:
+            :arg file_name -- Путь до файла
+            :arg scanner -- Открытый LogScanner файла
+
+        Returns:
+            :return Профиль лога (LogProfile)
+
+        """
+        with self.__stage_stats.timer(stage_stats.StageStats.STAGE_FIND_FAIL):
+            fail = scanner.find(self.FAIL_MARKER)
+            config = scanner.find(self.CONFIG_END_MARKER) if fail else None
+        # Просмотрено до конца FAIL строки и строки смены настроек (без FAIL строки или строки
+        # смены настроек - весь файл)
+        self.__stage_stats.count(stage_stats.StageStats.COUNTER_BYTES_READ,
+                                 max(fail[2], config[2] if config else len(scanner)) if fail else len(scanner))
+        if not fail:
+            return log_profile.LogProfile(file_name, self.__get_case_from_filename(file_name), None, -1, 0, list())
+        config_end = config[0] + 1 if config else 0
+        with self.__stage_stats.timer(stage_stats.StageStats.STAGE_FILE_IO):
+            lines = scanner.read_lines(config[2] if config else 0, scanner.line_start(fail[1]))
+        return log_profile.LogProfile(file_name,
+                                      self.__get_case_from_filename(file_name),
+                                      scanner.line_from(fail[1]),
+                                      fail[0],
+                                      config_end,
+                                      self.__clear_log_tags(lines[::-1]))
+
+    def __stream_log_profile(self, file_name):
+        """Разбор сжатого лога теста с потоковой распаковкой
+
+        Строки читаются до первой FAIL строки, остаток файла распаковывается, только если
+        строка смены настроек не найдена до FAIL строки (результат совпадает с __read_log_profile).
+
+        Attributes:
+            :arg file_name -- Путь до файла
+
+        Returns:
+            :return Профиль лога (LogProfile)
+
+        """
+        lines = list()
+        fail = None
+        config_end = None
+        with self.__stage_stats.timer(stage_stats.StageStats.STAGE_FILE_IO):
+            with open(file_name, 'rb') as raw_file, compressed_file.open_file(file_name, fileobj=raw_file) as log_file:
+                for line in log_file:
+                    fail_pos = line.find(self.FAIL_MARKER)
+                    if fail_pos != -1:
+                        fail = (line[fail_pos:].strip('\n\r'), len(lines))
+                        if config_end is None and line.find(self.CONFIG_END_MARKER) != -1:
+                            config_end = len(lines) + 1
+                        break
+                    if config_end is None and line.find(self.CONFIG_END_MARKER) != -1:
+                        config_end = len(lines) + 1
+                    lines.append(line)
+                if fail and config_end is None:
+                    for line_id, line in enumerate(log_file, fail[1] + 2):
+                        if line.find(self.CONFIG_END_MARKER) != -1:
+                            config_end = line_id
+                            break
+                self.__stage_stats.count(stage_stats.StageStats.COUNTER_BYTES_READ, raw_file.tell())
+        if not fail:
+            return log_profile.LogProfile(file_name, self.__get_case_from_filename(file_name), None, -1, 0, list())
+        config_end = config_end or 0
+        return log_profile.LogProfile(file_name,
+                                      self.__get_case_from_filename(file_name),
+                                      fail[0],
+                                      fail[1],
+                                      config_end,
+                                      self.__clear_log_tags(lines[config_end:fail[1]][::-1]))
+
+    def __read_log_profile(self, file_name):
+        """Разбор лога теста с чтением всего файла
+
+        Attributes:
+            :arg file_name -- Путь до файла
+
+        Returns:
+            :return Профиль лога (LogProfile)
+
+        """
+        with self.__stage_stats.timer(stage_stats.StageStats.STAGE_FILE_IO):
+            log_file = open(file_name, 'r')
+            lines = log_file.readlines()
+            log_file.close()
+        self.__stage_stats.count(stage_stats.StageStats.COUNTER_BYTES_READ, os.path.getsize(file_name))
+        with self.__stage_stats.timer(stage_stats.StageStats.STAGE_FIND_FAIL):
+            fail = self.__find_fail_line(lines)
+            config_end = self.__get_config_end(lines) if fail else 0
+        if not fail:
+            return log_profile.LogProfile(file_name, self.__get_case_from_filename(file_name), None, -1, 0, list())
+        return log_profile.LogProfile(file_name,
+                                      self.__get_case_from_filename(file_name),
+                                      fail[0],
+                                      fail[1],
+                                      config_end,
+                                      self.__clear_log_tags(lines[config_end:fail[1]][::-1]))
+
+    @property
+    def shingles_parser(self):
+        """Парсер шинглов (ShinglesParser)"""
+        return self.__shingles_parser
+
+    @property
+    def stage_stats(self):
+        """Статистика времени и счетчиков этапов сравнения (StageStats; включается через enabled)"""
+        return self.__stage_stats
+
+    def get_stage_stats(self):
+        """Статистика этапов сравнения (накопленная с включения или StageStats.reset)
+
+        Returns:
+            :return Словарь в формате StageStats.to_dict
+
+        """
+        return self.__stage_stats.to_dict()
+
+    def get_log_profile(self, file_dir, file_name, store=None, cache=True):
+        """Получить профиль лога теста (из кэша, если файл не изменился)
+
+        Attributes:
+            :arg file_dir -- Директория файла
+            :arg file_name -- Имя файла
+            :arg store -- Постоянное хранилище профилей (SignatureStore), проверяется после кэша в памяти
+            :arg cache -- Сохранить построенный профиль в кэше в памяти
+
+        Returns:
+            :return Профиль лога (LogProfile) или None, если файл не найден
+
+        """
+        if file_dir and not os.path.isdir(file_dir):
+            self.__log_print(LogLevel.INFO, u'Директория %s не найдена\n' % str(file_dir))
+            return None
+        file_name = self.__get_file_path(file_dir, file_name)
+        if not os.path.isfile(file_name):
+            self.__log_print(LogLevel.INFO, u'Файл %s не найден\n' % str(file_name))
+            return None
+        file_stat = os.stat(file_name)
+        profile_key = (file_stat.st_size, file_stat.st_mtime_ns)
+        cached = self.__log_profiles.get(file_name)
+        if cached and cached[0] == profile_key:
+            return cached[1]
+        profile = None
+        if store:
+            try:
+                stored = store.get_profile(file_name)
+            except sqlite3.Error as error:
+                self.__log_print(LogLevel.INFO, u'Ошибка чтения хранилища профилей: %s\n' % str(error))
+                stored = None
+            if stored:
+                profile = log_profile.LogProfile.from_stored(stored)
+        if not profile:
+            profile = self.__build_log_profile(file_name)
+        if cache:
+            self.__log_profiles[file_name] = (profile_key, profile)
+        return profile
+
+    def clear_log_profiles(self):
+        """Очистка кэша профилей логов и индексов логов устройства"""
+        self.__log_profiles.clear()
+        self.__device_log_indexes.clear()
+
+    def get_device_log_index(self, dev_log_dir, files=None):
+        """Получить индекс логов устройства директории (строится один раз и кэшируется)
+
+        Attributes:
+            :arg dev_log_dir -- Директория логов устройства
+            :arg files -- Готовый словарь {номер кейса: путь} (None - просмотреть директорию)
+
+        Returns:
+            :return Индекс (DeviceLogIndex)
+
+        """
+        index = self.__device_log_indexes.get(dev_log_dir)
+        if index is None:
+            index = device_log_index.DeviceLogIndex(dev_log_dir, self.__shingles_parser, files, self.__stage_stats)
+            self.__device_log_indexes[dev_log_dir] = index
+        return index
+
+    def __get_fingerprint(self, profile):
+        """Получить отпечаток текста лога по шинглам
+
+        Attributes:
+            :arg profile -- Профиль лога
+
+        Returns:
+            :return Отпечаток (ShingleFingerprint)
+
+        """
+        if profile.fingerprint is None:
+            profile.fingerprint = self.__shingles_parser.fingerprint(profile.text)
+        return profile.fingerprint
+
+    def __get_token_ids(self, profile):
+        """Получить слова строк лога в виде номеров словаря
+
+        Attributes:
+            :arg profile -- Профиль лога
+
+        Returns:
+            :return (список слов каждой строки, слова FAIL строки) в формате TokenVocabulary.intern_counter
+
+        """
+        if profile.token_ids is None or profile.token_ids[0] is not self.__vocabulary:
+            profile.token_ids = (self.__vocabulary,
+                                 [self.__vocabulary.intern_counter(chunks) for chunks in profile.line_chunks],
+                                 self.__vocabulary.intern_counter(profile.fail_chunks) if profile.fail_chunks else list())
+        return profile.token_ids[1:]
+
+    def __get_signature(self, profile):
+        """Получить MinHash сигнатуру текста лога
+
+        Attributes:
+            :arg profile -- Профиль лога
+
+        Returns:
+            :return Сигнатура (MinHashSignature)
+
+        """
+        if profile.signature is None:
+            profile.signature = self.__shingles_parser.minhash(profile.text)
+        return profile.signature
+
+    def get_log_signature(self, profile):
+        """Получить MinHash сигнатуру текста лога (строится один раз и сохраняется в профиле)
+
+        Attributes:
+            :arg profile -- Профиль лога
+
+        Returns:
+            :return Сигнатура (MinHashSignature)
+
+        """
+        return self.__get_signature(profile)
+
+    def __get_content_hash(self, profile):
+        """Получить хэш FAIL строки и очищенных строк лога (данных лога, от которых зависит сравнение)
+
+        Attributes:
+            :arg profile -- Профиль лога
+
+        Returns:
+            :return Хэш SHA-1 (hex)
+
+        """
+        if profile.content_hash is None:
+            digest = hashlib.sha1()
+            # Строки не содержат символов конца строки, поэтому '\n' однозначно их разделяет
+            digest.update('\n'.join([profile.fail_line or ''] + profile.lines).encode('utf-8', 'surrogatepass'))
+            profile.content_hash = digest.hexdigest()
+        return profile.content_hash
+
+    def __build_dedup_keys(self, files, profiles, dev_log_dir):
+        """Группировка одинаковых логов
+
+        Логи одинаковы, если у них совпадают FAIL строка и очищенные строки, а также
+        содержимое логов устройства (или лог устройства не найден у обоих). Результат
+        сравнения таких логов с любым логом одинаков, поэтому для пары групп он считается
+        один раз. Хэши логов устройства считаются только для логов с совпавшим содержимым.
+
+        Attributes:
+            :arg files -- Список файлов
+            :arg profiles -- Словарь {файл: профиль лога}
+            :arg dev_log_dir -- Директория логов устройства
+
+        Returns:
+            :return Словарь {файл: ключ группы} для логов с FAIL строкой
+
+        """
+        content_files = dict()
+        for file in files:
+            if profiles[file] and profiles[file].fail_line:
+                content_files.setdefault(self.__get_content_hash(profiles[file]), list()).append(file)
+        dev_log_index = self.get_device_log_index(dev_log_dir)
+        dedup_keys = dict()
+        for content_hash, group_files in content_files.items():
+            for file in group_files:
+                if len(group_files) == 1:
+                    dedup_keys[file] = (content_hash,)
+                    continue
+                case_id = profiles[file].case_id
+                dedup_keys[file] = (content_hash, dev_log_index.content_hash(case_id) if case_id and dev_log_dir else None)
+        return dedup_keys
+
+    def __get_case_from_filename(self, file_name):
+        """Получить номер кейса из имени файла лога
+
+        Номер ищется в имени файла (log_<кейс>.log, в том числе сжатого - log_<кейс>.log.gz),
+        поэтому 'log_' в именах директорий не мешает.
+
+        Attributes:
+            :arg file_name -- Имя файла
+
+        Returns:
+            :return Номер кейса (None, если имя файла не содержит номера)
+
+        """
+        search_result = self.__CASE_RE.search(os.path.basename(compressed_file.strip_extension(file_name))[:-4])
+        if not search_result:
+            return None
+        return int(search_result.group(1))
+
+    def cmp_log_files(self,
+                      first_dir,
+                      first_name,
+                      second_dir,
+                      second_name,
+                      **kwargs):
+        """Сравнение двух логов
+
+        Attributes:
+            :arg first_dir -- Директория первого файла
+            :arg first_name -- Имя первого файла
+            :arg second_dir -- Директория второго файла
+            :arg second_name -- Имя второго файла
+            :arg first_fail -- Найденная ранее FAIL строка первого файла (None - строка не найдена)
+            :arg shingles_mode -- Режим сравнения по шинглам (ShinglesParser.MODE_EXACT или MODE_MINHASH)
+
+        Returns:
+            :return Процент сходства
+
+        """
+        if list(kwargs.keys()).count('first_fail') != 0 and not kwargs.pop('first_fail'):
+            return 0.0
+        first_profile = self.get_log_profile(first_dir, first_name)
+        second_profile = self.get_log_profile(second_dir, second_name)
+        if not first_profile or not second_profile:
+            return 0.0
+        return self.cmp_profiles(first_profile, second_profile, first_dir, second_dev_log_dir=second_dir, **kwargs)
+
+    def cmp_profiles(self,
+                     first_profile,
+                     second_profile,
+                     dev_log_dir,
+                     **kwargs):
+        """Сравнение двух логов по их профилям
+
+        Attributes:
+            :arg first_profile -- Профиль первого лога
+            :arg second_profile -- Профиль второго лога
+            :arg dev_log_dir -- Директория логов устройства (первого лога)
+            :arg second_dev_log_dir -- Директория логов устройства второго лога (по умолчанию dev_log_dir)
+            :arg shingles_mode -- Режим сравнения по шинглам (ShinglesParser.MODE_EXACT или MODE_MINHASH)
+            :arg cutoff -- Порог: сравнение строк прерывается, как только результат гарантированно
+                           не превысит порог (None - полное сравнение)
+
+        Returns:
+            :return Процент сходства (точный, если сравнение не прервано; иначе верхняя оценка не выше порога)
+
+        """
+        if not self.__stage_stats.enabled:
+            return self.__cmp_profiles(first_profile, second_profile, dev_log_dir, **kwargs)
+        start_time = time.perf_counter()
+        cmp_result = self.__cmp_profiles(first_profile, second_profile, dev_log_dir, **kwargs)
+        self.__stage_stats.add_pair(time.perf_counter() - start_time, first_profile.path, second_profile.path)
+        return cmp_result
+
+    def __cmp_profiles(self,
+                       first_profile,
+                       second_profile,
+                       dev_log_dir,
+                       **kwargs):
+        """Сравнение двух логов по их профилям (без замера времени пары, параметры cmp_profiles)"""
+        cmp_sum = float()
+        cmp_result = 0.0
+        lines_count = int()
+        shingles_cmp_result = 0.0
+        dev_cmp_result = 0.0
+        shingles_mode = shingles_parser.ShinglesParser.MODE_EXACT
+        if list(kwargs.keys()).count('shingles_mode') != 0:
+            shingles_mode = kwargs['shingles_mode']
+        self.__cmp_stats['pairs'] += 1
+        self.__stage_stats.count(stage_stats.StageStats.COUNTER_PAIRS)
+        if not first_profile.fail_line or not second_profile.fail_line:
+            self.__stage_stats.count(stage_stats.StageStats.COUNTER_FAIL_REJECTED)
+            return cmp_result
+        first_ids = self.__get_token_ids(first_profile)
+        second_ids = self.__get_token_ids(second_profile)
+        fail_cmp = self.__cmp_line_chunks(first_ids[1], second_ids[1])
+        if fail_cmp < 0.65:
+            self.__stage_stats.count(stage_stats.StageStats.COUNTER_FAIL_REJECTED)
+            return cmp_result
+        with self.__stage_stats.timer(stage_stats.StageStats.STAGE_TEXT_SHINGLES):
+            if shingles_mode == shingles_parser.ShinglesParser.MODE_MINHASH:
+                shingles_cmp_result = self.__shingles_parser.cmp_signatures(self.__get_signature(first_profile),
+                                                                            self.__get_signature(second_profile))
+            else:
+                shingles_cmp_result = self.__shingles_parser.cmp_fingerprints(self.__get_fingerprint(first_profile),
+                                                                              self.__get_fingerprint(second_profile))
+        lines_count = min(len(first_profile.lines), len(second_profile.lines))
+        cutoff = kwargs.get('cutoff')
+        if cutoff is not None and lines_count > 0:
+            # Оценка до сравнения логов устройства (самый дорогой этап): логи устройства и строки
+            # совпадают полностью. С нулевым результатом логов устройства оценка та же
+            bound = 1.0 * 0.1 + shingles_cmp_result * 0.2 + fail_cmp * 0.3 + 0.4
+            if bound < cutoff - self.__BOUND_EPSILON:
+                self.__cmp_stats['early_exits'] += 1
+                self.__cmp_stats['skipped_lines'] += lines_count
+                self.__log_print(LogLevel.INFO, u'Сравнение (%s, %s) прервано до логов устройства: результат не превысит %f\n'
+                                 % (first_profile.path, second_profile.path, bound))
+                return bound
+        with self.__stage_stats.timer(stage_stats.StageStats.STAGE_DEVICE_SHINGLES):
+            dev_cmp_result = self.cmp_device_log_files(first_profile.path, second_profile.path, dev_log_dir,
+                                                       second_dev_log_dir=kwargs.get('second_dev_log_dir', dev_log_dir),
+                                                       shingles_mode=shingles_mode)
+        # Верхняя оценка результата: уже известные этапы плюс максимальный вклад оставшихся строк
+        bound_cutoff = None
+        if cutoff is not None and lines_count > 0:
+            if dev_cmp_result == 0.0:
+                bound_fixed = shingles_cmp_result * 0.2 + fail_cmp * 0.3
+                bound_lines_weight = 0.5 / lines_count
+            else:
+                bound_fixed = dev_cmp_result * 0.1 + shingles_cmp_result * 0.2 + fail_cmp * 0.3
+                bound_lines_weight = 0.4 / lines_count
+            bound_cutoff = cutoff - self.__BOUND_EPSILON
+        with self.__stage_stats.timer(stage_stats.StageStats.STAGE_CMP_LINES):
+            if self.__numpy_cmp and sum(len(first_line_chunks) * len(second_line_chunks) for first_line_chunks, second_line_chunks
+                                        in zip(first_ids[0], second_ids[0])) >= self.NUMPY_MIN_TOKEN_PAIRS:
+                line_cmp_results = (self.__cmp_line_matches(first_line_chunks, second_line_chunks, matches)
+                                    for first_line_chunks, second_line_chunks, matches
+                                    in zip(first_ids[0], second_ids[0], self.__numpy_cmp.match_lines(first_ids[0], second_ids[0])))
+            else:
+                line_cmp_results = (self.__cmp_line_chunks(first_line_chunks, second_line_chunks)
+                                    for first_line_chunks, second_line_chunks in zip(first_ids[0], second_ids[0]))
+            for line_id, line_cmp_result in enumerate(line_cmp_results, 1):
+                cmp_sum += line_cmp_result
+                if bound_cutoff is not None:
+                    bound = bound_fixed + (cmp_sum + lines_count - line_id) * bound_lines_weight
+                    if bound < bound_cutoff:
+                        self.__cmp_stats['early_exits'] += 1
+                        self.__cmp_stats['skipped_lines'] += lines_count - line_id
+                        self.__log_print(LogLevel.INFO, u'Сравнение (%s, %s) прервано: результат не превысит %f\n'
+                                         % (first_profile.path, second_profile.path, bound))
+                        return bound
+        if lines_count > 0:
+            if dev_cmp_result == 0.0:
+                cmp_result = (shingles_cmp_result * 0.2 + fail_cmp * 0.3 + (cmp_sum / lines_count) * 0.5)
+            else:
+                cmp_result = (dev_cmp_result * 0.1 + shingles_cmp_result * 0.2 + fail_cmp * 0.3 + (cmp_sum / lines_count) * 0.4)
+        self.__log_print(LogLevel.INFO, u'Результат сравнения (%s, %s): %f\n' % (first_profile.path, second_profile.path, cmp_result))
+        return cmp_result
+
+    def profile_hot_pairs(self, output_dir, count=None, **kwargs):
+        """Повторное сравнение самых долгих пар логов (StageStats.hot_pairs) под cProfile
+
+        Пары сравниваются полностью (без порога), отпечатки и профили логов берутся из кэша,
+        поэтому в замер попадает в основном построчное сравнение. Результат каждой пары
+        сохраняется в файл формата pstats (python -m pstats, snakeviz).
+
+        Attributes:
+            :arg output_dir -- Директория для файлов (создается при необходимости)
+            :arg count -- Число пар (None - все сохраненные)
+            :arg shingles_mode -- Режим сравнения по шинглам (ShinglesParser.MODE_EXACT или MODE_MINHASH)
+
+        Returns:
+            :return Список путей до файлов
+
+        """
+        import cProfile
+        os.makedirs(output_dir, exist_ok=True)
+        paths = list()
+        for pair_id, (elapsed, first_path, second_path) in enumerate(self.__stage_stats.hot_pairs()[:count], 1):
+            first_profile = self.get_log_profile(None, first_path)
+            second_profile = self.get_log_profile(None, second_path)
+            if not first_profile or not second_profile:
+                continue
+            profiler = cProfile.Profile()
+            profiler.runcall(self.__cmp_profiles, first_profile, second_profile, os.path.dirname(first_path), **kwargs)
+            path = os.path.join(output_dir, 'hot_pair_%02d.prof' % pair_id)
+            profiler.dump_stats(path)
+            self.__log_print(LogLevel.INFO, u'Профиль сравнения (%s, %s) (%.4f с): %s\n'
+                             % (first_path, second_path, elapsed, path))
+            paths.append(path)
+        return paths
+
+    def cmp_device_log_files(self,
+                             log_file1,
+                             log_file2,
+                             dev_log_dir,
+                             **kwargs):
+        """Сравнение двух логов устройства (метод Шинглов)
+
+        Attributes:
+            :arg log_file1 -- Путь до первого файла (лог теста)
+            :arg log_file2 -- Путь до второго файла (лог теста)
+            :arg dev_log_dir -- Директория логов устройства (первого файла)
+            :arg second_dev_log_dir -- Директория логов устройства второго файла (по умолчанию dev_log_dir)
+            :arg shingles_mode -- Режим сравнения по шинглам (ShinglesParser.MODE_EXACT или MODE_MINHASH)
+
+        Returns:
+            :return Процент сходства
+
+        """
+        case1 = self.__get_case_from_filename(log_file1)
+        case2 = self.__get_case_from_filename(log_file2)
+
+        second_dev_log_dir = kwargs.get('second_dev_log_dir') or dev_log_dir
+
+        if not case1 or not case2 or not dev_log_dir:
+            return 0.0
+
+        # Первым сравнивается лог устройства второго кейса (как при чтении файлов ранее).
+        # Лог устройства каждого кейса ищется в директории своего прогона
+        dev_log_index = self.get_device_log_index(dev_log_dir)
+        second_dev_log_index = self.get_device_log_index(second_dev_log_dir)
+        if list(kwargs.keys()).count('shingles_mode') != 0 and kwargs['shingles_mode'] == shingles_parser.ShinglesParser.MODE_MINHASH:
+            signature1 = second_dev_log_index.signature(case2)
+            signature2 = dev_log_index.signature(case1)
+            if signature1 is None or signature2 is None:
+                return 0.0
+            shingles_cmp_result = self.__shingles_parser.cmp_signatures(signature1, signature2)
+        else:
+            fingerprint1 = second_dev_log_index.fingerprint(case2)
+            fingerprint2 = dev_log_index.fingerprint(case1)
+            if fingerprint1 is None or fingerprint2 is None:
+                return 0.0
+            shingles_cmp_result = self.__shingles_parser.cmp_fingerprints(fingerprint1, fingerprint2)
+        self.__log_print(LogLevel.INFO, u'Результат сравнения логов устройства по методу Шинглов (%d, %d): %f\n' % (case1, case2, shingles_cmp_result))
+        return shingles_cmp_result
+
+    def __build_lsh_index(self, profiles, bands, rows):
+        """Построение LSH индекса по очищенному тексту логов до FAIL строки
+
+        Attributes:
+            :arg profiles -- Словарь {файл: профиль лога}
+            :arg bands -- Число полос LSH
+            :arg rows -- Число значений сигнатуры в полосе
+
+        Returns:
+            :return Индекс (LshIndex)
+
+        """
+        index = lsh_index.LshIndex(bands, rows)
+        for file, profile in profiles.items():
+            if not profile or not profile.fail_line:
+                continue
+            index.add(file, self.__get_signature(profile))
+        return index
+
+    def get_lsh_stats(self):
+        """Статистика LSH последнего запуска cmp_all_logs
+
+        Returns:
+            :return Словарь статистики (пустой, если LSH не использовался)
+
+        """
+        return dict(self.__lsh_stats)
+
+    def __build_prefilter(self, profiles, mode):
+        """Построение префильтра пар логов по FAIL строкам
+
+        Attributes:
+            :arg profiles -- Словарь {файл: профиль лога}
+            :arg mode -- Режим префильтра (FailPrefilter.MODE_FILTER или MODE_AUDIT)
+
+        Returns:
+            :return Префильтр (FailPrefilter)
+
+        """
+        prefilter = fail_prefilter.FailPrefilter(self.__cmp_lines, mode)
+        for file, profile in profiles.items():
+            if profile:
+                prefilter.add(file, profile.fail_line)
+        return prefilter
+
+    def get_prefilter_stats(self):
+        """Статистика префильтра FAIL строк последнего запуска cmp_all_logs
+
+        Returns:
+            :return Словарь статистики (пустой, если префильтр не использовался)
+
+        """
+        return dict(self.__prefilter_stats)
+
+    def get_cmp_stats(self):
+        """Статистика сравнения пар логов (с последнего запуска cmp_all_logs)
+
+        Returns:
+            :return Словарь: pairs - сравнено пар логов, early_exits - сравнений прервано по порогу,
+                    skipped_lines - пропущено пар строк, duplicate_pairs - пар, результат которых
+                    взят из сравнения одинаковых логов
+
+        """
+        return {'pairs': self.__cmp_stats['pairs'],
+                'early_exits': self.__cmp_stats['early_exits'],
+                'skipped_lines': self.__cmp_stats['skipped_lines'],
+                'duplicate_pairs': self.__cmp_stats['duplicate_pairs']}
+
+    def get_progress_stats(self):
+        """Ход последнего запуска cmp_all_logs
+
+        Returns:
+            :return Словарь CmpProgress.to_dict (пустой, если сравнение не запускалось)
+
+        """
+        return dict(self.__progress_stats)
+
+    def cmp_all_logs(self, file_dir, **kwargs):
+        """Сравнение всех логов в директории
+
+        Attributes:
+            :arg first_dir -- Директория первого файла
+            :arg output -- Файл для вывода результатов (путь или открытый ResultSink)
+            :arg output_format -- Формат файла вывода (ResultSink.FORMAT_TEXT или FORMAT_JSONL)
+            :arg shingles_mode -- Режим сравнения по шинглам (ShinglesParser.MODE_EXACT или MODE_MINHASH)
+            :arg lsh -- Сравнивать только пары-кандидаты из LSH индекса
+            :arg lsh_bands -- Число полос LSH (полнота)
+            :arg lsh_rows -- Число значений сигнатуры в полосе LSH (точность)
+            :arg workers -- Число процессов для параллельного сравнения (1 - последовательно)
+            :arg store -- Сохранять профили логов и результат в хранилище внутри директории (SignatureStore)
+            :arg prefilter -- Режим префильтра пар по FAIL строкам (FailPrefilter.MODE_FILTER или MODE_AUDIT,
+                              None - без префильтра)
+            :arg dedup -- Считать результат сравнения одинаковых логов один раз (по умолчанию True)
+            :arg sort_files -- Сравнивать логи в порядке имен (как ShardedComparison), а не в порядке os.listdir
+            :arg progress -- Функция хода сравнения progress(прогон, обработано пар, оценка числа пар, пар/с)
+            :arg cancel -- Признак отмены (threading.Event): сравнение останавливается после текущей части пар,
+                           возвращается результат по уже сравненным логам (в хранилище не сохраняется)
+
+        Returns:
+            :return Результирующие данные
+
+        """
+        shingles_mode = shingles_parser.ShinglesParser.MODE_EXACT
+        if list(kwargs.keys()).count('shingles_mode') != 0:
+            shingles_mode = kwargs.pop('shingles_mode')
+        use_lsh = kwargs.pop('lsh', False)
+        lsh_bands = kwargs.pop('lsh_bands', lsh_index.LshIndex.BANDS)
+        lsh_rows = kwargs.pop('lsh_rows', lsh_index.LshIndex.ROWS)
+        workers = kwargs.pop('workers', 1)
+        use_store = kwargs.pop('store', False)
+        prefilter_mode = kwargs.pop('prefilter', None)
+        use_dedup = kwargs.pop('dedup', True)
+        sort_files = kwargs.pop('sort_files', False)
+        progress = cmp_progress.CmpProgress(file_dir, kwargs.pop('progress', None), kwargs.pop('cancel', None))
+        output_format = kwargs.pop('output_format', result_sink.ResultSink.FORMAT_TEXT)
+        sink = None
+        if list(kwargs.keys()).count('output') != 0:
+            output = kwargs['output']
+            if output and not isinstance(output, result_sink.ResultSink):
+                if os.path.isfile(output):
+                    os.remove(output)
+                # Файл вывода открыт на все время сравнения, буфер сбрасывается при завершении
+                sink = result_sink.ResultSink(output, output_format)
+                kwargs['output'] = sink
+        try:
+            self.__log_print(LogLevel.INFO, u'Запущено сравнение логов\n', **kwargs)
+            if file_dir:
+                if not os.path.isdir(file_dir):
+                    self.__log_print(LogLevel.INFO, u'Директория %s не найдена\n' % str(file_dir), **kwargs)
+                    return None
+            files = os.listdir(file_dir)
+            if sort_files:
+                files.sort()
+            files = [os.path.join(file_dir, file) for file in files]
+            files = [file for file in files if os.path.isfile(file) and compressed_file.is_log_file(file)]
+            if not files:
+                return None
+            # Логи устройства могли измениться с прошлого запуска: индекс строится заново
+            self.__device_log_indexes.pop(file_dir, None)
+            store = None
+            if use_store:
+                store = self.__open_store(file_dir, **kwargs)
+            try:
+                interim_dict = self.__cmp_dir_files(files, file_dir, store, shingles_mode, use_lsh, lsh_bands, lsh_rows,
+                                                    prefilter_mode, use_dedup, sort_files, workers, progress, **kwargs)
+            finally:
+                if store:
+                    try:
+                        store.close()
+                    except sqlite3.Error as error:
+                        self.__log_print(LogLevel.INFO, u'Ошибка записи хранилища %s: %s\n' % (file_dir, str(error)),
+                                         **kwargs)
+            self.__log_print(LogLevel.INFO, u'Результирующий словарь: (%d) %s\n\n' % (len(interim_dict), interim_dict), **kwargs)
+            for fail_line, cases in interim_dict.items():
+                self.__write_record({'type': 'cluster', 'run': file_dir, 'fail': fail_line, 'cases': list(cases.items())},
+                                    **kwargs)
+            self.__write_record(dict(type='stats', run=file_dir, **self.get_cmp_stats()), **kwargs)
+            self.__progress_stats = progress.to_dict()
+            if progress.cancelled:
+                self.__log_print(LogLevel.INFO, u'Сравнение прервано: обработано пар %d (оценка %d), результат неполный\n'
+                                 % (progress.done, progress.total), **kwargs)
+                self.__write_record(dict(type='cancelled', **self.__progress_stats), **kwargs)
+            if self.__stage_stats.enabled:
+                self.__log_print(LogLevel.INFO, self.__stage_stats.format_summary(), **kwargs)
+                self.__write_record(dict(type='stage_stats', run=file_dir, **self.__stage_stats.to_dict()), **kwargs)
+            return interim_dict
+        finally:
+            if sink:
+                sink.close()
+
+    def __open_store(self, file_dir, **kwargs):
+        """Открыть хранилище профилей и результатов прогона
+
+        Хранилище недоступно, например, если директория прогона только для чтения
+        или база занята другим заданием: тогда сравнение выполняется без него.
+
+        Attributes:
+            :arg file_dir -- Директория прогона
+
+        Returns:
+            :return Хранилище (SignatureStore) или None, если его не удалось открыть
+
+        """
+        try:
+            return signature_store.SignatureStore(file_dir, self.__shingles_parser.config)
+        except (sqlite3.Error, OSError) as error:
+            self.__log_print(LogLevel.INFO, u'Хранилище %s недоступно, сравнение без хранилища: %s\n'
+                             % (file_dir, str(error)), **kwargs)
+            return None
+
+    def __cmp_dir_files(self,
+                        files,
+                        file_dir,
+                        store,
+                        shingles_mode,
+                        use_lsh,
+                        lsh_bands,
+                        lsh_rows,
+                        prefilter_mode,
+                        use_dedup,
+                        sort_files,
+                        workers,
+                        progress,
+                        **kwargs):
+        """Сравнение логов директории (с использованием хранилища профилей, если оно задано)
+
+        Attributes:
+            :arg files -- Список файлов
+            :arg file_dir -- Директория логов
+            :arg store -- Хранилище профилей и результатов (None - без хранилища)
+            :arg shingles_mode -- Режим сравнения по шинглам
+            :arg use_lsh -- Сравнивать только пары-кандидаты из LSH индекса
+            :arg lsh_bands -- Число полос LSH
+            :arg lsh_rows -- Число значений сигнатуры в полосе LSH
+            :arg prefilter_mode -- Режим префильтра пар по FAIL строкам (None - без префильтра)
+            :arg use_dedup -- Считать результат сравнения одинаковых логов один раз
+            :arg sort_files -- Логи сравниваются в порядке имен
+            :arg workers -- Число процессов для параллельного сравнения
+            :arg progress -- Ход сравнения (CmpProgress)
+
+        Returns:
+            :return Результирующие данные
+
+        """
+        profiles = dict()
+        stored_state = dict()
+        for file in files:
+            profiles[file] = self.get_log_profile(None, file, store)
+            if profiles[file]:
+                stored_state[file] = profiles[file].to_stored()
+        # Статистика относится к этому запуску, в том числе когда результат загружен из хранилища
+        self.__lsh_stats = dict()
+        self.__prefilter_stats = dict()
+        self.__cmp_stats.clear()
+        run_key = None
+        if store:
+            # Результат зависит и от логов устройства: их содержимое тоже входит в ключ.
+            # В ключ входят все параметры, от которых зависит результат (порядок логов, отбор пар,
+            # учет одинаковых логов и порог); число процессов и вывод на результат не влияют
+            dev_log_files = sorted(self.get_device_log_index(file_dir).files.values())
+            try:
+                run_key = store.run_key(files + dev_log_files,
+                                        '%s:%s:%d:%d:%s:%s:%s:%r' % (shingles_mode, use_lsh, lsh_bands, lsh_rows,
+                                                                    prefilter_mode, use_dedup, sort_files,
+                                                                    self.SAME_LOGS_THRESHOLD))
+                interim_dict = store.get_result(run_key)
+            except (sqlite3.Error, OSError, ValueError) as error:
+                self.__log_print(LogLevel.INFO, u'Ошибка чтения хранилища %s, сравнение без хранилища: %s\n'
+                                 % (file_dir, str(error)), **kwargs)
+                store = None
+                interim_dict = None
+            if interim_dict is not None:
+                self.__log_print(LogLevel.INFO, u'Результат сравнения загружен из хранилища %s\n' % file_dir, **kwargs)
+                return interim_dict
+
+        index = None
+        if use_lsh:
+            index = self.__build_lsh_index(profiles, lsh_bands, lsh_rows)
+        prefilter = None
+        if prefilter_mode:
+            prefilter = self.__build_prefilter(profiles, prefilter_mode)
+        dedup_keys = None
+        if use_dedup:
+            dedup_keys = self.__build_dedup_keys(files, profiles, file_dir)
+            self.__log_print(LogLevel.INFO, u'Групп одинаковых логов: %d (логов с FAIL строкой %d)\n'
+                             % (len(set(dedup_keys.values())), len(dedup_keys)), **kwargs)
+
+        executor = None
+        file_ids = None
+        if workers and workers > 1:
+            file_ids = dict((file, file_id) for file_id, file in enumerate(files))
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                              initializer=_init_cmp_worker,
+                                                              initargs=([profiles[file].to_compact() if profiles[file] else None
+                                                                         for file in files],
+                                                                        file_dir,
+                                                                        self.get_device_log_index(file_dir).files,
+                                                                        shingles_mode,
+                                                                        self.SAME_LOGS_THRESHOLD,
+                                                                        self.__stage_stats.enabled))
+        try:
+            interim_dict = self.__cmp_seed_files(files, profiles, file_dir, index, prefilter, dedup_keys, executor,
+                                                 file_ids, workers, shingles_mode, progress, **kwargs)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+        if store:
+            try:
+                for file, profile in profiles.items():
+                    # Сохраняются новые профили и профили, для которых построены отпечаток или сигнатура
+                    if profile and (not store.is_current(file) or
+                                    stored_state[file][1] is None and profile.fingerprint is not None or
+                                    stored_state[file][2] is None and profile.signature is not None):
+                        store.put_profile(file, profile.to_stored())
+                # Неполный результат отмененного сравнения не сохраняется
+                if not progress.cancelled:
+                    store.put_result(run_key, interim_dict)
+            except (sqlite3.Error, OSError) as error:
+                self.__log_print(LogLevel.INFO, u'Ошибка записи хранилища %s: %s\n' % (file_dir, str(error)), **kwargs)
+        return interim_dict
+
+    def __count_worker_result(self, worker_result):
+        """Учет результата сравнения из процесса пула в статистике сравнения
+
+        Attributes:
+            :arg worker_result -- Результат _cmp_profiles_worker (процент сходства, изменение статистики сравнения,
+                                  статистика этапов)
+
+        Returns:
+            :return (процент сходства, результат - верхняя оценка прерванного сравнения)
+
+        """
+        self.__cmp_stats.update(worker_result[1])
+        self.__stage_stats.merge(worker_result[2])
+        return (worker_result[0], worker_result[1].get('early_exits', 0) > 0)
+
+    def __cmp_pair_chunks(self, executor, pairs, chunk_size, max_pending):
+        """Сравнение пар логов в пуле процессов частями с ограниченной очередью
+
+        В пул передается не больше max_pending частей одновременно, поэтому при отмене
+        (закрытии итератора) остается дождаться только уже запущенных частей.
+
+        Attributes:
+            :arg executor -- Пул процессов
+            :arg pairs -- Список номеров профилей [(первый, второй)]
+            :arg chunk_size -- Число пар в части
+            :arg max_pending -- Максимальное число частей в очереди пула
+
+        Returns:
+            :return Итератор результатов сравнения (процент сходства, результат - верхняя оценка) в порядке пар
+
+        """
+        pending = collections.deque()
+        try:
+            for chunk_start in range(0, len(pairs), chunk_size):
+                pending.append(executor.submit(_cmp_profiles_chunk_worker, pairs[chunk_start:chunk_start + chunk_size]))
+                if len(pending) >= max_pending:
+                    for cmp_result in pending.popleft().result():
+                        yield self.__count_worker_result(cmp_result)
+            while pending:
+                for cmp_result in pending.popleft().result():
+                    yield self.__count_worker_result(cmp_result)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def __cmp_file_pairs(self,
+                         file,
+                         cmp_files,
+                         profiles,
+                         file_dir,
+                         executor,
+                         file_ids,
+                         workers,
+                         shingles_mode):
+        """Сравнение лога со списком логов
+
+        Attributes:
+            :arg file -- Файл
+            :arg cmp_files -- Список файлов для сравнения
+            :arg profiles -- Словарь {файл: профиль лога}
+            :arg file_dir -- Директория логов (и логов устройства)
+            :arg executor -- Пул процессов (None - последовательное сравнение)
+            :arg file_ids -- Словарь {файл: номер профиля в процессах пула}
+            :arg workers -- Число процессов пула
+            :arg shingles_mode -- Режим сравнения по шинглам
+
+        Returns:
+            :return Итератор результатов сравнения (процент сходства, результат - верхняя оценка прерванного
+                    сравнения) в порядке cmp_files
+
+        """
+        if executor:
+            chunk_size = max(1, min(cmp_progress.CmpProgress.CHUNK_PAIRS, len(cmp_files) // (workers * 4)))
+            return self.__cmp_pair_chunks(executor, [(file_ids[file], file_ids[cmp_file]) for cmp_file in cmp_files],
+                                          chunk_size, workers * self.PENDING_CHUNKS_PER_WORKER)
+        return self.__cmp_pairs(file, cmp_files, profiles, file_dir, shingles_mode)
+
+    def __cmp_pairs(self, file, cmp_files, profiles, file_dir, shingles_mode):
+        """Последовательное сравнение лога со списком логов (параметры __cmp_file_pairs)
+
+        Returns:
+            :return Итератор результатов сравнения (процент сходства, результат - верхняя оценка прерванного
+                    сравнения) в порядке cmp_files
+
+        """
+        for cmp_file in cmp_files:
+            early_exits = self.__cmp_stats['early_exits']
+            cmp_result = self.cmp_profiles(profiles[file], profiles[cmp_file], file_dir, shingles_mode=shingles_mode,
+                                           cutoff=self.SAME_LOGS_THRESHOLD)
+            yield (cmp_result, self.__cmp_stats['early_exits'] != early_exits)
+
+    def __cmp_seed_files(self,
+                         files,
+                         profiles,
+                         file_dir,
+                         index,
+                         prefilter,
+                         dedup_keys,
+                         executor,
+                         file_ids,
+                         workers,
+                         shingles_mode,
+                         progress,
+                         **kwargs):
+        """Сравнение каждого еще не сгруппированного лога со всеми последующими
+
+        Attributes:
+            :arg files -- Список файлов
+            :arg profiles -- Словарь {файл: профиль лога}
+            :arg file_dir -- Директория логов (и логов устройства)
+            :arg index -- LSH индекс (None - сравнивать все пары)
+            :arg prefilter -- Префильтр по FAIL строкам (None - без префильтра)
+            :arg dedup_keys -- Словарь {файл: ключ группы одинаковых логов} (None - без группировки)
+            :arg executor -- Пул процессов (None - последовательное сравнение)
+            :arg file_ids -- Словарь {файл: номер профиля в процессах пула}
+            :arg workers -- Число процессов пула
+            :arg shingles_mode -- Режим сравнения по шинглам
+            :arg progress -- Ход сравнения (CmpProgress)
+
+        Returns:
+            :return Результирующие данные
+
+        """
+        cmp_result_dict = dict()
+        cmp_case_dict = dict()
+        interim_dict = dict()
+        files_without_cmp = list()
+        all_cmp_files = list()
+        cmp_file_count = 1
+        compared_pairs = 0
+        pruned_pairs = 0
+        prefiltered_pairs = 0
+        lost_pairs = list()
+        grouped_files = set()
+        # Результаты сравнения пар групп одинаковых логов {(ключ группы 1, ключ группы 2): результат}
+        dedup_results = dict()
+        same_file_flag = False
+        progress.set_total(len(files) * (len(files) - 1) // 2)
+        progress.report(True)
+        for file_position, file in enumerate(files):
+            if progress.cancelled:
+                break
+            # print self.__get_case_from_filename(file)
+            for cmp_item in all_cmp_files:
+                if file == cmp_item:
+                    same_file_flag = True
+                    break
+            if same_file_flag:
+                same_file_flag = False
+                continue
+
+            files_without_cmp = files[cmp_file_count:]
+            cmp_file_count += 1
+            row_pairs = len(files_without_cmp)
+            row_start = progress.done
+            first_fail = profiles[file].fail if profiles[file] else None
+            if first_fail:
+                self.__log_print(LogLevel.INFO, u'Найденная ошибка: %s\n' % first_fail[0], **kwargs)
+            cmp_result_dict.update({file : 1.0})
+            cmp_case_dict.update({self.__get_case_from_filename(file): 1.0})
+            candidates = index.candidates(file) if index else None
+            prefilter_candidates = prefilter.candidates(file) if prefilter else None
+            prefiltered_files = set()
+            cmp_files = list()
+            for file_without_cmp in files_without_cmp:
+                # Лог может оказаться в списке сравнения с самим собой: такая пара не отсеивается
+                if candidates is not None and file_without_cmp != file and file_without_cmp not in candidates:
+                    pruned_pairs += 1
+                    continue
+                if (prefilter_candidates is not None and file_without_cmp != file and
+                        file_without_cmp not in prefilter_candidates):
+                    prefiltered_pairs += 1
+                    if not prefilter.audit:
+                        continue
+                    prefiltered_files.add(file_without_cmp)
+                compared_pairs += 1
+                if profiles[file] and profiles[file_without_cmp]:
+                    cmp_files.append(file_without_cmp)
+            if dedup_keys is not None:
+                # Сравниваются только пары групп, результат для которых еще не известен
+                pair_keys = [(dedup_keys.get(file, file), dedup_keys.get(cmp_file, cmp_file)) for cmp_file in cmp_files]
+                new_pairs = dict()
+                for cmp_file, pair_key in zip(cmp_files, pair_keys):
+                    if pair_key not in dedup_results and pair_key not in new_pairs:
+                        new_pairs[pair_key] = cmp_file
+                self.__cmp_stats['duplicate_pairs'] += len(cmp_files) - len(new_pairs)
+                dedup_results.update(zip(new_pairs.keys(),
+                                         progress.track(self.__cmp_file_pairs(file, list(new_pairs.values()), profiles,
+                                                                              file_dir, executor, file_ids, workers,
+                                                                              shingles_mode))))
+                # При отмене берутся результаты до первой несравненной пары
+                cmp_results = itertools.takewhile(lambda cmp_result: cmp_result is not None,
+                                                  (dedup_results.get(pair_key) for pair_key in pair_keys))
+            else:
+                cmp_results = progress.track(self.__cmp_file_pairs(file, cmp_files, profiles, file_dir, executor,
+                                                                   file_ids, workers, shingles_mode))
+            for file_without_cmp, (cmp_logs_res, bounded) in zip(cmp_files, cmp_results):
+                pair_record = {'type': 'pair',
+                               'run': file_dir,
+                               'first_case': profiles[file].case_id,
+                               'second_case': profiles[file_without_cmp].case_id,
+                               'first_file': os.path.basename(file),
+                               'second_file': os.path.basename(file_without_cmp)}
+                if bounded:
+                    # Сравнение прервано по порогу: известна только верхняя оценка результата
+                    pair_record.update({'bounded': True, 'bound': cmp_logs_res})
+                else:
+                    pair_record['score'] = cmp_logs_res
+                self.__write_record(pair_record, **kwargs)
+                if cmp_logs_res > self.SAME_LOGS_THRESHOLD and file_without_cmp in prefiltered_files:
+                    lost_pairs.append((file, file_without_cmp, cmp_logs_res))
+                    self.__log_print(LogLevel.INFO, u'Префильтр пропустил бы пару (%s, %s) с результатом %f\n'
+                                     % (file, file_without_cmp, cmp_logs_res), **kwargs)
+                if cmp_logs_res > self.SAME_LOGS_THRESHOLD:
+                    cmp_result_dict.update({file_without_cmp : cmp_logs_res})
+                    cmp_case_dict.update({self.__get_case_from_filename(file_without_cmp): cmp_logs_res})
+                    all_cmp_files.append(file_without_cmp)
+                    grouped_files.add(file_without_cmp)
+            if not first_fail:
+                first_fail = (u'unrecognized',)
+            if cmp_case_dict and len(cmp_case_dict) > 0:
+                # interim_dict.update({u'%d %s' % (cmp_file_count, first_fail[0]) : copy.deepcopy(cmp_case_dict)})
+                interim_dict.update({first_fail[0]: copy.deepcopy(cmp_case_dict)})
+            self.__log_print(LogLevel.INFO, u'Результат сравнения: (%d) %s\n\n' % (len(cmp_case_dict), cmp_case_dict), **kwargs)
+            cmp_result_dict.clear()
+            cmp_case_dict.clear()
+            if not progress.cancelled:
+                # Оценка числа оставшихся пар: доля логов-представителей среди уже распределенных логов
+                # переносится на оставшиеся несгруппированные логи
+                seeds_count = cmp_file_count - 1
+                ungrouped_count = sum(1 for next_file in files[file_position + 1:] if next_file not in grouped_files)
+                remaining_seeds = ungrouped_count * float(seeds_count) / (seeds_count + len(grouped_files))
+                progress.advance(row_pairs - (progress.done - row_start))
+                progress.set_total(progress.done + remaining_seeds * max(0.0, len(files) - seeds_count - remaining_seeds / 2))
+        if not progress.cancelled:
+            progress.set_total(progress.done)
+        progress.report(True)
+        if index:
+            self.__lsh_stats = index.stats()
+            self.__lsh_stats.update({'compared_pairs': compared_pairs, 'skipped_pairs': pruned_pairs})
+            self.__log_print(LogLevel.INFO, u'Статистика LSH: сравнено пар %d, отсеяно пар %d (кандидатов в индексе %d из %d, порог %.2f)\n'
+                             % (compared_pairs, pruned_pairs, self.__lsh_stats['candidate_pairs'],
+                                self.__lsh_stats['total_pairs'], self.__lsh_stats['threshold']), **kwargs)
+        self.__log_print(LogLevel.INFO, u'Сравнение пар логов: сравнено %d, прервано по порогу %d (пропущено пар строк %d), '
+                                        u'взято из сравнения одинаковых логов %d\n'
+                         % (self.__cmp_stats['pairs'], self.__cmp_stats['early_exits'], self.__cmp_stats['skipped_lines'],
+                            self.__cmp_stats['duplicate_pairs']),
+                         **kwargs)
+        if prefilter:
+            self.__prefilter_stats = prefilter.stats()
+            self.__prefilter_stats.update({'mode': prefilter.mode, 'skipped_pairs': prefiltered_pairs,
+                                           'lost_pairs': lost_pairs})
+            self.__log_print(LogLevel.INFO, u'Статистика префильтра: групп FAIL строк %d, соседних пар групп %d, '
+                                            u'пропущено пар %d%s\n'
+                             % (self.__prefilter_stats['buckets'], self.__prefilter_stats['neighbour_pairs'],
+                                prefiltered_pairs,
+                                u' (режим проверки, потеряно пар %d)' % len(lost_pairs) if prefilter.audit else u''),
+                             **kwargs)
+        return interim_dict
+
+    def cmp_logs_from_runs(self, first_file_dir, second_file_dir, **kwargs):
+        """Сравнение всех логов в указанных директориях и сравнение между собой
+
+        Attributes:
+            :arg first_file_dir -- Первая сравниваемая директория (более ранний прогон)
+            :arg second_file_dir -- вторая сравниваемая директория
+            :arg shingles_mode -- Режим сравнения по шинглам (ShinglesParser.MODE_EXACT или MODE_MINHASH)
+            :arg workers -- Число процессов для параллельного сравнения (прогоны анализируются одновременно)
+            :arg store -- Использовать хранилище профилей и результатов в директориях прогонов (SignatureStore)
+            :arg prefilter -- Режим префильтра пар по FAIL строкам (FailPrefilter.MODE_FILTER или MODE_AUDIT)
+            :arg output_format -- Формат файлов вывода (ResultSink.FORMAT_TEXT или FORMAT_JSONL)
+            :arg progress -- Функция хода сравнения progress(прогон, обработано пар, оценка числа пар, пар/с)
+            :arg cancel -- Признак отмены (threading.Event): неполные результаты прогонов остаются
+                           в файлах вывода, сравнение прогонов между собой не выполняется
+
+        Статистика сравнения (get_cmp_stats, stage_stats) складывается по обоим прогонам,
+        статистика LSH, префильтра и хода сравнения - второго прогона.
+
+        Returns:
+            :return Результирующие данные
+
+        """
+        first_output = None
+        second_output = None
+        cmp_output = None
+        shingles_mode = shingles_parser.ShinglesParser.MODE_EXACT
+        if list(kwargs.keys()).count('shingles_mode') != 0:
+            shingles_mode = kwargs['shingles_mode']
+        if list(kwargs.keys()).count('first_output') != 0:
+            first_output = kwargs['first_output']
+            second_output = kwargs['second_output']
+            cmp_output = kwargs['cmp_output']
+        workers = kwargs.get('workers', 1)
+        use_store = kwargs.get('store', False)
+        prefilter_mode = kwargs.get('prefilter', None)
+        output_format = kwargs.get('output_format', result_sink.ResultSink.FORMAT_TEXT)
+        progress = kwargs.get('progress', None)
+        cancel = kwargs.get('cancel', None)
+        if workers and workers > 1:
+            # Прогоны анализируются одновременно, процессы делятся между ними поровну. Второй прогон
+            # сравнивается отдельным движком: статистика и индексы cmp_all_logs не общие для двух потоков
+            second_analyzer = LogAnalyzer(self.__logger, self.__verbose,
+                                          self.LINE_BACKEND_NUMPY if self.__numpy_cmp else self.LINE_BACKEND_PYTHON,
+                                          self.__stage_stats.enabled)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as run_executor:
+                first_future = run_executor.submit(self.cmp_all_logs, first_file_dir, output=first_output,
+                                                   shingles_mode=shingles_mode, workers=max(1, workers // 2),
+                                                   store=use_store, prefilter=prefilter_mode, output_format=output_format,
+                                                   progress=progress, cancel=cancel)
+                second_future = run_executor.submit(second_analyzer.cmp_all_logs, second_file_dir, output=second_output,
+                                                    shingles_mode=shingles_mode, workers=max(1, workers - workers // 2),
+                                                    store=use_store, prefilter=prefilter_mode, output_format=output_format,
+                                                    progress=progress, cancel=cancel)
+                first_dict = first_future.result()
+                second_dict = second_future.result()
+            self.__cmp_stats.update(second_analyzer.__cmp_stats)
+            self.__stage_stats.merge(second_analyzer.__stage_stats.to_dict())
+            self.__lsh_stats = second_analyzer.get_lsh_stats()
+            self.__prefilter_stats = second_analyzer.get_prefilter_stats()
+            self.__progress_stats = second_analyzer.get_progress_stats()
+        else:
+            first_dict = self.cmp_all_logs(first_file_dir, output=first_output, shingles_mode=shingles_mode, store=use_store,
+                                           prefilter=prefilter_mode, output_format=output_format,
+                                           progress=progress, cancel=cancel)
+            first_cmp_stats = collections.Counter(self.__cmp_stats)
+            second_dict = None
+            if not cancel or not cancel.is_set():
+                second_dict = self.cmp_all_logs(second_file_dir, output=second_output, shingles_mode=shingles_mode,
+                                                store=use_store, prefilter=prefilter_mode, output_format=output_format,
+                                                progress=progress, cancel=cancel)
+                self.__cmp_stats.update(first_cmp_stats)
+        if self.__stage_stats.enabled:
+            self.__log_print(LogLevel.INFO, u'Сравнение прогонов %s и %s: %s'
+                             % (first_file_dir, second_file_dir, self.__stage_stats.format_summary()))
+        if cancel and cancel.is_set():
+            self.__log_print(LogLevel.INFO, u'Сравнение прогонов %s и %s прервано\n' % (first_file_dir, second_file_dir))
+            return None
+        if type(first_dict) != dict or type(first_dict) != dict:
+            return None
+        cases_dict = dict()
+        for second_key, second_val in second_dict.items():
+            for first_key, first_val in first_dict.items():
+                if type(first_key) != str or type(second_key) != str:
+                    continue
+                # first_key = first_key[first_key.find('FAIL'):]
+                # print 'first_key', first_key
+                # second_key = second_key[second_key.find('FAIL'):]
+                if first_key == second_key:
+                    intersection_cases = set(second_val) & set(first_val)
+                    # old_fail = list(set(first_val) - intersection_cases)
+                    new_fail = list(set(second_val) - intersection_cases)
+                    # if len(old_fail) > 0 or len(new_fail) > 0:
+                    #     cases_dict.update({first_key: {'OLD_FAILED_CASES': old_fail, 'NEW_FAILED_CASES': new_fail}})
+                    if len(new_fail) > 0:
+                        cases_dict.update({first_key: {'NEW_FAILED_CASES': new_fail}})
+                    break
+        intersection = set(second_dict) & set(first_dict)
+        old_fail = set(first_dict) - intersection
+        new_fail = set(second_dict) - intersection
+        # if old_fail:
+        #     for i in old_fail:
+        #         cases_dict.update({i: {'OLD_FAILED_CASES': first_dict[i]}})
+        if new_fail:
+            for i in new_fail:
+                cases_dict.update({i: {'NEW_FAILED_CASES': second_dict[i]}})
+        if not cases_dict:
+            return None
+        # Файл сравнения дописывается (как раньше), но открывается один раз
+        sink = result_sink.ResultSink(cmp_output, output_format) if cmp_output else None
+        try:
+            output = sink or cmp_output
+            self.__log_print(LogLevel.INFO, u'Результат сравнения двух прогонов (найдено различий: %d): \n\n' % len(cases_dict), output=output)
+            for cases_dict_key, cases_dict_val in cases_dict.items():
+                self.__log_print(LogLevel.INFO, u'%s:\n' % cases_dict_key, output=output)
+                self.__log_print(LogLevel.INFO, u'%s\n\n' % str(cases_dict_val), output=output)
+                new_cases = cases_dict_val['NEW_FAILED_CASES']
+                self.__write_record({'type': 'new_failure', 'fail': cases_dict_key,
+                                     'cases': list(new_cases.items()) if isinstance(new_cases, dict) else new_cases},
+                                    output=output)
+        finally:
+            if sink:
+                sink.close()
+        return cases_dict
+
+    def create_logs_from_run(self, path, run_id, **kwargs):
+        """Создать логи на базе прогона
+
+        Результаты тестов загружаются параллельно (TestRailFetcher), каждый лог
+        записывается сразу после загрузки результатов его теста. Если клиент не передан,
+        создается TestRailClient с адресом url (или из переменной окружения TESTRAIL_URL),
+        его соединения закрываются после загрузки; функции testrail_api используются,
+        только если адрес не задан.
+
+        Arguments:
+            :arg path -- директория
+            :arg run_id -- номер прогона
+            :arg client -- Клиент TestRail (TestRailClient, None - клиент по url)
+            :arg url -- Адрес TestRail для клиента по умолчанию (None - TestRailClient.URL_ENV)
+            :arg user -- Пользователь TestRail для клиента по умолчанию (None - TestRailClient.USER_ENV)
+            :arg password -- Пароль TestRail для клиента по умолчанию (None - TestRailClient.PASSWORD_ENV)
+            :arg workers -- Число одновременных запросов к TestRail
+            :arg cache -- Использовать кэш загруженных результатов в директории прогона (только для закрытого
+                          прогона, запись кэша привязана к состоянию теста)
+            :arg on_file -- Функция, вызываемая с путем до каждого записанного лога (для анализа до окончания загрузки)
+
+        Returns:
+            :return Список путей до записанных логов
+        """
+        # TestRail нужен только для загрузки логов: модули импортируются здесь
+        import source.modules.autotesting.auto_log_analyzer.testrail_fetcher as testrail_fetcher
+        client = kwargs.get('client', None)
+        workers = kwargs.get('workers', 8)
+        on_file = kwargs.get('on_file', None)
+        own_client = client is None
+        if own_client:
+            client = testrail_fetcher.TestRailClient.from_env(kwargs.get('url', None), kwargs.get('user', None),
+                                                              kwargs.get('password', None))
+        try:
+            return self.__create_logs_from_run(path, run_id, client, workers, on_file, kwargs.get('cache', True))
+        finally:
+            if own_client and client:
+                client.close()
+
+    def __create_logs_from_run(self, path, run_id, client, workers, on_file, cache):
+        """Создать логи на базе прогона (см. create_logs_from_run)
+
+        Arguments:
+            :arg path -- директория
+            :arg run_id -- номер прогона
+            :arg client -- Клиент TestRail (None - функции testrail_api)
+            :arg workers -- Число одновременных запросов к TestRail
+            :arg on_file -- Функция, вызываемая с путем до каждого записанного лога
+            :arg cache -- Использовать кэш загруженных результатов в директории прогона (если прогон закрыт)
+
+        Returns:
+            :return Список путей до записанных логов
+        """
+        import source.modules.autotesting.auto_log_analyzer.testrail_fetcher as testrail_fetcher
+        import source.modules.testrail_api as testrail_api
+        run_dir = '%s/%s' % (path, run_id)
+        self.__log_print(LogLevel.INFO, u'Создание логов из прогона\n')
+        if not os.path.exists(run_dir):
+            self.__log_print(LogLevel.DEBUG, u'Директории (%s) не существует, создание директории\n' % run_dir)
+            os.makedirs(run_dir)
+
+        tests = client.get_tests(run_id) if client else testrail_api.get_tests(run_id)
+        failed_tests = dict()
+        test_versions = dict()
+        for test in tests:
+            if test['status_id'] == testrail_api.FAILED:
+                failed_tests.update({test['id'] : test['case_id']})
+                test_versions[test['id']] = '%s:%s' % (run_id, test['status_id'])
+        # Лог кейса записывается по результатам последнего из его тестов
+        case_tests = dict((failed_test_val, failed_test_key) for failed_test_key, failed_test_val in failed_tests.items())
+        # Тесты открытого прогона могут быть перезапущены: кэш используется только для закрытого прогона
+        # (без клиента состояние прогона неизвестно)
+        if cache and not (client and (client.get_run(run_id) or dict()).get('is_completed')):
+            self.__log_print(LogLevel.DEBUG, u'Прогон %s не закрыт, кэш результатов не используется\n' % str(run_id))
+            cache = False
+        fetcher = testrail_fetcher.TestRailFetcher(
+            client.get_results if client else testrail_api.get_results, workers=workers,
+            cache_dir='%s/%s' % (run_dir, testrail_fetcher.TestRailFetcher.CACHE_DIR_NAME)
+            if cache else None)
+        log_files = list()
+        for failed_test_key, results in fetcher.fetch_all(case_tests.values(), test_versions):
+            log_file_name = '%s/log_%s.log' % (run_dir, str(failed_tests[failed_test_key]))
+            self.__log_print(LogLevel.DEBUG, u'Запись в файл %s\n' % log_file_name)
+            comment = None
+            for result in results:
+                comment = result['comment']
+                if comment and len(comment) > 10:
+                    break
+            # Лог пишется во временный файл и переносится на место целиком: OnlineClusterer.poll
+            # не должен увидеть недописанный лог
+            tmp_file_name = '%s.tmp' % log_file_name
+            with open(tmp_file_name, 'w', encoding="utf-8") as failed_logs_file:
+                if comment:
+                    failed_logs_file.write(comment)
+            os.replace(tmp_file_name, log_file_name)
+            log_files.append(log_file_name)
+            if on_file:
+                on_file(log_file_name)
+        return log_files
@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      log_analyzer_benchmark.py
+
+    @brief     Содержит замеры скорости этапов сравнения логов на синтетических прогонах
+
+    Запуск:
+        python -m source.modules.autotesting.auto_log_analyzer.log_analyzer_benchmark --sizes 100,1000,10000
+
+    Для каждого размера прогона создается прогон (LogCorpusGenerator) и замеряются этапы:
+    generate - создание файлов, profiles - разбор логов, cmp_lines - сравнение строк,
+    cmp_texts - сравнение логов устройства по шинглам, cmp_log_files - сравнение пар логов,
+    cmp_all_logs - группировка всего прогона. Результат группировки сверяется с семействами
+    падений, из которых созданы логи, чтобы ускорение не покупалось потерей точности.
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import argparse
+import collections
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import source.modules.autotesting.auto_log_analyzer.log_analyzer as log_analyzer
+import source.modules.autotesting.auto_log_analyzer.log_corpus_generator as log_corpus_generator
+import source.modules.autotesting.auto_log_analyzer.shingles_parser as shingles_parser
+
+
+class LogAnalyzerBenchmark(object):
+    """Замеры скорости этапов сравнения логов на синтетических прогонах
+
+    Attributes:
+        SIZES: размеры прогонов по умолчанию
+        SAMPLE_PAIRS: число пар для замеров отдельных сравнений
+        generator: генератор прогонов (LogCorpusGenerator)
+        work_dir: директория для прогонов
+        sample_pairs: число пар для замеров отдельных сравнений
+        shingles_mode: режим сравнения по шинглам
+        workers: число процессов cmp_all_logs
+
+    """
+
+    SIZES = (100, 1000, 10000)
+    SAMPLE_PAIRS = 200
+
+    def __init__(self, generator, work_dir, **kwargs):
+        """Конструктор класса
+
+        Attributes:
+            :arg generator -- Генератор прогонов (LogCorpusGenerator)
+            :arg work_dir -- Директория для прогонов
+            :arg sample_pairs -- Число пар для замеров отдельных сравнений
+            :arg shingles_mode -- Режим сравнения по шинглам (ShinglesParser.MODE_EXACT или MODE_MINHASH)
+            :arg workers -- Число процессов cmp_all_logs
+
+        """
+        self.generator = generator
+        self.work_dir = work_dir
+        self.sample_pairs = kwargs.get('sample_pairs', self.SAMPLE_PAIRS)
+        self.shingles_mode = kwargs.get('shingles_mode', shingles_parser.ShinglesParser.MODE_EXACT)
+        self.workers = kwargs.get('workers', 1)
+
+    @staticmethod
+    def __stage(elapsed, count):
+        """Результат замера этапа
+
+        Attributes:
+            :arg elapsed -- Время этапа, с
+            :arg count -- Число операций этапа
+
+        Returns:
+            :return Словарь: time - время, с; count - число операций; per_op_us - время операции, мкс
+
+        """
+        return {'time': elapsed,
+                'count': count,
+                'per_op_us': elapsed * 1e6 / count if count else 0.0}
+
+    @staticmethod
+    def evaluate(interim_dict, cases):
+        """Сверка результата группировки с семействами падений
+
+        Attributes:
+            :arg interim_dict -- Результат cmp_all_logs {FAIL строка: {номер кейса: результат}}
+            :arg cases -- Семейства падений {номер кейса: номер семейства}
+
+        Returns:
+            :return Словарь: clusters - число групп, families - число семейств, purity - доля логов
+                    основного семейства в группах, completeness - доля логов семейства в его самой
+                    большой группе (среднее по семействам), correct - группы совпадают с семействами
+
+        """
+        interim_dict = interim_dict or dict()
+        family_sizes = collections.Counter(cases.values())
+        majority_count = 0
+        members_count = 0
+        best_counts = dict()
+        for members in interim_dict.values():
+            counts = collections.Counter(cases.get(case_id) for case_id in members)
+            majority_count += max(counts.values()) if counts else 0
+            members_count += len(members)
+            for family_id, count in counts.items():
+                best_counts[family_id] = max(best_counts.get(family_id, 0), count)
+        purity = float(majority_count) / members_count if members_count else 0.0
+        completeness = (sum(float(best_counts.get(family_id, 0)) / size for family_id, size in family_sizes.items())
+                        / len(family_sizes)) if family_sizes else 0.0
+        return {'clusters': len(interim_dict),
+                'families': len(family_sizes),
+                'purity': purity,
+                'completeness': completeness,
+                'correct': len(interim_dict) == len(family_sizes) and purity == 1.0 and completeness == 1.0}
+
+    def run_size(self, logs_count):
+        """Замеры на прогоне заданного размера
+
+        Attributes:
+            :arg logs_count -- Число логов прогона
+
+        Returns:
+            :return Словарь: logs - число логов, stages - {этап: результат замера}, clustering - сверка
+                    группировки (evaluate)
+
+        """
+        run_dir = os.path.join(self.work_dir, 'run_%d' % logs_count)
+        if os.path.isdir(run_dir):
+            shutil.rmtree(run_dir)
+        stages = collections.OrderedDict()
+        rnd = random.Random(logs_count)
+
+        start_time = time.perf_counter()
+        cases = self.generator.generate(run_dir, logs_count)
+        stages['generate'] = self.__stage(time.perf_counter() - start_time, logs_count)
+        files = ['log_%d.log' % case_id for case_id in sorted(cases)]
+        pairs = [tuple(rnd.sample(files, 2)) for _ in range(self.sample_pairs)] if len(files) > 1 else list()
+
+        analyzer = log_analyzer.LogAnalyzer(verbose=False)
+        start_time = time.perf_counter()
+        profiles = dict((file, analyzer.get_log_profile(run_dir, file)) for file in files)
+        stages['profiles'] = self.__stage(time.perf_counter() - start_time, len(files))
+
+        # Сравнение строк - закрытый метод LogAnalyzer, замеряется напрямую
+        cmp_lines = getattr(analyzer, '_LogAnalyzer__cmp_lines')
+        line_pairs = [line_pair for first_file, second_file in pairs
+                      for line_pair in zip(profiles[first_file].lines, profiles[second_file].lines)]
+        start_time = time.perf_counter()
+        for first_line, second_line in line_pairs:
+            cmp_lines(first_line, second_line)
+        stages['cmp_lines'] = self.__stage(time.perf_counter() - start_time, len(line_pairs))
+
+        text_pairs = list()
+        if self.generator.device_logs:
+            for first_file, second_file in pairs:
+                texts = list()
+                for file in (first_file, second_file):
+                    with open(os.path.join(run_dir, 'parse_case_%d.txt' % profiles[file].case_id)) as dev_log_file:
+                        texts.append(dev_log_file.read())
+                text_pairs.append(texts)
+        start_time = time.perf_counter()
+        for first_text, second_text in text_pairs:
+            analyzer.shingles_parser.cmp_texts(first_text, second_text, self.shingles_mode)
+        stages['cmp_texts'] = self.__stage(time.perf_counter() - start_time, len(text_pairs))
+
+        start_time = time.perf_counter()
+        for first_file, second_file in pairs:
+            analyzer.cmp_log_files(run_dir, first_file, run_dir, second_file, shingles_mode=self.shingles_mode)
+        stages['cmp_log_files'] = self.__stage(time.perf_counter() - start_time, len(pairs))
+
+        # Группировка - новым движком, без профилей и отпечатков, закешированных предыдущими этапами
+        analyzer = log_analyzer.LogAnalyzer(verbose=False)
+        start_time = time.perf_counter()
+        interim_dict = analyzer.cmp_all_logs(run_dir, shingles_mode=self.shingles_mode, workers=self.workers)
+        stages['cmp_all_logs'] = self.__stage(time.perf_counter() - start_time, analyzer.get_cmp_stats()['pairs'])
+
+        return {'logs': logs_count,
+                'stages': stages,
+                'clustering': self.evaluate(interim_dict, cases)}
+
+    def run(self, sizes=SIZES):
+        """Замеры на прогонах всех размеров
+
+        Attributes:
+            :arg sizes -- Размеры прогонов
+
+        Returns:
+            :return Список результатов run_size
+
+        """
+        return [self.run_size(logs_count) for logs_count in sizes]
+
+
+def format_results(results, header=True):
+    """Форматирование результатов замеров в таблицу
+
+    Attributes:
+        :arg results -- Результаты LogAnalyzerBenchmark.run
+        :arg header -- Выводить заголовок таблицы
+
+    Returns:
+        :return Текст таблицы
+
+    """
+    lines = list()
+    if header:
+        lines.append(u'%8s %-14s %10s %10s %12s' % (u'логов', u'этап', u'время, с', u'операций', u'мкс/операция'))
+    for result in results:
+        for stage, stage_result in result['stages'].items():
+            lines.append(u'%8d %-14s %10.3f %10d %12.1f' % (result['logs'], stage, stage_result['time'],
+                                                             stage_result['count'], stage_result['per_op_us']))
+        clustering = result['clustering']
+        lines.append(u'%8d %-14s групп %d, семейств %d, чистота %.3f, полнота %.3f: %s'
+                     % (result['logs'], u'группировка', clustering['clusters'], clustering['families'],
+                        clustering['purity'], clustering['completeness'],
+                        u'верно' if clustering['correct'] else u'ОТЛИЧАЕТСЯ'))
+    return u'\n'.join(lines) + u'\n'
+
+
+def create_arg_parser():
+    """Создание разборщика аргументов командной строки
+
+    Returns:
+        :return Разборщик аргументов (argparse.ArgumentParser)
+
+    """
+    arg_parser = argparse.ArgumentParser(description=u'Замеры скорости сравнения логов на синтетических прогонах')
+    arg_parser.add_argument('--sizes', default=','.join(str(size) for size in LogAnalyzerBenchmark.SIZES),
+                            help=u'Размеры прогонов через запятую')
+    arg_parser.add_argument('--families', type=int, default=8, help=u'Число семейств падений')
+    arg_parser.add_argument('--noise', type=float, default=0.1, help=u'Доля строк сценария, заменяемых случайными')
+    arg_parser.add_argument('--seed', type=int, default=1, help=u'Зерно генератора')
+    arg_parser.add_argument('--no-device-logs', action='store_true', help=u'Не создавать логи устройства')
+    arg_parser.add_argument('--pairs', type=int, default=LogAnalyzerBenchmark.SAMPLE_PAIRS,
+                            help=u'Число пар для замеров отдельных сравнений')
+    arg_parser.add_argument('--shingles-mode', choices=('exact', 'minhash'), default='exact',
+                            help=u'Режим сравнения по шинглам')
+    arg_parser.add_argument('--workers', type=int, default=1, help=u'Число процессов cmp_all_logs')
+    arg_parser.add_argument('--dir', dest='work_dir', default=None,
+                            help=u'Директория для прогонов (по умолчанию временная, удаляется после замеров)')
+    arg_parser.add_argument('--json', dest='json_output', default=None, help=u'Файл для записи результатов в JSON')
+    return arg_parser
+
+
+def main(argv=None):
+    """Консольный запуск
+
+    Attributes:
+        :arg argv -- Аргументы командной строки (None - sys.argv)
+
+    Returns:
+        :return Код завершения (0 - группировка верна на всех прогонах, 1 - отличается)
+
+    """
+    args = create_arg_parser().parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    generator = log_corpus_generator.LogCorpusGenerator(args.seed, args.families, args.noise, not args.no_device_logs)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='analyzer_benchmark_')
+    try:
+        benchmark = LogAnalyzerBenchmark(generator, work_dir, sample_pairs=args.pairs,
+                                         shingles_mode=args.shingles_mode, workers=args.workers)
+        results = list()
+        for logs_count in sizes:
+            results.append(benchmark.run_size(logs_count))
+            sys.stdout.write(format_results(results[-1:], len(results) == 1))
+            sys.stdout.flush()
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as json_file:
+            json.dump(results, json_file, ensure_ascii=False, indent=1)
+    return 0 if all(result['clustering']['correct'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
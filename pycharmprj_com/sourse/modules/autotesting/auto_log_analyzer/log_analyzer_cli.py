@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      log_analyzer_cli.py
+
+    @brief     Содержит консольный запуск сравнения логов тестов (без Qt)
+
+    Запуск:
+        python -m source.modules.autotesting.auto_log_analyzer.log_analyzer_cli all <директория прогона>
+        python -m source.modules.autotesting.auto_log_analyzer.log_analyzer_cli runs <прогон 1> <прогон 2>
+        python -m source.modules.autotesting.auto_log_analyzer.log_analyzer_cli index <файл индекса> <прогон>...
+        python -m source.modules.autotesting.auto_log_analyzer.log_analyzer_cli query <файл индекса> <лог>
+        python -m source.modules.autotesting.auto_log_analyzer.log_analyzer_cli cluster <файл состояния> <директория прогона>
+        python -m source.modules.autotesting.auto_log_analyzer.log_analyzer_cli shard <директория прогона> <номер> <число> <файл>
+        python -m source.modules.autotesting.auto_log_analyzer.log_analyzer_cli merge <директория прогона> <файл>...
+        python -m source.modules.autotesting.auto_log_analyzer.log_analyzer_cli sharded <директория прогона> --shards 4
+
+    Холодный запуск (импорт модулей и создание LogAnalyzer до начала сравнения) должен
+    укладываться в COLD_START_TARGET; с ключом --startup-time время выводится в stderr.
+    PyQt5, TestRail и NumPy при этом не импортируются.
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# Цель по времени холодного запуска, с
+COLD_START_TARGET = 0.15
+
+
+def create_arg_parser():
+    """Создание разборщика аргументов командной строки
+
+    Returns:
+        :return Разборщик аргументов (argparse.ArgumentParser)
+
+    """
+    arg_parser = argparse.ArgumentParser(description=u'Сравнение логов упавших тестов')
+    arg_parser.add_argument('--shingles-mode', choices=('exact', 'minhash'), default='exact',
+                            help=u'Режим сравнения по шинглам')
+    arg_parser.add_argument('--workers', type=int, default=1, help=u'Число процессов для параллельного сравнения')
+    arg_parser.add_argument('--store', action='store_true',
+                            help=u'Сохранять профили логов и результат в директории прогона')
+    arg_parser.add_argument('--prefilter', choices=('filter', 'audit'), default=None,
+                            help=u'Режим префильтра пар по FAIL строкам')
+    arg_parser.add_argument('--line-backend', choices=('auto', 'python', 'numpy'), default='auto',
+                            help=u'Способ сравнения строк')
+    arg_parser.add_argument('--json', dest='json_output', default=None,
+                            help=u'Файл для записи результата в JSON (- - стандартный вывод)')
+    arg_parser.add_argument('--output-format', choices=('text', 'jsonl'), default='text',
+                            help=u'Формат файлов вывода результатов (--output, --*-output)')
+    arg_parser.add_argument('--quiet', action='store_true', help=u'Не выводить промежуточные результаты')
+    arg_parser.add_argument('--stage-stats', action='store_true',
+                            help=u'Собрать статистику времени этапов сравнения и вывести сводку в stderr')
+    arg_parser.add_argument('--profile-hot-pairs', default=None,
+                            help=u'Директория для профилей cProfile самых долгих сравнений пар (включает --stage-stats)')
+    arg_parser.add_argument('--progress', action='store_true',
+                            help=u'Выводить ход сравнения (пар из оценки общего числа, пар/с) в stderr')
+    arg_parser.add_argument('--time-limit', type=float, default=None,
+                            help=u'Прервать сравнение через заданное время, с (выводится неполный результат)')
+    arg_parser.add_argument('--startup-time', action='store_true',
+                            help=u'Вывести время холодного запуска в stderr')
+    commands = arg_parser.add_subparsers(dest='command')
+    commands.required = True
+    all_logs = commands.add_parser('all', help=u'Сравнение всех логов прогона (cmp_all_logs)')
+    all_logs.add_argument('file_dir', help=u'Директория логов прогона')
+    all_logs.add_argument('--output', default=None, help=u'Файл для вывода результатов')
+    all_logs.add_argument('--lsh', action='store_true', help=u'Сравнивать только пары-кандидаты из LSH индекса')
+    all_logs.add_argument('--lsh-bands', type=int, default=None, help=u'Число полос LSH')
+    all_logs.add_argument('--lsh-rows', type=int, default=None, help=u'Число значений сигнатуры в полосе LSH')
+    all_logs.add_argument('--no-dedup', action='store_true', help=u'Сравнивать одинаковые логи каждый раз')
+    all_logs.add_argument('--sort-files', action='store_true',
+                          help=u'Сравнивать логи в порядке имен (результат совпадает с shard/merge)')
+    runs = commands.add_parser('runs', help=u'Сравнение двух прогонов (cmp_logs_from_runs)')
+    runs.add_argument('first_file_dir', help=u'Директория логов первого (более раннего) прогона')
+    runs.add_argument('second_file_dir', help=u'Директория логов второго прогона')
+    runs.add_argument('--first-output', default=None, help=u'Файл для вывода результатов первого прогона')
+    runs.add_argument('--second-output', default=None, help=u'Файл для вывода результатов второго прогона')
+    runs.add_argument('--cmp-output', default=None, help=u'Файл для вывода результатов сравнения прогонов')
+    index = commands.add_parser('index', help=u'Добавление прогонов в индекс прошлых прогонов (HistoryIndex)')
+    index.add_argument('index_file', help=u'Файл индекса')
+    index.add_argument('run_dirs', nargs='+', help=u'Директории логов прогонов')
+    query = commands.add_parser('query', help=u'Поиск самых похожих логов прошлых прогонов')
+    query.add_argument('index_file', help=u'Файл индекса')
+    query.add_argument('log_file', help=u'Лог упавшего теста')
+    query.add_argument('-k', type=int, default=10, help=u'Число результатов')
+    query.add_argument('--rerank', type=int, default=None, help=u'Число кандидатов для точного сравнения')
+    cluster = commands.add_parser('cluster', help=u'Пошаговая группировка новых логов прогона (OnlineClusterer)')
+    cluster.add_argument('state_file', help=u'Файл состояния группировки')
+    cluster.add_argument('file_dir', help=u'Директория логов прогона')
+    shard = commands.add_parser('shard', help=u'Сравнение части логов прогона (ShardedComparison.run_shard)')
+    shard.add_argument('file_dir', help=u'Директория логов прогона')
+    shard.add_argument('shard_index', type=int, help=u'Номер шарда (с 0)')
+    shard.add_argument('shard_count', type=int, help=u'Число шардов')
+    shard.add_argument('result_file', help=u'Файл частичного результата')
+    merge = commands.add_parser('merge', help=u'Сборка результата из частичных результатов шардов')
+    merge.add_argument('file_dir', help=u'Директория логов прогона')
+    merge.add_argument('result_files', nargs='+', help=u'Файлы частичных результатов')
+    sharded = commands.add_parser('sharded', help=u'Запуск шардов отдельными процессами и сборка результата')
+    sharded.add_argument('file_dir', help=u'Директория логов прогона')
+    sharded.add_argument('--shards', type=int, default=2, help=u'Число шардов (процессов)')
+    sharded.add_argument('--work-dir', default=None,
+                         help=u'Директория частичных результатов (по умолчанию временная, удаляется после сборки)')
+    return arg_parser
+
+
+def run_cluster_command(analyzer, args):
+    """Добавление новых логов директории в сохраненную группировку (команда cluster)
+
+    Attributes:
+        :arg analyzer -- Движок сравнения логов (LogAnalyzer)
+        :arg args -- Разобранные аргументы командной строки
+
+    Returns:
+        :return Промежуточный результат группировки в формате cmp_all_logs
+
+    """
+    import source.modules.autotesting.auto_log_analyzer.online_clusterer as online_clusterer
+    clusterer = online_clusterer.OnlineClusterer.load(args.state_file, analyzer)
+    if not len(clusterer):
+        clusterer.shingles_mode = args.shingles_mode
+    added = clusterer.poll(args.file_dir)
+    clusterer.save(args.state_file)
+    sys.stderr.write(u'Добавлено логов: %d, всего логов: %d, групп: %d\n'
+                     % (len(added), len(clusterer), clusterer.clusters_count))
+    return clusterer.result()
+
+
+def run_shard_command(analyzer, args):
+    """Выполнение команд сравнения частями (shard, merge, sharded)
+
+    Attributes:
+        :arg analyzer -- Движок сравнения логов (LogAnalyzer)
+        :arg args -- Разобранные аргументы командной строки
+
+    Returns:
+        :return Статистика шарда для shard, результат в формате cmp_all_logs для merge и sharded
+
+    """
+    import source.modules.autotesting.auto_log_analyzer.sharded_comparison as sharded_comparison
+    comparison = sharded_comparison.ShardedComparison(analyzer, args.shingles_mode)
+    if args.command == 'shard':
+        stats = comparison.run_shard(args.file_dir, args.shard_index, args.shard_count, args.result_file)
+        sys.stderr.write(u'Шард %d из %d: логов %d, строк %d, время %.3f с\n'
+                         % (args.shard_index, args.shard_count, stats['shard_files'], stats['rows'], stats['time']))
+        return stats
+    work_dir = None
+    if args.command == 'sharded':
+        work_dir = args.work_dir or tempfile.mkdtemp(prefix='shards_')
+        os.makedirs(work_dir, exist_ok=True)
+    try:
+        if args.command == 'merge':
+            result_files = args.result_files
+        else:
+            result_files = [os.path.join(work_dir, 'shard_%d.json' % shard_index) for shard_index in range(args.shards)]
+            processes = [subprocess.Popen([sys.executable, '-m', __spec__.name if __spec__ else __name__,
+                                           '--quiet', '--shingles-mode', args.shingles_mode,
+                                           'shard', args.file_dir, str(shard_index), str(args.shards), result_file])
+                         for shard_index, result_file in enumerate(result_files)]
+            if any([process.wait() for process in processes]):
+                sys.stderr.write(u'Шард завершился с ошибкой\n')
+                return None
+        result = comparison.merge(args.file_dir, result_files)
+    finally:
+        if work_dir and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    stats = comparison.get_merge_stats()
+    if stats:
+        sys.stderr.write(u'Сборка: шардов %d, представителей %d, строк из шардов %d, посчитано при сборке %d, '
+                         u'время %.3f с\n' % (stats['shards'], stats['seeds'], stats['rows'], stats['missing_rows'],
+                                               stats['time']))
+    return result
+
+
+def run_analysis_job(args, name, func, *func_args, **options):
+    """Выполнение сравнения (all, runs) заданием планировщика с ходом выполнения и отменой
+
+    Ctrl+C и --time-limit отменяют задание: сравнение останавливается после текущей
+    части пар и возвращается неполный результат.
+
+    Attributes:
+        :arg args -- Разобранные аргументы командной строки
+        :arg name -- Имя задания
+        :arg func -- Функция сравнения (cmp_all_logs или cmp_logs_from_runs)
+        :arg func_args -- Позиционные аргументы функции
+        :arg options -- Именованные аргументы функции
+
+    Returns:
+        :return Результат функции сравнения
+
+    """
+    import source.modules.autotesting.auto_log_analyzer.job_scheduler as job_scheduler
+    on_progress = None
+    if args.progress:
+        on_progress = lambda job: sys.stderr.write(u'\r%s: %d из ~%d пар, %.0f пар/с' % ((job.name,) + job.progress()))
+    scheduler = job_scheduler.JobScheduler(1, on_progress=on_progress)
+    job = scheduler.submit(name, func, *func_args, **options)
+    try:
+        if not job.wait(args.time_limit):
+            sys.stderr.write(u'\nВремя сравнения превысило %.1f с, сравнение прерывается\n' % args.time_limit)
+            job.cancel()
+        job.wait()
+    except KeyboardInterrupt:
+        sys.stderr.write(u'\nСравнение прерывается\n')
+        job.cancel()
+        job.wait()
+    finally:
+        scheduler.shutdown()
+    if args.progress:
+        sys.stderr.write(u'\n')
+    if job.error:
+        raise job.error
+    if job.state == job.STATE_CANCELLED:
+        sys.stderr.write(u'Сравнение прервано (%.3f с), результат неполный\n' % job.to_dict()['time'])
+    return job.result
+
+
+def run_history_command(analyzer, args):
+    """Выполнение команд индекса прошлых прогонов (index, query)
+
+    Attributes:
+        :arg analyzer -- Движок сравнения логов (LogAnalyzer)
+        :arg args -- Разобранные аргументы командной строки
+
+    Returns:
+        :return Результат: {директория прогона: число логов} для index, список (лог, сходство) для query
+
+    """
+    import source.modules.autotesting.auto_log_analyzer.history_index as history_index
+    with history_index.HistoryIndex.load(args.index_file, analyzer) as index:
+        if args.command == 'index':
+            result = dict()
+            for run_dir in args.run_dirs:
+                result[run_dir] = index.add_run(run_dir, args.store)
+                sys.stderr.write(u'Прогон %s: %d логов\n' % (run_dir, result[run_dir]))
+            index.save(args.index_file)
+            return result
+        options = {'shingles_mode': args.shingles_mode}
+        if args.rerank is not None:
+            options['rerank'] = args.rerank
+        result = index.query(args.log_file, args.k, **options)
+        for path, score in result:
+            sys.stdout.write(u'%.4f %s\n' % (score, path))
+        stats = index.get_query_stats()
+        sys.stderr.write(u'Кандидатов: %d, сравнено: %d, время запроса: %.3f с\n'
+                         % (stats['candidates'], stats['reranked'], stats['time']))
+        return result
+
+
+def main(argv=None):
+    """Консольный запуск
+
+    Attributes:
+        :arg argv -- Аргументы командной строки (None - sys.argv)
+
+    Returns:
+        :return Код завершения (0 - успешно, 1 - нет результата)
+
+    """
+    start_time = time.perf_counter()
+    args = create_arg_parser().parse_args(argv)
+    import source.modules.autotesting.auto_log_analyzer.log_analyzer as log_analyzer
+    analyzer = log_analyzer.LogAnalyzer(verbose=not args.quiet, line_backend=args.line_backend,
+                                        collect_stats=args.stage_stats or bool(args.profile_hot_pairs))
+    if args.startup_time:
+        startup_time = time.perf_counter() - start_time
+        sys.stderr.write(u'Холодный запуск: %.3f с (цель %.3f с)\n' % (startup_time, COLD_START_TARGET))
+    options = {'shingles_mode': args.shingles_mode,
+               'workers': args.workers,
+               'store': args.store,
+               'prefilter': args.prefilter}
+    if args.command in ('index', 'query'):
+        result = run_history_command(analyzer, args)
+    elif args.command == 'cluster':
+        result = run_cluster_command(analyzer, args)
+    elif args.command in ('shard', 'merge', 'sharded'):
+        result = run_shard_command(analyzer, args)
+    elif args.command == 'all':
+        options.update({'output': args.output, 'output_format': args.output_format,
+                        'lsh': args.lsh, 'dedup': not args.no_dedup, 'sort_files': args.sort_files})
+        if args.lsh_bands is not None:
+            options['lsh_bands'] = args.lsh_bands
+        if args.lsh_rows is not None:
+            options['lsh_rows'] = args.lsh_rows
+        result = run_analysis_job(args, args.file_dir, analyzer.cmp_all_logs, args.file_dir, **options)
+    else:
+        options.update({'first_output': args.first_output,
+                        'second_output': args.second_output,
+                        'cmp_output': args.cmp_output,
+                        'output_format': args.output_format})
+        result = run_analysis_job(args, '%s, %s' % (args.first_file_dir, args.second_file_dir),
+                                  analyzer.cmp_logs_from_runs, args.first_file_dir, args.second_file_dir, **options)
+    if analyzer.stage_stats.enabled:
+        sys.stderr.write(analyzer.stage_stats.format_summary())
+    if args.profile_hot_pairs:
+        for path in analyzer.profile_hot_pairs(args.profile_hot_pairs, shingles_mode=args.shingles_mode):
+            sys.stderr.write(u'Профиль: %s\n' % path)
+    if args.json_output:
+        data = json.dumps(result, ensure_ascii=False, indent=1)
+        if args.json_output == '-':
+            sys.stdout.write(data + '\n')
+        else:
+            with open(args.json_output, 'w', encoding='utf-8') as json_file:
+                json_file.write(data)
+    return 0 if result is not None else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
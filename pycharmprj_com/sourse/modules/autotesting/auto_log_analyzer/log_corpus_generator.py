@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      log_corpus_generator.py
+
+    @brief     Содержит генератор синтетических прогонов с логами упавших тестов
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import os
+import random
+
+
+class LogCorpusGenerator(object):
+    """Генератор директорий прогонов с логами упавших тестов (для замеров скорости сравнения)
+
+    Каждый лог log_<кейс>.log повторяет формат настоящих логов: блок настроек до строки
+    смены настроек (CONFIG_END_MARKER), строки с метками времени и уровня перед '::',
+    FAIL строка и несколько строк после нее. Логи принадлежат одному из семейств падений:
+    внутри семейства совпадают сценарий (последовательность команд) и шаблон FAIL строки,
+    различаются метки времени, значение в FAIL строке и отдельные строки (шум). Для каждого
+    кейса создается лог устройства parse_case_<кейс>.txt со словарем, смещенным к словарю
+    семейства.
+
+    Генерация детерминирована: одинаковые seed и параметры дают одинаковые файлы.
+    Номер семейства каждого кейса возвращается вместе с файлами и служит эталоном
+    для проверки результата группировки.
+
+    Attributes:
+        FIRST_CASE_ID: номер кейса первого лога
+        CONFIG_END_MARKER: признак строки смены настроек (как в LogAnalyzer)
+        COMMANDS: команды сценариев
+        FAIL_REASONS: причины падения (шаблоны FAIL строк)
+        MODULES: модули, в которых происходит падение
+        DEVICE_WORDS: словарь логов устройства
+        seed: зерно генератора
+        families: число семейств падений
+        noise: доля строк сценария, заменяемых случайными
+        device_logs: создавать логи устройства
+        __families: параметры семейств [(сценарий, шаблон FAIL строки, словарь лога устройства)]
+
+    """
+
+    FIRST_CASE_ID = 10000
+    CONFIG_END_MARKER = 'Message code:    2'
+
+    COMMANDS = ('SET_PARAM', 'GET_STATE', 'ARM', 'DISARM', 'ENGINE_START', 'ENGINE_STOP', 'READ_GPS',
+                'SEND_SMS', 'OPEN_DOOR', 'CLOSE_DOOR', 'READ_CAN', 'SET_SERVICE_MODE')
+    FAIL_REASONS = ('timeout waiting for answer %d ms from',
+                    'wrong state 0x%X of',
+                    'unexpected message code %d received by',
+                    'invalid coordinates %d returned by',
+                    'no response after %d attempts from',
+                    'checksum mismatch in packet %d of',
+                    'voltage %d mV out of range on',
+                    'event %d not delivered by')
+    MODULES = ('gsm_module', 'gps_receiver', 'can_bus', 'engine_block', 'alarm_unit', 'door_lock',
+               'immobilizer', 'bluetooth_tag', 'service_button', 'temperature_sensor')
+    DEVICE_WORDS = ('gsm', 'gps', 'can', 'engine', 'alarm', 'door', 'hood', 'trunk', 'ignition', 'sensor',
+                    'tag', 'relay', 'voltage', 'shock', 'tilt', 'service', 'balance', 'sms', 'ping', 'ack')
+
+    def __init__(self, seed=1, families=8, noise=0.1, device_logs=True):
+        """Конструктор класса
+
+        Attributes:
+            :arg seed -- Зерно генератора
+            :arg families -- Число семейств падений
+            :arg noise -- Доля строк сценария, заменяемых случайными (0.0 - 1.0)
+            :arg device_logs -- Создавать логи устройства
+
+        """
+        if families < 1:
+            raise ValueError(u'Число семейств должно быть больше 0')
+        self.seed = seed
+        self.families = families
+        self.noise = noise
+        self.device_logs = device_logs
+        self.__families = [self.__make_family(family_id) for family_id in range(families)]
+
+    def __make_family(self, family_id):
+        """Создание параметров семейства падений
+
+        Attributes:
+            :arg family_id -- Номер семейства
+
+        Returns:
+            :return (сценарий [(команда, адрес, значение, есть ответ)], шаблон FAIL строки, словарь лога устройства)
+
+        """
+        rnd = random.Random('%s/%d' % (self.seed, family_id))
+        scenario = [(rnd.choice(self.COMMANDS), rnd.randrange(0x10000), rnd.randrange(256), rnd.random() < 0.3)
+                    for _ in range(rnd.randint(15, 40))]
+        # Причина и модуль перебираются так, чтобы у первых семейств FAIL строки различались
+        reason = self.FAIL_REASONS[family_id % len(self.FAIL_REASONS)]
+        module = self.MODULES[(family_id // len(self.FAIL_REASONS) + family_id) % len(self.MODULES)]
+        fail_template = 'FAIL: %s %s' % (reason, module)
+        device_words = rnd.sample(self.DEVICE_WORDS, 6)
+        return (scenario, fail_template, device_words)
+
+    def __make_log(self, rnd, family):
+        """Создание текста лога теста
+
+        Attributes:
+            :arg rnd -- Генератор случайных чисел
+            :arg family -- Параметры семейства падений
+
+        Returns:
+            :return Текст лога
+
+        """
+        scenario, fail_template, _ = family
+        lines = list()
+        minute = 0
+        for param_id in range(rnd.randint(3, 10)):
+            lines.append('2017-05-17 15:%02d:%02d LOG_INFO :: config param_%d = %d'
+                         % (minute, rnd.randrange(60), param_id, rnd.randrange(1000)))
+        lines.append('2017-05-17 15:%02d:%02d LOG_DEBUG :: %s' % (minute, rnd.randrange(60), self.CONFIG_END_MARKER))
+        for step, (command, address, value, answer) in enumerate(scenario):
+            if rnd.random() < self.noise:
+                command, address, value = rnd.choice(self.COMMANDS), rnd.randrange(0x10000), rnd.randrange(256)
+            minute = min(59, minute + rnd.randrange(2))
+            lines.append('2017-05-17 15:%02d:%02d LOG_INFO :: step %d send %s addr 0x%04X value %d'
+                         % (minute, rnd.randrange(60), step, command, address, value))
+            if answer:
+                lines.append('2017-05-17 15:%02d:%02d LOG_DEBUG :: answer %s status %d'
+                             % (minute, rnd.randrange(60), command, rnd.randrange(4)))
+        lines.append('2017-05-17 15:%02d:%02d LOG_ERROR :: %s' % (minute, rnd.randrange(60), fail_template % rnd.randrange(10000)))
+        lines.append('2017-05-17 15:%02d:%02d LOG_INFO :: test finished' % (minute, rnd.randrange(60)))
+        lines.append('')
+        return '\n'.join(lines)
+
+    def __make_device_log(self, rnd, family):
+        """Создание текста лога устройства
+
+        Attributes:
+            :arg rnd -- Генератор случайных чисел
+            :arg family -- Параметры семейства падений
+
+        Returns:
+            :return Текст лога устройства
+
+        """
+        device_words = family[2]
+        words = [rnd.choice(device_words) if rnd.random() < 0.7 else rnd.choice(self.DEVICE_WORDS)
+                 for _ in range(rnd.randint(200, 600))]
+        return ' '.join(words)
+
+    def generate(self, run_dir, logs_count):
+        """Создание директории прогона
+
+        Attributes:
+            :arg run_dir -- Директория прогона (создается при необходимости)
+            :arg logs_count -- Число логов
+
+        Returns:
+            :return Словарь {номер кейса: номер семейства падений}
+
+        """
+        os.makedirs(run_dir, exist_ok=True)
+        rnd = random.Random('%s/run/%d' % (self.seed, logs_count))
+        cases = dict()
+        for case_id in range(self.FIRST_CASE_ID, self.FIRST_CASE_ID + logs_count):
+            family_id = rnd.randrange(self.families)
+            family = self.__families[family_id]
+            cases[case_id] = family_id
+            with open(os.path.join(run_dir, 'log_%d.log' % case_id), 'w') as log_file:
+                log_file.write(self.__make_log(rnd, family))
+            if self.device_logs:
+                with open(os.path.join(run_dir, 'parse_case_%d.txt' % case_id), 'w') as dev_log_file:
+                    dev_log_file.write(self.__make_device_log(rnd, family))
+        return cases
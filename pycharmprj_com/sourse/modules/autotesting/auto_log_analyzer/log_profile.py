@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      log_profile.py
+
+    @brief     Содержит класс профиля лога теста (данные, необходимые для сравнения логов)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import collections
+
+
+class LogProfile(object):
+    """Профиль лога теста: результат однократного разбора файла
+
+    Attributes:
+        path: путь до файла
+        case_id: номер кейса (из имени файла)
+        fail_line: первая FAIL строка (None, если не найдена)
+        fail_line_no: номер FAIL строки
+        config_end: номер первой строки после смены настроек
+        lines: очищенные от меток строки между сменой настроек и FAIL строкой (в обратном порядке)
+        line_chunks: счетчики слов для каждой строки из lines
+        fail_chunks: счетчик слов FAIL строки
+        fingerprint: отпечаток текста по шинглам (строится при первом использовании)
+        signature: MinHash сигнатура текста (строится при первом использовании)
+        token_ids: слова строк в виде номеров словаря TokenVocabulary (строятся при первом использовании)
+        content_hash: хэш FAIL строки и очищенных строк (строится при первом использовании)
+
+    """
+
+    def __init__(self,
+                 path,
+                 case_id,
+                 fail_line,
+                 fail_line_no,
+                 config_end,
+                 lines):
+        """Конструктор класса
+
+        Attributes:
+            :arg path -- Путь до файла
+            :arg case_id -- Номер кейса
+            :arg fail_line -- Первая FAIL строка
+            :arg fail_line_no -- Номер FAIL строки
+            :arg config_end -- Номер первой строки после смены настроек
+            :arg lines -- Очищенные строки между сменой настроек и FAIL строкой (в обратном порядке)
+
+        """
+        self.path = path
+        self.case_id = case_id
+        self.fail_line = fail_line
+        self.fail_line_no = fail_line_no
+        self.config_end = config_end
+        self.lines = lines
+        self.line_chunks = [collections.Counter(line.lower().split()) for line in lines]
+        self.fail_chunks = collections.Counter(fail_line.lower().split()) if fail_line else None
+        self.fingerprint = None
+        self.signature = None
+        self.token_ids = None
+        self.content_hash = None
+
+    def to_compact(self):
+        """Компактная форма профиля для передачи между процессами
+
+        Счетчики слов, отпечаток и сигнатура не передаются и строятся заново при необходимости.
+
+        Returns:
+            :return Кортеж исходных данных профиля
+
+        """
+        return (self.path, self.case_id, self.fail_line, self.fail_line_no, self.config_end, self.lines)
+
+    @classmethod
+    def from_compact(cls, data):
+        """Восстановление профиля из компактной формы
+
+        Attributes:
+            :arg data -- Кортеж, полученный через to_compact
+
+        Returns:
+            :return Профиль лога
+
+        """
+        return cls(*data)
+
+    def to_stored(self):
+        """Форма профиля для постоянного хранилища (вместе с отпечатком и сигнатурой, если они построены)
+
+        Returns:
+            :return Кортеж (компактная форма, отпечаток, сигнатура)
+
+        """
+        return (self.to_compact(), self.fingerprint, self.signature)
+
+    @classmethod
+    def from_stored(cls, data):
+        """Восстановление профиля из формы для постоянного хранилища
+
+        Attributes:
+            :arg data -- Кортеж, полученный через to_stored
+
+        Returns:
+            :return Профиль лога
+
+        """
+        profile = cls.from_compact(data[0])
+        profile.fingerprint = data[1]
+        profile.signature = data[2]
+        return profile
+
+    @property
+    def fail(self):
+        """FAIL строка и ее номер в формате __find_fail_line (None, если не найдена)"""
+        if not self.fail_line:
+            return None
+        return (self.fail_line, self.fail_line_no)
+
+    @property
+    def text(self):
+        """Очищенный текст лога между сменой настроек и FAIL строкой"""
+        return ' '.join(self.lines)
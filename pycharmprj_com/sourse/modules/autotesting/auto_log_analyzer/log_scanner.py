@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      log_scanner.py
+
+    @brief     Содержит поиск строк лога по байтам в отображенном в память файле (mmap)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import codecs
+import io
+import locale
+import mmap
+
+
+class LogScanner(object):
+    """Поиск строк лога по байтам без декодирования всего файла
+
+    Файл отображается в память (mmap), метки ищутся побайтно, номера строк
+    считаются по символам конца строки так же, как при чтении файла в текстовом
+    режиме (\\n, \\r и \\r\\n). Декодируются только запрошенные участки файла.
+    Побайтный поиск корректен только для кодировок, совместимых с ASCII,
+    в которых каждый символ занимает один байт, и для UTF-8 (is_supported).
+
+    Attributes:
+        BLOCK_SIZE: размер блока при подсчете строк
+        encoding: кодировка файла
+        __file: открытый файл
+        __map: содержимое файла (mmap, для пустого файла - пустая строка байт)
+
+    """
+
+    BLOCK_SIZE = 1 << 20
+
+    def __init__(self, path, encoding=None):
+        """Конструктор класса
+
+        Attributes:
+            :arg path -- Путь до файла
+            :arg encoding -- Кодировка файла (None - кодировка по умолчанию, как у open)
+
+        """
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.__file = open(path, 'rb')
+        self.__map = b''
+        try:
+            if self.__file.seek(0, io.SEEK_END) > 0:
+                self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self.__file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self.__map)
+
+    @staticmethod
+    def is_supported(encoding=None):
+        """Проверка, что для кодировки возможен побайтный поиск
+
+        Attributes:
+            :arg encoding -- Кодировка (None - кодировка по умолчанию, как у open)
+
+        Returns:
+            :return True для UTF-8 и однобайтовых кодировок, совместимых с ASCII
+
+        """
+        encoding = encoding or locale.getpreferredencoding(False)
+        try:
+            codec_name = codecs.lookup(encoding).name
+            if codec_name == 'utf-8':
+                return True
+            if codec_name.startswith('utf'):
+                return False
+            return (bytes(range(128)).decode(encoding) == ''.join(map(chr, range(128))) and
+                    len(bytes(range(256)).decode(encoding, errors='replace')) == 256)
+        except (LookupError, UnicodeDecodeError):
+            return False
+
+    def close(self):
+        """Закрытие файла"""
+        if self.__map:
+            self.__map.close()
+            self.__map = b''
+        self.__file.close()
+
+    def __count_lines(self, end):
+        """Подсчет строк до позиции
+
+        Attributes:
+            :arg end -- Позиция в файле (начало строки или позиция внутри строки)
+
+        Returns:
+            :return Число концов строк до позиции
+
+        """
+        count = 0
+        prev_cr = False
+        for start in range(0, end, self.BLOCK_SIZE):
+            block = self.__map[start:min(start + self.BLOCK_SIZE, end)]
+            count += block.count(b'\n') + block.count(b'\r') - block.count(b'\r\n')
+            if prev_cr and block.startswith(b'\n'):
+                count -= 1
+            prev_cr = block.endswith(b'\r')
+        return count
+
+    def __line_end(self, pos):
+        """Позиция конца строки (символа конца строки или конца файла), содержащей позицию pos"""
+        ends = [end for end in (self.__map.find(b'\n', pos), self.__map.find(b'\r', pos)) if end != -1]
+        return min(ends) if ends else len(self.__map)
+
+    def __next_line_start(self, pos):
+        """Позиция начала строки, следующей за строкой, содержащей позицию pos"""
+        line_end = self.__line_end(pos)
+        if self.__map[line_end:line_end + 2] == b'\r\n':
+            return line_end + 2
+        return min(line_end + 1, len(self.__map))
+
+    def find(self, marker):
+        """Поиск первой строки, содержащей метку
+
+        Attributes:
+            :arg marker -- Метка (строка)
+
+        Returns:
+            :return (номер строки, позиция метки, позиция начала следующей строки) или None, если метка не найдена
+
+        """
+        pos = self.__map.find(marker.encode(self.encoding))
+        if pos == -1:
+            return None
+        return (self.__count_lines(self.line_start(pos)), pos, self.__next_line_start(pos))
+
+    def line_from(self, pos):
+        """Текст строки от позиции до конца строки (без символов конца строки)
+
+        Attributes:
+            :arg pos -- Позиция в файле
+
+        Returns:
+            :return Декодированный текст
+
+        """
+        return self.__map[pos:self.__line_end(pos)].decode(self.encoding)
+
+    def line_start(self, pos):
+        """Позиция начала строки, содержащей позицию pos
+
+        Attributes:
+            :arg pos -- Позиция в файле
+
+        Returns:
+            :return Позиция начала строки
+
+        """
+        return max(self.__map.rfind(b'\n', 0, pos), self.__map.rfind(b'\r', 0, pos)) + 1
+
+    def read_lines(self, start, end):
+        """Декодирование участка файла в список строк (как readlines в текстовом режиме)
+
+        Attributes:
+            :arg start -- Позиция начала участка (начало строки)
+            :arg end -- Позиция конца участка
+
+        Returns:
+            :return Список строк участка
+
+        """
+        if start >= end:
+            return list()
+        with io.TextIOWrapper(io.BytesIO(self.__map[start:end]), self.encoding) as stream:
+            return stream.readlines()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      lsh_index.py
+
+    @brief     Содержит индекс LSH (locality-sensitive hashing) для поиска похожих логов по MinHash сигнатурам
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+
+class LshIndex(object):
+    """Индекс LSH по MinHash сигнатурам (метод полос)
+
+    Сигнатура делится на bands полос по rows значений. Два лога становятся
+    кандидатами, если хотя бы одна полоса у них совпадает. Вероятность этого
+    1 - (1 - J^rows)^bands, порог срабатывания примерно (1 / bands)^(1 / rows):
+    больше полос - выше полнота, больше строк в полосе - выше точность.
+    Логи с пустой сигнатурой (слишком короткий текст) в полосы не попадают
+    и считаются кандидатами для всех логов.
+
+    Attributes:
+        BANDS: число полос по умолчанию
+        ROWS: число значений сигнатуры в полосе по умолчанию
+        __bands: число полос
+        __rows: число значений сигнатуры в полосе
+        __buckets: список словарей {значения полосы: список ключей} для каждой полосы
+        __keys: словарь {ключ: список корзин ключа}
+        __unindexed: ключи с пустой сигнатурой
+
+    """
+
+    BANDS = 64
+    ROWS = 2
+
+    def __init__(self, bands=BANDS, rows=ROWS):
+        """Конструктор класса
+
+        Attributes:
+            :arg bands -- Число полос
+            :arg rows -- Число значений сигнатуры в полосе
+
+        """
+        if bands < 1 or rows < 1:
+            raise ValueError(u'Число полос и строк LSH должно быть положительным (%d, %d)' % (bands, rows))
+        self.__bands = bands
+        self.__rows = rows
+        self.__buckets = [dict() for _ in range(bands)]
+        self.__keys = dict()
+        self.__unindexed = list()
+
+    def __len__(self):
+        return len(self.__keys) + len(self.__unindexed)
+
+    @property
+    def threshold(self):
+        """Примерный порог коэффициента Жаккара, с которого пара становится кандидатом"""
+        return (1.0 / self.__bands) ** (1.0 / self.__rows)
+
+    def add(self, key, signature):
+        """Добавление сигнатуры в индекс
+
+        Attributes:
+            :arg key -- Ключ (имя файла)
+            :arg signature -- MinHash сигнатура (MinHashSignature)
+
+        """
+        if len(signature) < 1:
+            self.__unindexed.append(key)
+            return
+        if len(signature) < self.__bands * self.__rows:
+            raise ValueError(u'Длина сигнатуры %d меньше %d полос по %d значений' % (len(signature), self.__bands, self.__rows))
+        values = signature.values
+        buckets = list()
+        for band in range(self.__bands):
+            band_key = tuple(values[band * self.__rows:(band + 1) * self.__rows])
+            bucket = self.__buckets[band].setdefault(band_key, list())
+            bucket.append(key)
+            buckets.append(bucket)
+        self.__keys[key] = buckets
+
+    def candidates(self, key):
+        """Получить кандидатов в похожие логи
+
+        Attributes:
+            :arg key -- Ключ (имя файла)
+
+        Returns:
+            :return Множество ключей-кандидатов (без самого ключа)
+
+        """
+        if key not in self.__keys:
+            result = set(self.__keys)
+        else:
+            result = set()
+            for bucket in self.__keys[key]:
+                result.update(bucket)
+        result.update(self.__unindexed)
+        result.discard(key)
+        return result
+
+    def stats(self):
+        """Статистика индекса
+
+        Returns:
+            :return Словарь: число ключей, всего пар, пар-кандидатов, отсеянных пар
+
+        """
+        keys_count = len(self)
+        total_pairs = keys_count * (keys_count - 1) // 2
+        candidate_pairs = sum(len(self.candidates(key)) for key in list(self.__keys) + self.__unindexed) // 2
+        return {'keys': keys_count,
+                'total_pairs': total_pairs,
+                'candidate_pairs': candidate_pairs,
+                'pruned_pairs': total_pairs - candidate_pairs,
+                'threshold': self.threshold}
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      numpy_line_cmp.py
+
+    @brief     Содержит векторизованное (NumPy) сравнение слов строк логов
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import functools
+import importlib.util
+
+# NumPy импортируется при первом сравнении (импорт заметно увеличивает время запуска)
+numpy = None
+
+
+def is_available():
+    """Проверка наличия NumPy (без импорта)
+
+    Returns:
+        :return True, если NumPy установлен
+
+    """
+    return numpy is not None or importlib.util.find_spec('numpy') is not None
+
+
+def _import_numpy():
+    """Импорт NumPy при первом использовании
+
+    Returns:
+        :return Модуль numpy
+
+    """
+    global numpy
+    if numpy is None:
+        import numpy
+    return numpy
+
+
+class NumpyLineComparator(object):
+    """Векторизованное сравнение всех пар слов для набора пар строк
+
+    Слова кодируются массивами кодов символов, дополненными до одной длины
+    (у первой и второй строки разные значения-заполнители, поэтому заполнители
+    никогда не совпадают). Для каждой пары слов за одну операцию считается
+    число совпавших позиций, процент схожести и число различий так же, как
+    в LogAnalyzer.__cmp_words, и применяются те же пороги (> 0.75 и < 4).
+
+    Пакет пар строк занимает (число строк x слов строки 1 x слов строки 2 x длина слова)
+    элементов, где число слов и длина слова - максимальные в пакете, поэтому пакет
+    завершается, как только этот объем превысит MAX_BATCH_ELEMENTS. Пара строк, которая
+    сама превышает MAX_BATCH_ELEMENTS (очень длинные слова), сравнивается без NumPy
+    через кэш сравнения слов словаря.
+
+    Attributes:
+        MAX_BATCH_ELEMENTS: максимальное число сравниваемых символов за одну операцию
+        CODES_CACHE_SIZE: размер кэша кодов символов слов по умолчанию
+        __vocabulary: словарь слов (TokenVocabulary)
+        __get_codes: кэшированное получение кодов символов слова по номеру
+
+    """
+
+    MAX_BATCH_ELEMENTS = 1 << 22
+
+    CODES_CACHE_SIZE = 1 << 16
+
+    # Значения-заполнители для слов первой и второй строки
+    __FIRST_PAD = -1
+    __SECOND_PAD = -2
+
+    def __init__(self, vocabulary, codes_cache_size=CODES_CACHE_SIZE):
+        """Конструктор класса
+
+        Attributes:
+            :arg vocabulary -- Словарь слов (TokenVocabulary)
+            :arg codes_cache_size -- Максимальное количество слов в кэше кодов символов
+
+        """
+        if not is_available():
+            raise ImportError(u'Для NumpyLineComparator необходим NumPy')
+        self.__vocabulary = vocabulary
+        self.__get_codes = functools.lru_cache(maxsize=codes_cache_size)(self.__word_codes)
+
+    def __word_codes(self, word_id):
+        """Получить коды символов слова (без кэша)
+
+        Attributes:
+            :arg word_id -- Номер слова в словаре
+
+        Returns:
+            :return Массив кодов символов (int32)
+
+        """
+        return numpy.frombuffer(self.__vocabulary.word(word_id).encode('utf-32-le'), dtype=numpy.uint32).astype(numpy.int32)
+
+    def __max_word_len(self, line_chunks):
+        """Максимальная длина слова строки
+
+        Attributes:
+            :arg line_chunks -- Строка: список (номер слова, количество)
+
+        Returns:
+            :return Длина самого длинного слова (0 для пустой строки)
+
+        """
+        word = self.__vocabulary.word
+        return max((len(word(word_id)) for word_id, _ in line_chunks), default=0)
+
+    def __match_line(self, first_chunks, second_chunks):
+        """Поиск похожих пар слов пары строк без NumPy (для строк, не помещающихся в пакет)
+
+        Attributes:
+            :arg first_chunks -- Строка первого лога: список (номер слова, количество)
+            :arg second_chunks -- Строка второго лога в том же формате
+
+        Returns:
+            :return Список (индекс слова 1, индекс слова 2, слова различаются)
+
+        """
+        cmp_ids = self.__vocabulary.cmp_ids
+        result = list()
+        for first_index, (first_id, _) in enumerate(first_chunks):
+            for second_index, (second_id, _) in enumerate(second_chunks):
+                ratio, diff = cmp_ids(first_id, second_id)
+                if ratio > 0.75 and diff < 4:
+                    result.append((first_index, second_index, ratio < 1.0))
+        return result
+
+    def __encode(self, lines_chunks, tokens_count, word_len, pad):
+        """Кодирование слов строк в массив (строка, слово, символ)
+
+        Attributes:
+            :arg lines_chunks -- Список строк: список (номер слова, количество)
+            :arg tokens_count -- Максимальное число слов в строке
+            :arg word_len -- Максимальная длина слова
+            :arg pad -- Значение-заполнитель
+
+        Returns:
+            :return (массив кодов символов, массив длин слов)
+
+        """
+        codes = numpy.full((len(lines_chunks), tokens_count, word_len), pad, dtype=numpy.int32)
+        lengths = numpy.zeros((len(lines_chunks), tokens_count), dtype=numpy.int64)
+        for line_id, chunks in enumerate(lines_chunks):
+            for token_id, (word_id, _) in enumerate(chunks):
+                word_codes = self.__get_codes(word_id)
+                codes[line_id, token_id, :len(word_codes)] = word_codes
+                lengths[line_id, token_id] = len(word_codes)
+        return codes, lengths
+
+    def __match_batch(self, first_lines, second_lines):
+        """Поиск похожих пар слов для пакета пар строк
+
+        Attributes:
+            :arg first_lines -- Строки первого лога
+            :arg second_lines -- Строки второго лога (той же длины)
+
+        Returns:
+            :return Список для каждой пары строк: список (индекс слова 1, индекс слова 2, слова различаются)
+
+        """
+        tokens1 = max(len(chunks) for chunks in first_lines)
+        tokens2 = max(len(chunks) for chunks in second_lines)
+        word_len = max(len(self.__get_codes(word_id)) for chunks in first_lines + second_lines for word_id, _ in chunks)
+        first_codes, first_lengths = self.__encode(first_lines, tokens1, word_len, self.__FIRST_PAD)
+        second_codes, second_lengths = self.__encode(second_lines, tokens2, word_len, self.__SECOND_PAD)
+        same = (first_codes[:, :, None, :] == second_codes[:, None, :, :]).sum(axis=3)
+        max_len = numpy.maximum(first_lengths[:, :, None], second_lengths[:, None, :])
+        valid = (first_lengths[:, :, None] > 0) & (second_lengths[:, None, :] > 0)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            ratio = same / max_len.astype(numpy.float64)
+        matched = valid & (ratio > 0.75) & ((max_len - same) < 4)
+        partial = ratio < 1.0
+        result = list()
+        for line_id in range(len(first_lines)):
+            rows, cols = numpy.nonzero(matched[line_id])
+            result.append([(int(row), int(col), bool(partial[line_id, row, col])) for row, col in zip(rows, cols)])
+        return result
+
+    def match_lines(self, first_lines, second_lines):
+        """Поиск похожих пар слов для каждой пары строк (строки сопоставляются по порядку)
+
+        Пары перечисляются в том же порядке, что и во вложенных циклах __cmp_lines.
+
+        Attributes:
+            :arg first_lines -- Строки первого лога: список строк, строка - список (номер слова, количество)
+            :arg second_lines -- Строки второго лога в том же формате
+
+        Returns:
+            :return Список для каждой пары строк: список (индекс слова 1, индекс слова 2, слова различаются)
+
+        """
+        _import_numpy()
+        lines_count = min(len(first_lines), len(second_lines))
+        result = list()
+        batch_start = 0
+        while batch_start < lines_count:
+            # Размер пакета ограничен, чтобы не выделять слишком большие массивы:
+            # учитываются максимальные в пакете число слов строк и длина слова
+            batch_end = batch_start
+            tokens1 = tokens2 = word_len = 1
+            oversized = False
+            while batch_end < lines_count:
+                line_tokens1 = max(tokens1, len(first_lines[batch_end]))
+                line_tokens2 = max(tokens2, len(second_lines[batch_end]))
+                line_word_len = max(word_len, self.__max_word_len(first_lines[batch_end]),
+                                    self.__max_word_len(second_lines[batch_end]))
+                elements = (batch_end - batch_start + 1) * line_tokens1 * line_tokens2 * line_word_len
+                if elements > self.MAX_BATCH_ELEMENTS:
+                    oversized = batch_end == batch_start
+                    if not oversized:
+                        break
+                tokens1, tokens2, word_len = line_tokens1, line_tokens2, line_word_len
+                batch_end += 1
+                if oversized:
+                    break
+            first_batch = first_lines[batch_start:batch_end]
+            second_batch = second_lines[batch_start:batch_end]
+            if oversized:
+                result.append(self.__match_line(first_batch[0], second_batch[0]))
+            elif any(first_batch) and any(second_batch):
+                result.extend(self.__match_batch(first_batch, second_batch))
+            else:
+                result.extend([list() for _ in first_batch])
+            batch_start = batch_end
+        return result
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      online_clusterer.py
+
+    @brief     Содержит пошаговую группировку логов упавших тестов по мере их появления
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import os
+import pickle
+import source.modules.autotesting.auto_log_analyzer.compressed_file as compressed_file
+import source.modules.autotesting.auto_log_analyzer.shingles_parser as shingles_parser
+
+
+class OnlineClusterer(object):
+    """Пошаговая группировка логов: каждый новый лог сравнивается только с представителями групп
+
+    Правило то же, что у жадного прохода cmp_all_logs: лог попадает в первую (по порядку
+    создания) группу, результат сравнения представителя которой с логом выше
+    SAME_LOGS_THRESHOLD, иначе лог становится представителем новой группы. Сравнение
+    с представителем прерывается, как только результат гарантированно не превысит
+    порог (cutoff cmp_profiles), а с представителями других FAIL строк заканчивается
+    на сравнении FAIL строк, поэтому стоимость добавления лога почти не зависит от числа
+    уже добавленных логов. Логи без FAIL строки не сравниваются и собираются в группу
+    UNRECOGNIZED.
+
+    В памяти хранятся только профили представителей групп. Промежуточный результат
+    доступен в любой момент (result) в формате результата cmp_all_logs, состояние
+    можно сохранить в файл и продолжить группировку после перезапуска.
+
+    Отличие от cmp_all_logs: там лог-представитель сравнивается и с частью логов,
+    добавленных раньше него, и лог может попасть в несколько групп; здесь каждый
+    лог принадлежит ровно одной группе.
+
+    Attributes:
+        FORMAT_VERSION: версия формата файла состояния
+        UNRECOGNIZED: ключ группы логов без FAIL строки
+        shingles_mode: режим сравнения по шинглам
+        __analyzer: движок сравнения логов (LogAnalyzer)
+        __clusters: список групп [ключ группы (FAIL строка), путь до представителя, {путь: (номер кейса, результат)}]
+        __unrecognized: логи без FAIL строки {путь: номер кейса}
+        __seen: пути уже добавленных логов
+        __profiles: профили представителей {путь: профиль лога} (загружаются при первом сравнении)
+
+    """
+
+    FORMAT_VERSION = 1
+
+    UNRECOGNIZED = u'unrecognized'
+
+    def __init__(self, analyzer, shingles_mode=shingles_parser.ShinglesParser.MODE_EXACT):
+        """Конструктор класса
+
+        Attributes:
+            :arg analyzer -- Движок сравнения логов (LogAnalyzer)
+            :arg shingles_mode -- Режим сравнения по шинглам (ShinglesParser.MODE_EXACT или MODE_MINHASH)
+
+        """
+        self.shingles_mode = shingles_mode
+        self.__analyzer = analyzer
+        self.__clusters = list()
+        self.__unrecognized = dict()
+        self.__seen = set()
+        self.__profiles = dict()
+
+    def __len__(self):
+        return len(self.__seen)
+
+    def __contains__(self, file_name):
+        return os.path.abspath(file_name) in self.__seen
+
+    @property
+    def clusters_count(self):
+        """Число групп (без группы логов без FAIL строки)"""
+        return len(self.__clusters)
+
+    def __get_rep_profile(self, path):
+        """Получить профиль представителя группы (при первом обращении после загрузки состояния читается файл)"""
+        profile = self.__profiles.get(path)
+        if profile is None:
+            profile = self.__analyzer.get_log_profile(None, path, cache=False)
+            self.__profiles[path] = profile
+        return profile
+
+    def add(self, file_name):
+        """Добавление лога
+
+        Attributes:
+            :arg file_name -- Путь до лога
+
+        Returns:
+            :return (ключ группы, результат сравнения с представителем) или None, если файл
+                    не найден или уже добавлен
+
+        """
+        file_name = os.path.abspath(file_name)
+        if file_name in self.__seen:
+            return None
+        profile = self.__analyzer.get_log_profile(None, file_name, cache=False)
+        if not profile:
+            return None
+        self.__seen.add(file_name)
+        if not profile.fail_line:
+            self.__unrecognized[file_name] = profile.case_id
+            return (self.UNRECOGNIZED, 1.0)
+        dev_log_dir = os.path.dirname(file_name)
+        dev_log_index = self.__analyzer.get_device_log_index(dev_log_dir)
+        if profile.case_id is not None and dev_log_index.get_path(profile.case_id) is None:
+            # Лог устройства мог появиться после построения индекса
+            dev_log_index.refresh()
+        threshold = self.__analyzer.SAME_LOGS_THRESHOLD
+        for cluster in self.__clusters:
+            rep_profile = self.__get_rep_profile(cluster[1])
+            if not rep_profile:
+                continue
+            cmp_result = self.__analyzer.cmp_profiles(rep_profile, profile, os.path.dirname(cluster[1]),
+                                                      second_dev_log_dir=dev_log_dir, shingles_mode=self.shingles_mode, cutoff=threshold)
+            if cmp_result > threshold:
+                cluster[2][file_name] = (profile.case_id, cmp_result)
+                return (cluster[0], cmp_result)
+        self.__clusters.append([profile.fail_line, file_name, {file_name: (profile.case_id, 1.0)}])
+        self.__profiles[file_name] = profile
+        return (profile.fail_line, 1.0)
+
+    def poll(self, file_dir):
+        """Добавление логов директории, которые еще не добавлены (в порядке имен файлов)
+
+        Лог добавляется один раз, поэтому он должен появляться в директории целиком
+        (create_logs_from_run пишет лог во временный файл .tmp и переносит его через os.replace).
+
+        Attributes:
+            :arg file_dir -- Директория логов
+
+        Returns:
+            :return Список (путь до лога, ключ группы, результат) добавленных логов
+
+        """
+        added = list()
+        if not os.path.isdir(file_dir):
+            return added
+        for file in sorted(os.listdir(file_dir)):
+            file = os.path.abspath(os.path.join(file_dir, file))
+            if not compressed_file.is_log_file(file) or file in self.__seen or not os.path.isfile(file):
+                continue
+            assignment = self.add(file)
+            if assignment:
+                added.append((file,) + assignment)
+        return added
+
+    def result(self):
+        """Промежуточный результат
+
+        Returns:
+            :return Словарь {FAIL строка представителя: {номер кейса: результат}} в формате
+                    cmp_all_logs (группы с одинаковой FAIL строкой перекрываются, как в cmp_all_logs)
+
+        """
+        interim_dict = dict()
+        for key, _, members in self.__clusters:
+            interim_dict.update({key: dict(members.values())})
+        if self.__unrecognized:
+            interim_dict.update({self.UNRECOGNIZED: dict((case_id, 1.0) for case_id in self.__unrecognized.values())})
+        return interim_dict
+
+    def save(self, path):
+        """Сохранение состояния в файл (через временный файл)
+
+        Attributes:
+            :arg path -- Путь до файла состояния
+
+        """
+        data = {'version': self.FORMAT_VERSION,
+                'shingles_mode': self.shingles_mode,
+                'clusters': self.__clusters,
+                'unrecognized': self.__unrecognized,
+                'seen': self.__seen}
+        tmp_path = '%s.tmp' % path
+        with open(tmp_path, 'wb') as state_file:
+            pickle.dump(data, state_file, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, analyzer):
+        """Загрузка состояния из файла
+
+        Attributes:
+            :arg path -- Путь до файла состояния
+            :arg analyzer -- Движок сравнения логов (LogAnalyzer)
+
+        Returns:
+            :return Группировка (OnlineClusterer); пустая, если файла нет или формат устарел
+
+        """
+        if not os.path.isfile(path):
+            return cls(analyzer)
+        with open(path, 'rb') as state_file:
+            data = pickle.load(state_file)
+        if data.get('version') != cls.FORMAT_VERSION:
+            return cls(analyzer)
+        clusterer = cls(analyzer, data['shingles_mode'])
+        clusterer.__clusters = data['clusters']
+        clusterer.__unrecognized = data['unrecognized']
+        clusterer.__seen = data['seen']
+        return clusterer
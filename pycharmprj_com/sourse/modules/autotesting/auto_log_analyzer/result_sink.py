@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      result_sink.py
+
+    @brief     Содержит буферизованный вывод результатов сравнения логов в файл
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import json
+import threading
+
+
+class ResultSink(object):
+    """Вывод результатов сравнения в файл, открытый на все время задачи
+
+    Файл открывается один раз на дозапись и пишется через буфер; буфер сбрасывается
+    при закрытии (в том числе при прерывании задачи исключением) или через flush.
+    Сообщения (write_text) и записи (write_record) выводятся в зависимости от формата:
+    текстовый формат выводит сообщения в том же виде, что и раньше, формат JSON Lines -
+    по одной записи (JSON объект) в строке.
+
+    Attributes:
+        FORMAT_TEXT: текстовый формат (сообщения)
+        FORMAT_JSONL: формат JSON Lines (записи о группах и результатах сравнения пар)
+        BUFFER_SIZE: размер буфера по умолчанию
+        path: путь до файла
+        output_format: формат вывода
+        __file: открытый файл (None - закрыт)
+        __lock: блокировка записи
+
+    """
+
+    FORMAT_TEXT = 'text'
+    FORMAT_JSONL = 'jsonl'
+
+    BUFFER_SIZE = 1 << 16
+
+    def __init__(self, path, output_format=FORMAT_TEXT, buffer_size=BUFFER_SIZE):
+        """Конструктор класса
+
+        Attributes:
+            :arg path -- Путь до файла (открывается на дозапись)
+            :arg output_format -- Формат вывода (FORMAT_TEXT или FORMAT_JSONL)
+            :arg buffer_size -- Размер буфера
+
+        """
+        if output_format not in (self.FORMAT_TEXT, self.FORMAT_JSONL):
+            raise ValueError(u'Неизвестный формат вывода: %s' % str(output_format))
+        self.path = path
+        self.output_format = output_format
+        self.__lock = threading.Lock()
+        if output_format == self.FORMAT_JSONL:
+            self.__file = open(path, 'a', buffering=buffer_size, encoding='utf-8')
+        else:
+            # Кодировка по умолчанию, как у прежней дозаписи сообщений
+            self.__file = open(path, 'a', buffering=buffer_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __repr__(self):
+        # В логе параметров (LogAnalyzer.__log_print) выводится путь, как раньше
+        return repr(self.path)
+
+    @property
+    def closed(self):
+        """Файл закрыт"""
+        return self.__file is None
+
+    def write_text(self, data):
+        """Вывод сообщения (только в текстовом формате)
+
+        Attributes:
+            :arg data -- Сообщение
+
+        """
+        if self.output_format != self.FORMAT_TEXT:
+            return
+        with self.__lock:
+            if self.__file:
+                self.__file.write(data)
+
+    def write_record(self, record):
+        """Вывод записи (только в формате JSON Lines)
+
+        Attributes:
+            :arg record -- Словарь (сериализуется в JSON)
+
+        """
+        if self.output_format != self.FORMAT_JSONL:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self.__lock:
+            if self.__file:
+                self.__file.write(line)
+
+    def flush(self):
+        """Сброс буфера в файл"""
+        with self.__lock:
+            if self.__file:
+                self.__file.flush()
+
+    def close(self):
+        """Сброс буфера и закрытие файла"""
+        with self.__lock:
+            if self.__file:
+                self.__file.close()
+                self.__file = None
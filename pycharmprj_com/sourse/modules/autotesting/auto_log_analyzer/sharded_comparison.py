@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      sharded_comparison.py
+
+    @brief     Содержит разбиение сравнения логов прогона на независимые части и сборку результата
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import collections
+import json
+import os
+import time
+import source.modules.autotesting.auto_log_analyzer.compressed_file as compressed_file
+import source.modules.autotesting.auto_log_analyzer.fail_prefilter as fail_prefilter
+import source.modules.autotesting.auto_log_analyzer.shingles_parser as shingles_parser
+
+
+class ShardedComparison(object):
+    """Сравнение логов прогона частями (шардами) на разных процессах или машинах
+
+    Результат жадного прохода cmp_all_logs определяется строками сравнения логов-представителей:
+    лог-представитель сравнивается со всеми логами прогона, начиная с номера, равного числу
+    уже найденных представителей, и забирает в свою группу логи с результатом выше
+    SAME_LOGS_THRESHOLD. Поэтому проход раскладывается на две части:
+
+    - шард (run_shard) строит строки сравнения для логов своей части прогона. Логи делятся
+      на группы по нормализованной FAIL строке (FailPrefilter.normalize), группы распределяются
+      по шардам одинаково на всех машинах (список логов упорядочен по имени). Внутри своих
+      групп шард повторяет жадный проход и строит строки только для логов, которые не попали
+      в группу раньше, сравнивая их со всеми логами прогона. В файл частичного результата
+      записываются номера логов и результаты выше порога;
+    - сборка (merge) повторяет жадный проход по всем логам, беря строки из частичных
+      результатов. Если строки нужного представителя нет (шард посчитал лог уже
+      сгруппированным, а при общем проходе он оказался представителем), строка считается
+      при сборке, поэтому результат всегда совпадает с cmp_all_logs(sort_files=True).
+
+    Attributes:
+        FORMAT_VERSION: версия формата файла частичного результата
+        UNRECOGNIZED: ключ группы лога без FAIL строки
+        shingles_mode: режим сравнения по шинглам
+        __analyzer: движок сравнения логов (LogAnalyzer)
+        __merge_stats: статистика последней сборки
+
+    """
+
+    FORMAT_VERSION = 1
+
+    UNRECOGNIZED = u'unrecognized'
+
+    def __init__(self, analyzer, shingles_mode=shingles_parser.ShinglesParser.MODE_EXACT):
+        """Конструктор класса
+
+        Attributes:
+            :arg analyzer -- Движок сравнения логов (LogAnalyzer)
+            :arg shingles_mode -- Режим сравнения по шинглам (ShinglesParser.MODE_EXACT или MODE_MINHASH)
+
+        """
+        self.shingles_mode = shingles_mode
+        self.__analyzer = analyzer
+        self.__merge_stats = dict()
+
+    @staticmethod
+    def discover(file_dir):
+        """Список логов прогона в порядке имен (одинаковый на всех машинах)
+
+        Attributes:
+            :arg file_dir -- Директория логов прогона
+
+        Returns:
+            :return Список путей до логов
+
+        """
+        if not os.path.isdir(file_dir):
+            return list()
+        files = [os.path.join(file_dir, file) for file in sorted(os.listdir(file_dir))]
+        return [file for file in files if os.path.isfile(file) and compressed_file.is_log_file(file)]
+
+    def __load_profiles(self, files):
+        """Профили логов (без сохранения в кэше движка)
+
+        Attributes:
+            :arg files -- Список путей до логов
+
+        Returns:
+            :return Список профилей (None - файл не найден)
+
+        """
+        return [self.__analyzer.get_log_profile(None, file, cache=False) for file in files]
+
+    def __assign_buckets(self, profiles, shard_count):
+        """Распределение групп логов с одинаковой нормализованной FAIL строкой по шардам
+
+        Группы распределяются от больших к меньшим в наименее загруженный шард,
+        поэтому распределение одинаково при одинаковом списке логов.
+
+        Attributes:
+            :arg profiles -- Список профилей логов
+            :arg shard_count -- Число шардов
+
+        Returns:
+            :return Список номеров шардов для каждого лога (None - лог без FAIL строки)
+
+        """
+        buckets = collections.OrderedDict()
+        for file_id, profile in enumerate(profiles):
+            if profile and profile.fail_line:
+                key = ' '.join(sorted(fail_prefilter.FailPrefilter.normalize(profile.fail_line).split()))
+                buckets.setdefault(key, list()).append(file_id)
+        loads = [0] * shard_count
+        shards = [None] * len(profiles)
+        for file_ids in sorted(buckets.values(), key=lambda ids: (-len(ids), ids[0])):
+            shard_index = min(range(shard_count), key=lambda index: (loads[index], index))
+            loads[shard_index] += len(file_ids)
+            for file_id in file_ids:
+                shards[file_id] = shard_index
+        return shards
+
+    def __build_row(self, seed_id, profiles, file_dir):
+        """Строка сравнения лога-представителя со всеми логами прогона
+
+        Attributes:
+            :arg seed_id -- Номер лога-представителя
+            :arg profiles -- Список профилей логов
+            :arg file_dir -- Директория логов (и логов устройства)
+
+        Returns:
+            :return Список [номер лога, результат] логов с результатом выше порога (по возрастанию номера)
+
+        """
+        threshold = self.__analyzer.SAME_LOGS_THRESHOLD
+        seed_profile = profiles[seed_id]
+        row = list()
+        for file_id, profile in enumerate(profiles):
+            # Результат сравнения с логом без FAIL строки равен 0
+            if not profile or not profile.fail_line:
+                continue
+            cmp_result = self.__analyzer.cmp_profiles(seed_profile, profile, file_dir,
+                                                      shingles_mode=self.shingles_mode, cutoff=threshold)
+            if cmp_result > threshold:
+                row.append([file_id, cmp_result])
+        return row
+
+    def run_shard(self, file_dir, shard_index, shard_count, path):
+        """Построение строк сравнения для логов шарда и запись частичного результата
+
+        Attributes:
+            :arg file_dir -- Директория логов прогона
+            :arg shard_index -- Номер шарда (0 - shard_count - 1)
+            :arg shard_count -- Число шардов
+            :arg path -- Файл частичного результата (JSON)
+
+        Returns:
+            :return Статистика: files - логов в прогоне, shard_files - логов шарда, rows - построено строк,
+                    time - время, с
+
+        """
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(u'Неверный номер шарда: %d из %d' % (shard_index, shard_count))
+        start_time = time.perf_counter()
+        files = self.discover(file_dir)
+        profiles = self.__load_profiles(files)
+        shards = self.__assign_buckets(profiles, shard_count)
+        shard_files = [file_id for file_id, shard in enumerate(shards) if shard == shard_index]
+        shard_set = set(shard_files)
+        # Жадный проход по логам шарда: лог попадает в группу, только если он стоит после
+        # представителя, то есть гарантированно входит в его строку при общем проходе
+        grouped = set()
+        rows = list()
+        for file_id in shard_files:
+            if file_id in grouped:
+                continue
+            row = self.__build_row(file_id, profiles, file_dir)
+            rows.append([file_id, row])
+            grouped.update(cmp_id for cmp_id, _ in row if cmp_id > file_id and cmp_id in shard_set)
+        stats = {'files': len(files),
+                 'shard_files': len(shard_files),
+                 'rows': len(rows),
+                 'time': time.perf_counter() - start_time}
+        data = {'version': self.FORMAT_VERSION,
+                'run': file_dir,
+                'files': [os.path.basename(file) for file in files],
+                'shard_index': shard_index,
+                'shard_count': shard_count,
+                'shingles_mode': self.shingles_mode,
+                'threshold': self.__analyzer.SAME_LOGS_THRESHOLD,
+                'rows': rows,
+                'stats': stats}
+        tmp_path = '%s.tmp' % path
+        with open(tmp_path, 'w', encoding='utf-8') as result_file:
+            json.dump(data, result_file)
+        os.replace(tmp_path, path)
+        return stats
+
+    def __load_shards(self, paths, names):
+        """Загрузка и проверка частичных результатов
+
+        Attributes:
+            :arg paths -- Файлы частичных результатов
+            :arg names -- Имена логов прогона (в порядке discover)
+
+        Returns:
+            :return Словарь {номер лога-представителя: строка}
+
+        """
+        rows = dict()
+        shard_indexes = set()
+        shard_count = None
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as result_file:
+                data = json.load(result_file)
+            if data.get('version') != self.FORMAT_VERSION:
+                raise ValueError(u'Неподдерживаемая версия файла %s' % path)
+            if data['files'] != names:
+                raise ValueError(u'Список логов в %s не совпадает с логами прогона' % path)
+            if data['shingles_mode'] != self.shingles_mode or data['threshold'] != self.__analyzer.SAME_LOGS_THRESHOLD:
+                raise ValueError(u'Параметры сравнения в %s отличаются' % path)
+            if shard_count is None:
+                shard_count = data['shard_count']
+            if data['shard_count'] != shard_count or data['shard_index'] in shard_indexes:
+                raise ValueError(u'Шард %d из %d (%s) не подходит к остальным'
+                                 % (data['shard_index'], data['shard_count'], path))
+            shard_indexes.add(data['shard_index'])
+            rows.update((seed_id, row) for seed_id, row in data['rows'])
+        if shard_count is None or len(shard_indexes) != shard_count:
+            raise ValueError(u'Получены не все шарды: %d из %s' % (len(shard_indexes), shard_count))
+        return rows
+
+    def merge(self, file_dir, paths):
+        """Сборка результата из частичных результатов всех шардов
+
+        Attributes:
+            :arg file_dir -- Директория логов прогона
+            :arg paths -- Файлы частичных результатов
+
+        Returns:
+            :return Результирующие данные (как у cmp_all_logs с sort_files=True) или None, если логов нет
+
+        """
+        start_time = time.perf_counter()
+        files = self.discover(file_dir)
+        if not files:
+            return None
+        rows = self.__load_shards(paths, [os.path.basename(file) for file in files])
+        profiles = self.__load_profiles(files)
+        interim_dict = dict()
+        grouped = set()
+        seeds_count = 0
+        missing_rows = 0
+        for file_id, profile in enumerate(profiles):
+            if file_id in grouped:
+                continue
+            seeds_count += 1
+            # Лог-представитель сравнивается с логами, начиная с номера, равного числу представителей
+            first_cmp_id = seeds_count
+            cmp_case_dict = {profile.case_id if profile else None: 1.0}
+            if profile and profile.fail_line:
+                row = rows.get(file_id)
+                if row is None:
+                    missing_rows += 1
+                    row = self.__build_row(file_id, profiles, file_dir)
+                for cmp_id, cmp_result in row:
+                    if cmp_id >= first_cmp_id:
+                        cmp_case_dict[profiles[cmp_id].case_id] = cmp_result
+                        grouped.add(cmp_id)
+            interim_dict[profile.fail_line if profile and profile.fail_line else self.UNRECOGNIZED] = cmp_case_dict
+        self.__merge_stats = {'files': len(files),
+                              'shards': len(paths),
+                              'rows': len(rows),
+                              'seeds': seeds_count,
+                              'missing_rows': missing_rows,
+                              'time': time.perf_counter() - start_time}
+        return interim_dict
+
+    def get_merge_stats(self):
+        """Статистика последней сборки
+
+        Returns:
+            :return Словарь: files - логов, shards - шардов, rows - строк в частичных результатах,
+                    seeds - логов-представителей, missing_rows - строк, посчитанных при сборке, time - время, с
+
+        """
+        return dict(self.__merge_stats)
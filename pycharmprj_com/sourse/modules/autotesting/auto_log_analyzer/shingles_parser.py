@@ -10,28 +10,253 @@
 
 """
 
+import array
 import binascii
+import collections
+import math
+import random
+import source.modules.autotesting.auto_log_analyzer.compressed_file as compressed_file
 from source.modules.autotesting.logger_api import *
 
+class ShingleFingerprint(object):
+    """Отпечаток текста: мультимножество хэшей шинглов
+
+    Хранит количество вхождений каждого шингла, поэтому сравнение выполняется
+    за O(n + m) через хэш-таблицу вместо поиска по списку.
+
+    Attributes:
+        __counts: словарь {хэш шингла: количество вхождений}
+        __size: общее количество шинглов (с учетом повторов)
+
+    """
+
+    def __init__(self, shingles=()):
+        """Конструктор класса
+
+        Attributes:
+            :arg shingles -- Список хэшированных шинглов
+
+        """
+        self.__counts = collections.Counter(shingles)
+        self.__size = sum(self.__counts.values())
+
+    def __len__(self):
+        return self.__size
+
+    def update(self, shingles):
+        """Добавление шинглов в отпечаток (для построения по частям)
+
+        Attributes:
+            :arg shingles -- Список хэшированных шинглов
+
+        """
+        self.__counts.update(shingles)
+        self.__size += len(shingles)
+
+    @property
+    def counts(self):
+        """Словарь {хэш шингла: количество вхождений}"""
+        return self.__counts
+
+    def similarity(self, other):
+        """Сравнение отпечатков (коэффициент Дайса)
+
+        Повторы шинглов считаются так же, как в исходном алгоритме: каждый шингл
+        более короткого текста (при равной длине - первого), найденный во втором
+        тексте, учитывается столько раз, сколько он встречается.
+
+        Attributes:
+            :arg other -- Второй отпечаток
+
+        Returns:
+            :return Результат сравнения в процентах
+
+        """
+        if len(self) < 1 or len(other) < 1:
+            return 0.0
+        shorter, longer = (other, self) if len(self) > len(other) else (self, other)
+        longer_counts = longer.counts
+        same = sum(count for shingle, count in shorter.counts.items() if shingle in longer_counts)
+        return same * 2 / float(len(self) + len(other))
+
+
+class MinHashSignature(object):
+    """MinHash сигнатура текста фиксированного размера
+
+    Оценка сходства строится только по сигнатурам: доля совпавших минимумов
+    оценивает коэффициент Жаккара J множеств шинглов, который переводится
+    в коэффициент Дайса D = 2J / (1 + J), используемый в cmp_texts.
+
+    Погрешность: стандартное отклонение оценки D не превышает 0.56 / sqrt(k),
+    где k - число перестановок (ERROR_BOUND_SIGMA). Для k = 128 это ~0.05,
+    с вероятностью 99.7% отклонение от D по множествам не больше 3 сигм (error_bound).
+    Точный cmp_texts учитывает повторы шинглов, поэтому на текстах с большим
+    количеством повторов возможно дополнительное смещение.
+
+    Attributes:
+        ERROR_BOUND_SIGMA: коэффициент стандартного отклонения оценки
+        __values: минимальные значения хэшей по каждой перестановке
+        __params: параметры построения (число перестановок, seed, способ хэширования и длина шингла)
+
+    """
+
+    ERROR_BOUND_SIGMA = 0.56
+
+    def __init__(self, values, params):
+        """Конструктор класса
+
+        Attributes:
+            :arg values -- Минимальные значения хэшей по каждой перестановке (пустой список для пустого текста)
+            :arg params -- Параметры построения (число перестановок, seed, способ хэширования и длина шингла)
+
+        """
+        self.__values = array.array('Q', values)
+        self.__params = params
+
+    def __len__(self):
+        return len(self.__values)
+
+    @property
+    def values(self):
+        """Минимальные значения хэшей по каждой перестановке"""
+        return self.__values
+
+    @property
+    def params(self):
+        """Параметры построения (число перестановок, seed, способ хэширования и длина шингла)"""
+        return self.__params
+
+    @staticmethod
+    def error_bound(num_perm):
+        """Граница погрешности оценки (3 сигмы)
+
+        Attributes:
+            :arg num_perm -- Число перестановок
+
+        Returns:
+            :return Максимальное ожидаемое отклонение оценки от точного значения
+
+        """
+        return 3 * MinHashSignature.ERROR_BOUND_SIGMA / math.sqrt(num_perm)
+
+    def jaccard(self, other):
+        """Оценка коэффициента Жаккара
+
+        Attributes:
+            :arg other -- Вторая сигнатура
+
+        Returns:
+            :return Доля совпавших минимумов
+
+        """
+        if self.__params != other.params:
+            raise ValueError(u'Сигнатуры построены с разными параметрами (%s, %s)' % (self.__params, other.params))
+        if len(self) < 1 or len(other) < 1:
+            return 0.0
+        same = sum(1 for first, second in zip(self.__values, other.values) if first == second)
+        return same / float(len(self))
+
+    def similarity(self, other):
+        """Оценка сходства (коэффициент Дайса)
+
+        Attributes:
+            :arg other -- Вторая сигнатура
+
+        Returns:
+            :return Результат сравнения в процентах
+
+        """
+        jaccard = self.jaccard(other)
+        return 2 * jaccard / (1.0 + jaccard)
+
+
 class ShinglesParser(object):
     """Класс, предназначенный для автоматического парсинга логов тестов по алгоритму Шинглов
 
+    Хэши шинглов по умолчанию считаются скользящим полиномиальным хэшем (HASH_ROLLING):
+    каждое слово хэшируется один раз, хэш следующего окна получается из предыдущего
+    за O(1). Режим HASH_CRC32 дает прежние значения CRC32 от строки шингла
+    (для совместимости с ранее сохраненными отпечатками).
+
     Attributes:
-        SHINGLE_LEN: длина шингла
+        SHINGLE_LEN: длина шингла по умолчанию
+        STREAM_CHUNK_SIZE: размер части файла (символов) при потоковом построении отпечатка и сигнатуры
+        MAX_WORD_LEN: максимальная длина слова (символов); более длинное слово режется на части этой длины
+        MINHASH_PERMUTATIONS: число перестановок MinHash по умолчанию
+        MINHASH_SEED: seed генератора перестановок MinHash
+        MODE_EXACT: точное сравнение по полному набору шинглов
+        MODE_MINHASH: оценка сходства по MinHash сигнатурам
+        HASH_ROLLING: скользящий полиномиальный хэш шинглов по модулю 2^61 - 1
+        HASH_CRC32: CRC32 от строки шингла (совместимый режим)
         __logger: ссылка на logger
+        __shingle_len: длина шингла
+        __hash_mode: способ хэширования шинглов
+        __permutations: коэффициенты перестановок (a, b) для MinHash
 
     """
 
     SHINGLE_LEN = 10
 
-    def __init__(self, logger:LoggerApi=None):
+    STREAM_CHUNK_SIZE = 1 << 18
+
+    MAX_WORD_LEN = 4096
+
+    MINHASH_PERMUTATIONS = 128
+    MINHASH_SEED = 1
+
+    MODE_EXACT = 'exact'
+    MODE_MINHASH = 'minhash'
+
+    HASH_ROLLING = 'rolling'
+    HASH_CRC32 = 'crc32'
+
+    # Простое число Мерсенна 2^61 - 1 для универсального хэширования
+    __MERSENNE_PRIME = (1 << 61) - 1
+
+    # Основание полиномиального хэша шинглов
+    __ROLLING_BASE = 0x5bd1e995
+
+    def __init__(self, logger:LoggerApi=None, num_perm=MINHASH_PERMUTATIONS, shingle_len=SHINGLE_LEN, hash_mode=HASH_ROLLING):
         """Конструктор класса
 
         Attributes:
             :arg logger -- Ссылка на logger
+            :arg num_perm -- Число перестановок MinHash (размер сигнатуры)
+            :arg shingle_len -- Длина шингла (число слов)
+            :arg hash_mode -- Способ хэширования шинглов (HASH_ROLLING или HASH_CRC32)
 
         """
+        if shingle_len < 1:
+            raise ValueError(u'Длина шингла должна быть положительной (%d)' % shingle_len)
+        if hash_mode not in (self.HASH_ROLLING, self.HASH_CRC32):
+            raise ValueError(u'Неизвестный способ хэширования шинглов: %s' % str(hash_mode))
         self.__logger = logger
+        self.__num_perm = num_perm
+        self.__shingle_len = shingle_len
+        self.__hash_mode = hash_mode
+        generator = random.Random(self.MINHASH_SEED)
+        self.__permutations = [(generator.randint(1, self.__MERSENNE_PRIME - 1), generator.randint(0, self.__MERSENNE_PRIME - 1))
+                               for _ in range(num_perm)]
+
+    @property
+    def num_perm(self):
+        """Число перестановок MinHash"""
+        return self.__num_perm
+
+    @property
+    def shingle_len(self):
+        """Длина шингла"""
+        return self.__shingle_len
+
+    @property
+    def hash_mode(self):
+        """Способ хэширования шинглов"""
+        return self.__hash_mode
+
+    @property
+    def config(self):
+        """Строка параметров построения шинглов и сигнатур (для проверки совместимости сохраненных данных)"""
+        return '%s:%d:%d:%d' % (self.__hash_mode, self.__shingle_len, self.__num_perm, self.MINHASH_SEED)
 
     def __log_print(self,
                     log_level,
@@ -52,9 +277,31 @@ class ShinglesParser(object):
         else:
             self.__logger.trace_log(u'LOG PARSER :: %s %s' % (data, str(**kwargs)))
 
+    def __split_long_words(self, source):
+        """Разрезание слов длиннее MAX_WORD_LEN на части по MAX_WORD_LEN символов (от начала слова)
+
+        Attributes:
+            :arg source -- Текст
+
+        Returns:
+            :return Список слов текста в нижнем регистре
+
+        """
+        max_len = self.MAX_WORD_LEN
+        words = list()
+        for word in source.split():
+            if len(word) > max_len:
+                words.extend(word[i:i + max_len].lower() for i in range(0, len(word), max_len))
+            else:
+                words.append(word.lower())
+        return words
+
     def __canonize(self, source):
         """Канонизация текста (чистка от стоп-слов/стоп-символов)
 
+        Слова длиннее MAX_WORD_LEN (например, дамп без пробелов) режутся на части,
+        чтобы потоковая канонизация хранила между частями текста ограниченный остаток.
+
         Attributes:
             :arg source -- Текст
 
@@ -77,7 +324,78 @@ class ShinglesParser(object):
                       u'LOG_DEBUG', u'LOG_INFO',
                       u'LOG_TRACE')
 
-        return ([x for x in [y.strip(stop_symbols) for y in source.lower().split()] if x and (x not in stop_words)])
+        words = source.lower().split()
+        if len(source) > self.MAX_WORD_LEN and any(len(word) > self.MAX_WORD_LEN for word in words):
+            words = self.__split_long_words(source)
+
+        return ([x for x in [y.strip(stop_symbols) for y in words] if x and (x not in stop_words)])
+
+    def __canonize_chunks(self, chunks):
+        """Потоковая канонизация текста, поступающего частями
+
+        Слово, разрезанное границей части, переносится в следующую часть целиком,
+        поэтому результат совпадает с канонизацией всего текста. От слова длиннее
+        MAX_WORD_LEN переносится только неполная последняя часть (полные части
+        канонизируются сразу, как в __canonize), поэтому перенос не превышает
+        MAX_WORD_LEN символов, а текст без пробелов обрабатывается за линейное время.
+
+        Attributes:
+            :arg chunks -- Итератор частей текста
+
+        Returns:
+            :return Итератор списков канонизированных слов каждой части
+
+        """
+        carry = ''
+        for chunk in chunks:
+            text = carry + chunk
+            carry = ''
+            if text and not text[-1].isspace():
+                carry = text.rsplit(None, 1)[-1]
+                text = text[:len(text) - len(carry)]
+                cut = len(carry) - len(carry) % self.MAX_WORD_LEN
+                if cut:
+                    text += ' '.join(carry[i:i + self.MAX_WORD_LEN] for i in range(0, cut, self.MAX_WORD_LEN))
+                    carry = carry[cut:]
+            yield self.__canonize(text)
+        if carry:
+            yield self.__canonize(carry)
+
+    def __gen_chunk_shingles(self, chunks):
+        """Потоковое разбиение текста, поступающего частями, на шинглы
+
+        К словам каждой части добавляются последние SHINGLE_LEN - 1 слов предыдущих
+        частей, поэтому шинглы на границах частей не теряются и не повторяются.
+
+        Attributes:
+            :arg chunks -- Итератор частей текста
+
+        Returns:
+            :return Итератор массивов хэшированных шинглов каждой части
+
+        """
+        tail = list()
+        for words in self.__canonize_chunks(chunks):
+            if not words:
+                continue
+            source = tail + words
+            yield self.__gen_shingle(source)
+            tail = source[max(0, len(source) - (self.__shingle_len - 1)):]
+
+    def __read_chunks(self, path, chunk_size):
+        """Чтение файла частями (сжатый файл распаковывается потоком, compressed_file)
+
+        Attributes:
+            :arg path -- Путь до файла
+            :arg chunk_size -- Размер части (символов)
+
+        Returns:
+            :return Итератор частей текста
+
+        """
+        with compressed_file.open_file(path, 'r') as stream_file:
+            for chunk in iter(lambda: stream_file.read(chunk_size), ''):
+                yield chunk
 
     def __gen_shingle(self, source):
         """Разбиение текста на шинглы
@@ -86,44 +404,175 @@ class ShinglesParser(object):
             :arg source -- Текст
 
         Returns:
-            :return Список (хэшированные шинглы)
+            :return Массив хэшированных шинглов
 
         """
-        out = []
-        for i in range(len(source) - (self.SHINGLE_LEN - 1)):
-            out.append(binascii.crc32(' '.join([x for x in source[i:i + self.SHINGLE_LEN]]).encode('utf-8')))
+        if self.__hash_mode == self.HASH_CRC32:
+            return self.__gen_crc32_shingle(source)
+        return self.__gen_rolling_shingle(source)
+
+    def __gen_crc32_shingle(self, source):
+        """Разбиение текста на шинглы с хэшированием CRC32 строки шингла (совместимый режим)
+
+        Attributes:
+            :arg source -- Текст
+
+        Returns:
+            :return Массив хэшированных шинглов
+
+        """
+        out = array.array('Q')
+        for i in range(len(source) - (self.__shingle_len - 1)):
+            out.append(binascii.crc32(' '.join([x for x in source[i:i + self.__shingle_len]]).encode('utf-8')))
         return out
 
-    def __compaire(self, source1, source2):
-        """Сравнение текстов
+    def __gen_rolling_shingle(self, source):
+        """Разбиение текста на шинглы со скользящим полиномиальным хэшем
+
+        Хэш окна - полином от хэшей слов (CRC32 слова + 1) по модулю 2^61 - 1.
+        Каждое различное слово хэшируется один раз, переход к следующему окну
+        выполняется за O(1).
+
+        Attributes:
+            :arg source -- Текст
+
+        Returns:
+            :return Массив хэшированных шинглов
+
+        """
+        out = array.array('Q')
+        shingle_len = self.__shingle_len
+        if len(source) < shingle_len:
+            return out
+        prime = self.__MERSENNE_PRIME
+        base = self.__ROLLING_BASE
+        word_hashes = dict()
+        hashes = list()
+        for word in source:
+            word_hash = word_hashes.get(word)
+            if word_hash is None:
+                word_hash = binascii.crc32(word.encode('utf-8')) + 1
+                word_hashes[word] = word_hash
+            hashes.append(word_hash)
+        high = pow(base, shingle_len - 1, prime)
+        value = 0
+        for word_hash in hashes[:shingle_len]:
+            value = (value * base + word_hash) % prime
+        out.append(value)
+        for i in range(shingle_len, len(hashes)):
+            value = ((value - hashes[i - shingle_len] * high) * base + hashes[i]) % prime
+            out.append(value)
+        return out
+
+    def fingerprint(self, text):
+        """Построение отпечатка текста по шинглам
 
         Attributes:
-            :arg source1 -- Текст 1
-            :arg source2 -- Текст 2
+            :arg text -- Текст
+
+        Returns:
+            :return Отпечаток текста (ShingleFingerprint)
+
+        """
+        if not text:
+            return ShingleFingerprint()
+        return ShingleFingerprint(self.__gen_shingle(self.__canonize(text)))
+
+    def cmp_fingerprints(self, fingerprint1, fingerprint2):
+        """Сравнение отпечатков текстов
+
+        Attributes:
+            :arg fingerprint1 -- Отпечаток текста 1
+            :arg fingerprint2 -- Отпечаток текста 2
 
         Returns:
             :return Результат сравнения в процентах
 
         """
-        same = 0
-        source_temp = None
-        if len(source1) < 1 or len(source2) < 1:
-            return 0.0
-        if len(source1) > len(source2):
-            source_temp = source1
-            source1 = source2
-            source2 = source_temp
-        for i in range(len(source1)):
-            if source1[i] in source2:
-                same = same + 1
-        return same * 2 / float(len(source1) + len(source2))
-
-    def cmp_texts(self, text1, text2):
+        return fingerprint1.similarity(fingerprint2)
+
+    def minhash(self, text):
+        """Построение MinHash сигнатуры текста
+
+        Attributes:
+            :arg text -- Текст
+
+        Returns:
+            :return Сигнатура текста (MinHashSignature)
+
+        """
+        params = (self.__num_perm, self.MINHASH_SEED, self.__hash_mode, self.__shingle_len)
+        shingles = set(self.__gen_shingle(self.__canonize(text))) if text else None
+        if not shingles:
+            return MinHashSignature((), params)
+        prime = self.__MERSENNE_PRIME
+        return MinHashSignature([min((a * shingle + b) % prime for shingle in shingles) for a, b in self.__permutations], params)
+
+    def fingerprint_file(self, path, chunk_size=STREAM_CHUNK_SIZE):
+        """Потоковое построение отпечатка текста файла по шинглам
+
+        Файл читается частями, в памяти хранятся только часть текста и счетчики шинглов.
+        Результат совпадает с fingerprint(текст файла).
+
+        Attributes:
+            :arg path -- Путь до файла
+            :arg chunk_size -- Размер части (символов)
+
+        Returns:
+            :return Отпечаток текста (ShingleFingerprint)
+
+        """
+        result = ShingleFingerprint()
+        for shingles in self.__gen_chunk_shingles(self.__read_chunks(path, chunk_size)):
+            result.update(shingles)
+        return result
+
+    def minhash_file(self, path, chunk_size=STREAM_CHUNK_SIZE):
+        """Потоковое построение MinHash сигнатуры текста файла
+
+        Файл читается частями, в памяти хранятся только часть текста и минимумы
+        по каждой перестановке. Результат совпадает с minhash(текст файла).
+
+        Attributes:
+            :arg path -- Путь до файла
+            :arg chunk_size -- Размер части (символов)
+
+        Returns:
+            :return Сигнатура текста (MinHashSignature)
+
+        """
+        params = (self.__num_perm, self.MINHASH_SEED, self.__hash_mode, self.__shingle_len)
+        prime = self.__MERSENNE_PRIME
+        values = None
+        for shingles in self.__gen_chunk_shingles(self.__read_chunks(path, chunk_size)):
+            shingles = set(shingles)
+            if not shingles:
+                continue
+            chunk_values = [min((a * shingle + b) % prime for shingle in shingles) for a, b in self.__permutations]
+            values = chunk_values if values is None else [min(value, chunk_value) for value, chunk_value
+                                                          in zip(values, chunk_values)]
+        return MinHashSignature(values or (), params)
+
+    def cmp_signatures(self, signature1, signature2):
+        """Оценка сходства текстов по MinHash сигнатурам
+
+        Attributes:
+            :arg signature1 -- Сигнатура текста 1
+            :arg signature2 -- Сигнатура текста 2
+
+        Returns:
+            :return Результат сравнения в процентах
+
+        """
+        return signature1.similarity(signature2)
+
+    def cmp_texts(self, text1, text2, mode=MODE_EXACT):
         """Сравнение текстов
 
         Attributes:
             :arg text1 -- Текст 1
             :arg text2 -- Текст 2
+            :arg mode -- Режим сравнения (MODE_EXACT или MODE_MINHASH)
 
         Returns:
             :return Результат сравнения в процентах
@@ -131,9 +580,9 @@ class ShinglesParser(object):
         """
         if not text1 or not text2:
             return 0.0
-        cmp1 = self.__gen_shingle(self.__canonize(text1))
-        cmp2 = self.__gen_shingle(self.__canonize(text2))
-        return self.__compaire(cmp1, cmp2)
+        if mode == self.MODE_MINHASH:
+            return self.cmp_signatures(self.minhash(text1), self.minhash(text2))
+        return self.cmp_fingerprints(self.fingerprint(text1), self.fingerprint(text2))
 
 if __name__ == '__main__':
     shingles = ShinglesParser()
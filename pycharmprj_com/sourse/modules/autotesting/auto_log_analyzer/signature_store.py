@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      signature_store.py
+
+    @brief     Содержит постоянное хранилище профилей логов и результатов сравнения прогона (SQLite)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+
+
+class SignatureStore(object):
+    """Хранилище профилей логов прогона в файле SQLite внутри директории прогона
+
+    Запись профиля привязана к пути, размеру, времени изменения и хэшу содержимого файла.
+    Если размер или время изменились, запись используется только при совпадении хэша
+    содержимого, иначе она считается устаревшей. Хэши содержимого файлов (в том числе логов
+    устройства, входящих в ключ результата) тоже сохраняются и считаются заново, только если
+    изменились размер или время изменения файла. Результаты сравнения хранятся в JSON.
+    При смене формата профилей или параметров шинглов (config) хранилище очищается.
+
+    Attributes:
+        STORE_NAME: имя файла хранилища в директории прогона
+        FORMAT_VERSION: версия формата записей
+        __connection: соединение с базой SQLite
+        __hashes: хэши содержимого файлов, полученные в этом сеансе (file_hash)
+        __current: файлы, записи которых в этом сеансе прочитаны как актуальные или записаны
+
+    """
+
+    STORE_NAME = '.auto_log_parser.sqlite3'
+    FORMAT_VERSION = 2
+
+    def __init__(self, run_dir, config=''):
+        """Конструктор класса
+
+        Attributes:
+            :arg run_dir -- Директория прогона
+            :arg config -- Строка параметров построения профилей (при изменении хранилище очищается)
+
+        """
+        self.__connection = sqlite3.connect(os.path.join(run_dir, self.STORE_NAME))
+        self.__hashes = dict()
+        self.__current = set()
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS profiles (path TEXT PRIMARY KEY, size INTEGER, '
+                                  'mtime_ns INTEGER, content_hash TEXT, data BLOB)')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS hashes (path TEXT PRIMARY KEY, size INTEGER, '
+                                  'mtime_ns INTEGER, content_hash TEXT)')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS results (run_key TEXT PRIMARY KEY, data TEXT)')
+        store_config = '%d:%s' % (self.FORMAT_VERSION, config)
+        row = self.__connection.execute('SELECT value FROM meta WHERE key = ?', ('config',)).fetchone()
+        if not row or row[0] != store_config:
+            self.__connection.execute('DELETE FROM profiles')
+            self.__connection.execute('DELETE FROM hashes')
+            self.__connection.execute('DELETE FROM results')
+            self.__connection.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('config', store_config))
+        self.__connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def content_hash(path):
+        """Хэш содержимого файла
+
+        Attributes:
+            :arg path -- Путь до файла
+
+        Returns:
+            :return Хэш SHA-1 (hex)
+
+        """
+        digest = hashlib.sha1()
+        with open(path, 'rb') as hashed_file:
+            for block in iter(lambda: hashed_file.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def file_hash(self, path):
+        """Хэш содержимого файла с сохранением в хранилище
+
+        Сохраненный хэш используется, пока не изменились размер и время изменения файла.
+
+        Attributes:
+            :arg path -- Путь до файла
+
+        Returns:
+            :return Хэш SHA-1 (hex)
+
+        """
+        content_hash = self.__hashes.get(path)
+        if content_hash is not None:
+            return content_hash
+        file_stat = os.stat(path)
+        row = self.__connection.execute('SELECT size, mtime_ns, content_hash FROM hashes WHERE path = ?',
+                                        (path,)).fetchone()
+        if row and row[0] == file_stat.st_size and row[1] == file_stat.st_mtime_ns:
+            content_hash = row[2]
+        else:
+            content_hash = self.content_hash(path)
+            self.__connection.execute('INSERT OR REPLACE INTO hashes (path, size, mtime_ns, content_hash) '
+                                      'VALUES (?, ?, ?, ?)',
+                                      (path, file_stat.st_size, file_stat.st_mtime_ns, content_hash))
+        self.__hashes[path] = content_hash
+        return content_hash
+
+    def get_profile(self, path):
+        """Получить сохраненный профиль лога
+
+        Attributes:
+            :arg path -- Путь до файла
+
+        Returns:
+            :return Сохраненные данные профиля или None, если записи нет или она устарела
+
+        """
+        row = self.__connection.execute('SELECT size, mtime_ns, content_hash, data FROM profiles WHERE path = ?',
+                                        (path,)).fetchone()
+        if not row:
+            return None
+        file_stat = os.stat(path)
+        if row[0] != file_stat.st_size:
+            return None
+        if row[1] != file_stat.st_mtime_ns:
+            if self.file_hash(path) != row[2]:
+                return None
+            self.__connection.execute('UPDATE profiles SET mtime_ns = ? WHERE path = ?', (file_stat.st_mtime_ns, path))
+        self.__current.add(path)
+        return pickle.loads(row[3])
+
+    def is_current(self, path):
+        """Проверка, что запись профиля файла в этом сеансе прочитана как актуальная или записана
+
+        Attributes:
+            :arg path -- Путь до файла
+
+        Returns:
+            :return True, если запись актуальна
+
+        """
+        return path in self.__current
+
+    def put_profile(self, path, data):
+        """Сохранить профиль лога
+
+        Attributes:
+            :arg path -- Путь до файла
+            :arg data -- Данные профиля (должны сериализоваться через pickle)
+
+        """
+        file_stat = os.stat(path)
+        content_hash = self.file_hash(path)
+        self.__connection.execute('INSERT OR REPLACE INTO profiles (path, size, mtime_ns, content_hash, data) '
+                                  'VALUES (?, ?, ?, ?, ?)',
+                                  (path, file_stat.st_size, file_stat.st_mtime_ns, content_hash,
+                                   pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+        self.__current.add(path)
+
+    def run_key(self, paths, params=''):
+        """Ключ результата сравнения прогона: зависит от содержимого всех файлов и параметров сравнения
+
+        Attributes:
+            :arg paths -- Список файлов прогона (логи тестов и логи устройства)
+            :arg params -- Строка параметров сравнения
+
+        Returns:
+            :return Ключ (hex)
+
+        """
+        digest = hashlib.sha1(params.encode('utf-8'))
+        for path in sorted(paths):
+            digest.update(('%s\0%s\0' % (os.path.basename(path), self.file_hash(path))).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_result(self, run_key):
+        """Получить сохраненный результат сравнения прогона
+
+        Attributes:
+            :arg run_key -- Ключ результата (run_key)
+
+        Returns:
+            :return Результат {FAIL строка: {номер кейса: результат}} или None
+
+        """
+        row = self.__connection.execute('SELECT data FROM results WHERE run_key = ?', (run_key,)).fetchone()
+        if not row:
+            return None
+        return dict((fail_line, dict((case_id, cmp_result) for case_id, cmp_result in cases))
+                    for fail_line, cases in json.loads(row[0]))
+
+    def put_result(self, run_key, result):
+        """Сохранить результат сравнения прогона
+
+        Attributes:
+            :arg run_key -- Ключ результата (run_key)
+            :arg result -- Результат {FAIL строка: {номер кейса: результат}} (порядок сохраняется)
+
+        """
+        data = json.dumps([[fail_line, list(cases.items())] for fail_line, cases in result.items()])
+        self.__connection.execute('INSERT OR REPLACE INTO results (run_key, data) VALUES (?, ?)', (run_key, data))
+
+    def commit(self):
+        """Запись изменений на диск"""
+        self.__connection.commit()
+
+    def close(self):
+        """Запись изменений и закрытие хранилища"""
+        self.__connection.commit()
+        self.__connection.close()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      stage_stats.py
+
+    @brief     Содержит накопительную статистику времени и счетчиков этапов сравнения логов
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import collections
+import contextlib
+import heapq
+import threading
+import time
+
+
+class StageStats(object):
+    """Накопительные таймеры и счетчики этапов сравнения логов
+
+    Выключенная статистика ничего не считает: timer возвращает общий пустой контекст,
+    остальные методы сразу возвращаются, поэтому замеры можно оставлять в рабочем коде.
+    Во включенной статистике, кроме времени этапов и счетчиков, хранятся самые долгие
+    сравнения пар логов (hot_pairs): их можно повторить под cProfile
+    (LogAnalyzer.profile_hot_pairs). Значения накапливаются до вызова reset.
+
+    Attributes:
+        STAGE_FILE_IO: чтение логов тестов
+        STAGE_FIND_FAIL: поиск FAIL строки и строки смены настроек
+        STAGE_TEXT_SHINGLES: отпечатки текста логов по шинглам и их сравнение
+        STAGE_DEVICE_SHINGLES: отпечатки логов устройства по шинглам и их сравнение
+        STAGE_CMP_LINES: построчное сравнение логов
+        COUNTER_PAIRS: сравнено пар логов
+        COUNTER_FAIL_REJECTED: пар, отсеянных сравнением FAIL строк
+        COUNTER_FILES_OPENED: открыто файлов (логов тестов и логов устройства)
+        COUNTER_BYTES_READ: прочитано байт файлов (у сжатого файла - сжатых байт; у лога теста, отображенного
+                            в память, - до последней просмотренной позиции)
+        HOT_PAIRS: число хранимых самых долгих сравнений по умолчанию
+        __enabled: статистика включена
+        __hot_pairs_count: число хранимых самых долгих сравнений
+        __times: время этапов {этап: с}
+        __calls: число замеров этапов {этап: число}
+        __counters: счетчики {счетчик: значение}
+        __hot_pairs: куча самых долгих сравнений [(время, путь 1, путь 2)]
+        __lock: блокировка (статистика общая для потоков cmp_logs_from_runs)
+
+    """
+
+    STAGE_FILE_IO = 'file_io'
+    STAGE_FIND_FAIL = 'find_fail_line'
+    STAGE_TEXT_SHINGLES = 'text_shingles'
+    STAGE_DEVICE_SHINGLES = 'device_shingles'
+    STAGE_CMP_LINES = 'cmp_lines'
+
+    COUNTER_PAIRS = 'pairs'
+    COUNTER_FAIL_REJECTED = 'fail_rejected'
+    COUNTER_FILES_OPENED = 'files_opened'
+    COUNTER_BYTES_READ = 'bytes_read'
+
+    HOT_PAIRS = 10
+
+    __NULL_TIMER = contextlib.nullcontext()
+
+    def __init__(self, enabled=False, hot_pairs=HOT_PAIRS):
+        """Конструктор класса
+
+        Attributes:
+            :arg enabled -- Статистика включена
+            :arg hot_pairs -- Число хранимых самых долгих сравнений пар логов
+
+        """
+        self.__enabled = enabled
+        self.__hot_pairs_count = hot_pairs
+        self.__times = collections.Counter()
+        self.__calls = collections.Counter()
+        self.__counters = collections.Counter()
+        self.__hot_pairs = list()
+        self.__lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """Статистика включена"""
+        return self.__enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self.__enabled = bool(value)
+
+    def reset(self):
+        """Сброс накопленных значений"""
+        with self.__lock:
+            self.__times.clear()
+            self.__calls.clear()
+            self.__counters.clear()
+            self.__hot_pairs = list()
+
+    def add_time(self, stage, elapsed):
+        """Учет времени этапа
+
+        Attributes:
+            :arg stage -- Этап
+            :arg elapsed -- Время, с
+
+        """
+        if not self.__enabled:
+            return
+        with self.__lock:
+            self.__times[stage] += elapsed
+            self.__calls[stage] += 1
+
+    @contextlib.contextmanager
+    def __timer(self, stage):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start_time)
+
+    def timer(self, stage):
+        """Замер времени этапа (with stats.timer(этап): ...)
+
+        Attributes:
+            :arg stage -- Этап
+
+        Returns:
+            :return Контекст замера (пустой, если статистика выключена)
+
+        """
+        if not self.__enabled:
+            return self.__NULL_TIMER
+        return self.__timer(stage)
+
+    def count(self, counter, value=1):
+        """Увеличение счетчика
+
+        Attributes:
+            :arg counter -- Счетчик
+            :arg value -- Приращение
+
+        """
+        if not self.__enabled:
+            return
+        with self.__lock:
+            self.__counters[counter] += value
+
+    def add_pair(self, elapsed, first_path, second_path):
+        """Учет времени сравнения пары логов (хранятся самые долгие)
+
+        Attributes:
+            :arg elapsed -- Время сравнения, с
+            :arg first_path -- Путь до первого лога
+            :arg second_path -- Путь до второго лога
+
+        """
+        if not self.__enabled or self.__hot_pairs_count <= 0:
+            return
+        with self.__lock:
+            item = (elapsed, first_path, second_path)
+            if len(self.__hot_pairs) < self.__hot_pairs_count:
+                heapq.heappush(self.__hot_pairs, item)
+            elif item > self.__hot_pairs[0]:
+                heapq.heapreplace(self.__hot_pairs, item)
+
+    def hot_pairs(self):
+        """Самые долгие сравнения пар логов
+
+        Returns:
+            :return Список (время, путь 1, путь 2) по убыванию времени
+
+        """
+        with self.__lock:
+            return sorted(self.__hot_pairs, reverse=True)
+
+    def to_dict(self):
+        """Накопленные значения
+
+        Returns:
+            :return Словарь: stages - {этап: {'time': с, 'calls': число}}, counters - {счетчик: значение},
+                    hot_pairs - самые долгие сравнения [(время, путь 1, путь 2)]
+
+        """
+        with self.__lock:
+            return {'stages': dict((stage, {'time': self.__times[stage], 'calls': self.__calls[stage]})
+                                   for stage in self.__times),
+                    'counters': dict(self.__counters),
+                    'hot_pairs': sorted(self.__hot_pairs, reverse=True)}
+
+    def merge(self, data):
+        """Добавление значений, накопленных в другом процессе (результат to_dict)
+
+        Attributes:
+            :arg data -- Словарь в формате to_dict
+
+        """
+        if not self.__enabled or not data:
+            return
+        with self.__lock:
+            for stage, stage_data in data['stages'].items():
+                self.__times[stage] += stage_data['time']
+                self.__calls[stage] += stage_data['calls']
+            self.__counters.update(data['counters'])
+        for item in data['hot_pairs']:
+            self.add_pair(*item)
+
+    def format_summary(self):
+        """Текстовая сводка
+
+        Returns:
+            :return Сводка: время этапов, счетчики и самые долгие сравнения
+
+        """
+        data = self.to_dict()
+        lines = [u'Статистика этапов сравнения:']
+        for stage, stage_data in sorted(data['stages'].items(), key=lambda item: -item[1]['time']):
+            lines.append(u'  %-16s %10.3f с %10d замеров' % (stage, stage_data['time'], stage_data['calls']))
+        for counter in sorted(data['counters']):
+            lines.append(u'  %-16s %10d' % (counter, data['counters'][counter]))
+        if data['hot_pairs']:
+            lines.append(u'Самые долгие сравнения пар логов:')
+        for elapsed, first_path, second_path in data['hot_pairs']:
+            lines.append(u'  %.4f с: %s, %s' % (elapsed, first_path, second_path))
+        return u'\n'.join(lines) + u'\n'
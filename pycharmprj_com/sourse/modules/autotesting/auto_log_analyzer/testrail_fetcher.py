@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      testrail_fetcher.py
+
+    @brief     Содержит параллельную загрузку результатов тестов прогона TestRail
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import base64
+import concurrent.futures
+import http.client
+import json
+import os
+import threading
+import time
+import urllib.parse
+
+
+class TestRailError(Exception):
+    """Ошибка запроса к TestRail
+
+    Attributes:
+        status: HTTP код ответа (None - ошибка соединения)
+        retry_after: значение заголовка Retry-After ответа (None - нет заголовка)
+
+    """
+
+    def __init__(self, message, status=None, retry_after=None):
+        super(TestRailError, self).__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TestRailClient(object):
+    """Клиент API TestRail (v2) с переиспользованием соединений
+
+    Каждый поток использует свое постоянное (keep-alive) соединение с сервером,
+    соединение открывается заново только после ошибки или закрытия сервером.
+    Ответы с разбиением на страницы (_links.next) собираются в один список.
+    Адрес и учетные данные по умолчанию задаются переменными окружения (from_env).
+
+    Attributes:
+        API_PATH: путь API на сервере
+        URL_ENV: переменная окружения с адресом TestRail
+        USER_ENV: переменная окружения с пользователем
+        PASSWORD_ENV: переменная окружения с паролем или ключом API
+        __scheme: схема адреса (http или https)
+        __host: сервер
+        __port: порт (None - по умолчанию для схемы)
+        __base_path: путь до TestRail на сервере
+        __headers: заголовки запросов
+        __timeout: таймаут соединения, с
+        __local: соединения потоков
+        __connections: все открытые соединения (для закрытия)
+        __lock: блокировка списка соединений
+
+    """
+
+    API_PATH = 'index.php?/api/v2/'
+
+    URL_ENV = 'TESTRAIL_URL'
+    USER_ENV = 'TESTRAIL_USER'
+    PASSWORD_ENV = 'TESTRAIL_PASSWORD'
+
+    def __init__(self, url, user=None, password=None, timeout=30.0):
+        """Конструктор класса
+
+        Attributes:
+            :arg url -- Адрес TestRail (например, https://testrail.example.com/)
+            :arg user -- Пользователь (None - без авторизации)
+            :arg password -- Пароль или ключ API
+            :arg timeout -- Таймаут соединения, с
+
+        """
+        parsed_url = urllib.parse.urlsplit(url)
+        if parsed_url.scheme not in ('http', 'https'):
+            raise ValueError(u'Неподдерживаемый адрес TestRail: %s' % url)
+        self.__scheme = parsed_url.scheme
+        self.__host = parsed_url.hostname
+        self.__port = parsed_url.port
+        self.__base_path = parsed_url.path.rstrip('/') + '/'
+        self.__headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+        if user is not None:
+            credentials = base64.b64encode(('%s:%s' % (user, password or '')).encode('utf-8'))
+            self.__headers['Authorization'] = 'Basic %s' % credentials.decode('ascii')
+        self.__timeout = timeout
+        self.__local = threading.local()
+        self.__connections = list()
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, url=None, user=None, password=None, timeout=30.0):
+        """Клиент с адресом и учетными данными из переменных окружения
+
+        Attributes:
+            :arg url -- Адрес TestRail (None - из переменной URL_ENV)
+            :arg user -- Пользователь (None - из переменной USER_ENV)
+            :arg password -- Пароль или ключ API (None - из переменной PASSWORD_ENV)
+            :arg timeout -- Таймаут соединения, с
+
+        Returns:
+            :return Клиент TestRail или None, если адрес не задан
+
+        """
+        url = url or os.environ.get(cls.URL_ENV)
+        if not url:
+            return None
+        return cls(url, user if user is not None else os.environ.get(cls.USER_ENV),
+                   password if password is not None else os.environ.get(cls.PASSWORD_ENV), timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Закрытие соединений всех потоков"""
+        with self.__lock:
+            connections, self.__connections = self.__connections, list()
+        for connection in connections:
+            connection.close()
+
+    def __get_connection(self):
+        """Получить соединение текущего потока (создается при первом обращении)"""
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None:
+            if self.__scheme == 'https':
+                connection = http.client.HTTPSConnection(self.__host, self.__port, timeout=self.__timeout)
+            else:
+                connection = http.client.HTTPConnection(self.__host, self.__port, timeout=self.__timeout)
+            self.__local.connection = connection
+            with self.__lock:
+                self.__connections.append(connection)
+        return connection
+
+    def __drop_connection(self):
+        """Закрыть соединение текущего потока после ошибки"""
+        connection = getattr(self.__local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.__local.connection = None
+            with self.__lock:
+                if connection in self.__connections:
+                    self.__connections.remove(connection)
+
+    def send_get(self, uri):
+        """GET запрос к API
+
+        Attributes:
+            :arg uri -- Метод API с параметрами (например, get_results/1)
+
+        Returns:
+            :return Декодированный ответ (JSON)
+
+        """
+        try:
+            connection = self.__get_connection()
+            connection.request('GET', self.__base_path + self.API_PATH + uri, headers=self.__headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as error:
+            self.__drop_connection()
+            raise TestRailError(u'Ошибка запроса %s: %s' % (uri, str(error)))
+        if response.will_close:
+            self.__drop_connection()
+        if response.status != 200:
+            raise TestRailError(u'Ответ %d на запрос %s: %s' % (response.status, uri, data[:200]),
+                                response.status, response.getheader('Retry-After'))
+        return json.loads(data.decode('utf-8')) if data else None
+
+    def get_list(self, uri, name):
+        """GET запрос списка с загрузкой всех страниц
+
+        Attributes:
+            :arg uri -- Метод API с параметрами
+            :arg name -- Имя списка в ответе с разбиением на страницы (results, tests)
+
+        Returns:
+            :return Список элементов
+
+        """
+        items = list()
+        while uri:
+            response = self.send_get(uri)
+            if not isinstance(response, dict):
+                # Старые версии TestRail возвращают список целиком
+                return items + list(response or ())
+            items.extend(response.get(name) or ())
+            next_uri = (response.get('_links') or dict()).get('next')
+            uri = next_uri.split('/api/v2/', 1)[-1] if next_uri else None
+        return items
+
+    def get_run(self, run_id):
+        """Получить прогон
+
+        Attributes:
+            :arg run_id -- Номер прогона
+
+        Returns:
+            :return Прогон (словарь, is_completed - прогон закрыт)
+
+        """
+        return self.send_get('get_run/%s' % str(run_id))
+
+    def get_tests(self, run_id):
+        """Получить тесты прогона
+
+        Attributes:
+            :arg run_id -- Номер прогона
+
+        Returns:
+            :return Список тестов
+
+        """
+        return self.get_list('get_tests/%s' % str(run_id), 'tests')
+
+    def get_results(self, test_id):
+        """Получить результаты теста
+
+        Attributes:
+            :arg test_id -- Номер теста
+
+        Returns:
+            :return Список результатов (последний результат первый)
+
+        """
+        return self.get_list('get_results/%s' % str(test_id), 'results')
+
+
+class TestRailFetcher(object):
+    """Параллельная загрузка результатов тестов с повторами и кэшем на диске
+
+    Результаты загружаются пулом потоков, число одновременных запросов не больше
+    workers. Ошибки соединения (TestRailError без HTTP кода, OSError) и ответы 429/5xx
+    повторяются с экспоненциальной задержкой (для 429 учитывается заголовок Retry-After).
+    Загруженные результаты сохраняются в cache_dir (results_<номер теста>.json) вместе
+    с версией теста (например, его состоянием) и при следующем запуске не запрашиваются,
+    если версия теста не изменилась. Кэш стоит включать только для закрытых прогонов:
+    результаты теста открытого прогона могут добавиться при той же версии.
+
+    Attributes:
+        CACHE_DIR_NAME: имя директории кэша в директории прогона
+        RETRY_STATUSES: HTTP коды ответа, при которых запрос повторяется
+        __get_results: функция загрузки результатов теста
+        __workers: число одновременных запросов
+        __retries: число повторов запроса
+        __backoff: начальная задержка повтора, с
+        __max_backoff: максимальная задержка повтора, с
+        __cache_dir: директория кэша (None - без кэша)
+
+    """
+
+    CACHE_DIR_NAME = '.testrail_cache'
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, get_results, workers=8, retries=3, backoff=0.5, max_backoff=30.0, cache_dir=None):
+        """Конструктор класса
+
+        Attributes:
+            :arg get_results -- Функция загрузки результатов теста по номеру (TestRailClient.get_results)
+            :arg workers -- Число одновременных запросов
+            :arg retries -- Число повторов запроса при ошибке
+            :arg backoff -- Начальная задержка повтора, с (удваивается при каждом повторе)
+            :arg max_backoff -- Максимальная задержка повтора, с
+            :arg cache_dir -- Директория кэша результатов (None - без кэша)
+
+        """
+        self.__get_results = get_results
+        self.__workers = max(1, workers)
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__max_backoff = max_backoff
+        self.__cache_dir = cache_dir
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __cache_path(self, test_id):
+        return os.path.join(self.__cache_dir, 'results_%s.json' % str(test_id))
+
+    def __read_cache(self, test_id, version):
+        """Прочитать результаты теста из кэша (None - нет в кэше, другая версия или запись повреждена)"""
+        if not self.__cache_dir:
+            return None
+        try:
+            with open(self.__cache_path(test_id), 'r', encoding='utf-8') as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != version:
+            return None
+        return data.get('results')
+
+    def __write_cache(self, test_id, version, results):
+        """Записать результаты теста в кэш (через временный файл, чтобы не оставить неполную запись)"""
+        if not self.__cache_dir:
+            return
+        path = self.__cache_path(test_id)
+        tmp_path = '%s.%d.tmp' % (path, threading.get_ident())
+        with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+            json.dump({'version': version, 'results': results}, cache_file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def __retry_delay(self, attempt, error):
+        """Задержка перед повтором запроса"""
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after:
+            try:
+                return min(float(retry_after), self.__max_backoff)
+            except ValueError:
+                pass
+        return min(self.__backoff * (2 ** attempt), self.__max_backoff)
+
+    def fetch_results(self, test_id, version=None):
+        """Загрузка результатов теста (из кэша или с повторами при ошибках)
+
+        Attributes:
+            :arg test_id -- Номер теста
+            :arg version -- Версия теста (запись кэша с другой версией не используется)
+
+        Returns:
+            :return Список результатов теста
+
+        """
+        results = self.__read_cache(test_id, version)
+        if results is not None:
+            return results
+        attempt = 0
+        while True:
+            try:
+                results = self.__get_results(test_id)
+                break
+            except (TestRailError, OSError) as error:
+                status = getattr(error, 'status', None)
+                if attempt >= self.__retries or (status is not None and status not in self.RETRY_STATUSES):
+                    raise
+                time.sleep(self.__retry_delay(attempt, error))
+                attempt += 1
+        self.__write_cache(test_id, version, results)
+        return results
+
+    def fetch_all(self, test_ids, versions=None):
+        """Параллельная загрузка результатов тестов
+
+        Attributes:
+            :arg test_ids -- Номера тестов
+            :arg versions -- Версии тестов {номер теста: версия} (None - без версий)
+
+        Returns:
+            :return Итератор пар (номер теста, список результатов) в порядке завершения загрузки
+
+        """
+        test_ids = list(test_ids)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.__workers, max(1, len(test_ids)))) as executor:
+            futures = dict((executor.submit(self.fetch_results, test_id, (versions or dict()).get(test_id)), test_id)
+                           for test_id in test_ids)
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_cmp_progress.py
+
+    @brief     Содержит тесты хода сравнения логов прогона (CmpProgress)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import threading
+from source.modules.autotesting.auto_log_analyzer.cmp_progress import CmpProgress
+
+
+def test_track_stops_after_cancelled_pair():
+    cancel = threading.Event()
+    closed = list()
+    reports = list()
+
+    def cmp_results():
+        try:
+            for index in range(10 * CmpProgress.CHUNK_PAIRS):
+                yield index
+        finally:
+            closed.append(True)
+
+    progress = CmpProgress('run', callback=lambda *args: reports.append(args), cancel=cancel)
+    received = list()
+    for cmp_result in progress.track(cmp_results()):
+        received.append(cmp_result)
+        if cmp_result == 3:
+            cancel.set()
+    assert received == [0, 1, 2, 3]
+    assert closed == [True]
+    assert progress.done == 4
+    assert reports[-1][1] == 4
+
+
+def test_track_counts_all_pairs():
+    progress = CmpProgress('run')
+    count = 3 * CmpProgress.CHUNK_PAIRS + 5
+    assert list(progress.track(iter(range(count)))) == list(range(count))
+    assert progress.done == count and not progress.cancelled
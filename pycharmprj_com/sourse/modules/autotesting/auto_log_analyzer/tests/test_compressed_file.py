@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_compressed_file.py
+
+    @brief     Содержит тесты сравнения логов прогона, сжатых gzip, bz2 и xz
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import os
+import pytest
+import source.modules.autotesting.auto_log_analyzer.compressed_file as compressed_file
+from source.modules.autotesting.auto_log_analyzer.log_analyzer import LogAnalyzer
+from source.modules.autotesting.auto_log_analyzer.log_corpus_generator import LogCorpusGenerator
+
+EXTENSIONS = ['.gz', '.bz2', '.xz']
+
+
+def compress_run(run_dir, compressed_dir, compress_dev_logs):
+    """Копия прогона со сжатыми логами тестов (и логами устройства), расширения сжатия чередуются"""
+    os.makedirs(compressed_dir)
+    for file_id, name in enumerate(sorted(os.listdir(run_dir))):
+        with open(os.path.join(run_dir, name), 'rb') as source_file:
+            data = source_file.read()
+        if name.endswith(compressed_file.LOG_EXTENSION) or compress_dev_logs:
+            extension = EXTENSIONS[file_id % len(EXTENSIONS)]
+            codec = compressed_file.COMPRESSED_EXTENSIONS[extension]
+            with codec.open(os.path.join(compressed_dir, name + extension), 'wb') as compressed:
+                compressed.write(data)
+        else:
+            with open(os.path.join(compressed_dir, name), 'wb') as copy_file:
+                copy_file.write(data)
+
+
+@pytest.mark.parametrize('compress_dev_logs', [False, True])
+def test_cmp_all_logs_on_compressed_run(tmp_path, compress_dev_logs):
+    run_dir = str(tmp_path / 'run')
+    compressed_dir = str(tmp_path / 'compressed_run')
+    LogCorpusGenerator(seed=3, families=4, noise=0.5).generate(run_dir, 18)
+    # Лог с концами строк \r\n и строкой смены настроек после FAIL строки
+    with open(os.path.join(run_dir, 'log_%d.log' % (LogCorpusGenerator.FIRST_CASE_ID + 100)), 'w', newline='') as log_file:
+        log_file.write('step :: 1\r\nstep :: 2\rLOG :: FAIL: timeout\r\nLOG_DEBUG :: %s\r\n' % LogAnalyzer.CONFIG_END_MARKER)
+    compress_run(run_dir, compressed_dir, compress_dev_logs)
+    expected = LogAnalyzer(verbose=False).cmp_all_logs(run_dir, sort_files=True)
+    analyzer = LogAnalyzer(verbose=False)
+    assert analyzer.cmp_all_logs(compressed_dir, sort_files=True) == expected
+    assert list(analyzer.cmp_all_logs(compressed_dir, sort_files=True).items()) == list(expected.items())
+    # Логи устройства (в том числе сжатые) найдены для тех же кейсов
+    dev_logs = analyzer.get_device_log_index(compressed_dir).files
+    assert sorted(dev_logs) == sorted(analyzer.get_device_log_index(run_dir).files)
+    assert all(compressed_file.is_compressed(path) == compress_dev_logs for path in dev_logs.values())
+    for name in os.listdir(compressed_dir):
+        if not compressed_file.is_log_file(name):
+            continue
+        assert compressed_file.is_compressed(name)
+        profile = analyzer.get_log_profile(compressed_dir, name)
+        plain_profile = analyzer.get_log_profile(run_dir, compressed_file.strip_extension(name))
+        assert profile.case_id == plain_profile.case_id == int(name.split('_')[1].split('.')[0])
+        assert ((profile.fail_line, profile.fail_line_no, profile.config_end, profile.lines) ==
+                (plain_profile.fail_line, plain_profile.fail_line_no, plain_profile.config_end, plain_profile.lines))
+        if profile.case_id in dev_logs:
+            assert analyzer.cmp_device_log_files(profile.path, profile.path, compressed_dir) == 1.0
+
+
+def test_compressed_file_names():
+    assert compressed_file.is_log_file('run/log_123.log.gz')
+    assert compressed_file.is_log_file('run/log_123.log.xz')
+    assert not compressed_file.is_log_file('run/parse_case_123.txt.bz2')
+    assert compressed_file.strip_extension('log_123.log.bz2') == 'log_123.log'
+    assert compressed_file.strip_extension('log_123.log') == 'log_123.log'
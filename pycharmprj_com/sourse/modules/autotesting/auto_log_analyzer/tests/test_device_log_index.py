@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_device_log_index.py
+
+    @brief     Содержит тесты индекса логов устройства по номеру кейса (DeviceLogIndex)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import os
+from source.modules.autotesting.auto_log_analyzer.device_log_index import DeviceLogIndex
+from source.modules.autotesting.auto_log_analyzer.shingles_parser import ShinglesParser
+
+
+def test_case_numbers_match_exactly(tmp_path):
+    names = ['parse_case_1204.txt', 'parse_case_12.txt', 'parse_case_120.log.gz', 'parse_showcase_7.txt',
+             'parse_testcase_8.txt', 'parse_case_9x.txt', 'case_5.txt', 'parse_run_2_case_31.txt']
+    for name in names:
+        (tmp_path / name).write_text(name)
+    dev_log_dir = str(tmp_path)
+    index = DeviceLogIndex(dev_log_dir, ShinglesParser())
+    assert index.files == {12: '%s/parse_case_12.txt' % dev_log_dir,
+                           120: '%s/parse_case_120.log.gz' % dev_log_dir,
+                           1204: '%s/parse_case_1204.txt' % dev_log_dir,
+                           9: '%s/parse_case_9x.txt' % dev_log_dir,
+                           31: '%s/parse_run_2_case_31.txt' % dev_log_dir}
+    assert index.get_path(1) is None and index.get_path(7) is None and index.get_path(8) is None
+    # Новый лог устройства добавляется при повторном просмотре
+    (tmp_path / 'parse_case_1.txt').write_text('new')
+    assert index.refresh() == 1
+    assert os.path.basename(index.get_path(1)) == 'parse_case_1.txt'
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_fail_prefilter.py
+
+    @brief     Содержит тесты предварительного отбора пар логов по FAIL строкам (FailPrefilter)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import os
+import pytest
+from source.modules.autotesting.auto_log_analyzer.fail_prefilter import FailPrefilter
+from source.modules.autotesting.auto_log_analyzer.log_analyzer import LogAnalyzer
+from source.modules.autotesting.auto_log_analyzer.log_corpus_generator import LogCorpusGenerator
+
+
+def cmp_words(first_line, second_line):
+    """Доля общих слов строк (коэффициент Жаккара)"""
+    first_words, second_words = set(first_line.split()), set(second_line.split())
+    return float(len(first_words & second_words)) / len(first_words | second_words)
+
+
+def test_normalize():
+    assert (FailPrefilter.normalize(u'FAIL: Timeout 12:30:05.123 at 2017-05-17 addr 0x1F3 id deadbeef1 code 814')
+            == u'fail: timeout <time> at <date> addr <addr> id <addr> code <num>')
+
+
+def test_candidates_and_stats():
+    prefilter = FailPrefilter(cmp_words)
+    prefilter.add('first', u'FAIL: timeout waiting for answer 814 ms from gsm_module')
+    prefilter.add('same', u'FAIL: timeout waiting for answer 6013 ms from gsm_module')
+    prefilter.add('neighbour', u'FAIL: timeout waiting for answer from gsm_module')
+    prefilter.add('distant', u'FAIL: wrong state 0x1463 of gps_receiver')
+    prefilter.add('no_fail', None)
+    assert len(prefilter) == 4
+    assert prefilter.candidates('first') == {'same', 'neighbour'}
+    assert prefilter.candidates('neighbour') == {'first', 'same'}
+    assert prefilter.candidates('distant') == set()
+    assert prefilter.candidates('no_fail') == set()
+    assert prefilter.stats() == {'keys': 4, 'buckets': 3, 'neighbour_pairs': 1, 'candidate_pairs': 3}
+
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        FailPrefilter(cmp_words, mode='unknown')
+
+
+def test_audit_reports_lost_pairs(tmp_path, monkeypatch):
+    run_dir = str(tmp_path / 'run')
+    LogCorpusGenerator(seed=2, families=3).generate(run_dir, 12)
+    expected = LogAnalyzer(verbose=False).cmp_all_logs(run_dir, sort_files=True)
+    # Грубая нормализация: каждая FAIL строка в своей группе без соседей,
+    # пары логов одного семейства с разными числами в FAIL строке отсеиваются
+    normalized = dict()
+    monkeypatch.setattr(FailPrefilter, 'normalize',
+                        classmethod(lambda cls, line: normalized.setdefault(line, u'fail_%d' % len(normalized))))
+    analyzer = LogAnalyzer(verbose=False)
+    assert analyzer.cmp_all_logs(run_dir, sort_files=True, prefilter=FailPrefilter.MODE_AUDIT) == expected
+    stats = analyzer.get_prefilter_stats()
+    assert stats['mode'] == FailPrefilter.MODE_AUDIT
+    assert stats['lost_pairs'] and stats['skipped_pairs'] >= len(stats['lost_pairs'])
+    for first_file, second_file, cmp_result in stats['lost_pairs']:
+        assert cmp_result > LogAnalyzer.SAME_LOGS_THRESHOLD
+        first_case = int(os.path.basename(first_file)[len('log_'):-len('.log')])
+        second_case = int(os.path.basename(second_file)[len('log_'):-len('.log')])
+        group = next(group for group in expected.values() if list(group)[0] == first_case)
+        assert group[second_case] == cmp_result
+    # Без режима проверки потерянные пары не попадают в результат
+    filtered = LogAnalyzer(verbose=False).cmp_all_logs(run_dir, sort_files=True, prefilter=FailPrefilter.MODE_FILTER)
+    assert filtered != expected
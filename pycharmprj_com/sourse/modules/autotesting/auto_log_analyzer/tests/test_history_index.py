@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_history_index.py
+
+    @brief     Содержит тесты индекса логов прошлых прогонов (HistoryIndex)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import os
+import shutil
+from source.modules.autotesting.auto_log_analyzer.history_index import HistoryIndex
+from source.modules.autotesting.auto_log_analyzer.log_analyzer import LogAnalyzer
+from source.modules.autotesting.auto_log_analyzer.log_corpus_generator import LogCorpusGenerator
+
+
+def test_query_uses_device_logs_of_candidate_run(tmp_path):
+    query_run = str(tmp_path / 'query_run')
+    same_run = str(tmp_path / 'same_run')
+    other_run = str(tmp_path / 'other_run')
+    LogCorpusGenerator(seed=5, families=3).generate(query_run, 6)
+    shutil.copytree(query_run, same_run)
+    shutil.copytree(query_run, other_run)
+    # Логи тестов прогонов совпадают, у логов устройства прогона other_run совпадает только начало
+    for name in os.listdir(other_run):
+        if name.startswith('parse_case_'):
+            with open(os.path.join(other_run, name)) as dev_log_file:
+                words = dev_log_file.read().split()
+            with open(os.path.join(other_run, name), 'w') as dev_log_file:
+                dev_log_file.write(' '.join(words[:len(words) // 2] + ['other_word_%d' % i for i in range(100)]))
+    analyzer = LogAnalyzer(verbose=False)
+    query_file = os.path.join(query_run, 'log_%d.log' % LogCorpusGenerator.FIRST_CASE_ID)
+    with HistoryIndex(analyzer) as index:
+        index.add_run(same_run, store=False)
+        index.add_run(other_run, store=False)
+        result = dict(index.query(query_file, k=20))
+    same_file = os.path.join(same_run, os.path.basename(query_file))
+    other_file = os.path.join(other_run, os.path.basename(query_file))
+    assert result[same_file] == 1.0
+    assert result[other_file] < result[same_file]
+    assert result[other_file] == analyzer.cmp_log_files(query_run, os.path.basename(query_file),
+                                                        other_run, os.path.basename(query_file))
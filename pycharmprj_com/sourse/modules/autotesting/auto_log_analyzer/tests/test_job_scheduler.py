@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_job_scheduler.py
+
+    @brief     Содержит тесты планировщика заданий анализа (JobScheduler)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+from source.modules.autotesting.auto_log_analyzer.job_scheduler import AnalysisJob, JobScheduler
+
+
+class ListLogger(object):
+    """Logger, сохраняющий сообщения"""
+
+    def __init__(self):
+        self.messages = list()
+
+    def info_log(self, data):
+        self.messages.append(data)
+
+
+def job_func(value, progress=None, cancel=None):
+    progress('run_%d' % value, 1, 1, 1.0)
+    return value
+
+
+def failing_callback(job):
+    raise RuntimeError('slot failed for %s' % job.name)
+
+
+def test_callback_error_does_not_stop_worker():
+    logger = ListLogger()
+    scheduler = JobScheduler(1, on_progress=failing_callback, on_finished=failing_callback, logger=logger)
+    jobs = [scheduler.submit('job_%d' % value, job_func, value) for value in range(3)]
+    assert scheduler.wait(10)
+    scheduler.shutdown()
+    assert [job.state for job in jobs] == [AnalysisJob.STATE_DONE] * 3
+    assert [job.result for job in jobs] == [0, 1, 2]
+    assert len(logger.messages) == 6 and all('slot failed' in message for message in logger.messages)
+
+
+def test_finished_jobs_history_is_limited():
+    scheduler = JobScheduler(1, history_size=2)
+    for value in range(5):
+        scheduler.submit('job_%d' % value, job_func, value).wait(10)
+    last_job = scheduler.submit('job_5', job_func, 5)
+    assert scheduler.wait(10)
+    scheduler.shutdown()
+    assert [job.name for job in scheduler.jobs()] == ['job_3', 'job_4', 'job_5']
+    assert last_job.job_id == 6
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_log_analyzer.py
+
+    @brief     Содержит тесты сравнения логов прогона (LogAnalyzer)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import pytest
+from source.modules.autotesting.auto_log_analyzer.log_analyzer import LogAnalyzer
+from source.modules.autotesting.auto_log_analyzer.log_corpus_generator import LogCorpusGenerator
+from source.modules.autotesting.auto_log_analyzer.signature_store import SignatureStore
+
+
+@pytest.fixture
+def run_dir(tmp_path):
+    run_dir = str(tmp_path / 'run')
+    LogCorpusGenerator(seed=2, families=3).generate(run_dir, 12)
+    return run_dir
+
+
+def test_stored_result_depends_on_device_logs(run_dir):
+    analyzer = LogAnalyzer(verbose=False)
+    before = analyzer.cmp_all_logs(run_dir, store=True, sort_files=True)
+    # Логи устройства всех кейсов заменяются одним текстом, логи тестов остаются прежними
+    for name in os.listdir(run_dir):
+        if name.startswith('parse_case_'):
+            with open(os.path.join(run_dir, name), 'w') as dev_log_file:
+                dev_log_file.write(' '.join('device_word_%d' % i for i in range(200)))
+    expected = LogAnalyzer(verbose=False).cmp_all_logs(run_dir, sort_files=True)
+    assert expected != before
+    assert analyzer.cmp_all_logs(run_dir, store=True, sort_files=True) == expected
+    assert LogAnalyzer(verbose=False).cmp_all_logs(run_dir, store=True, sort_files=True) == expected
+
+
+def test_stored_result_depends_on_cmp_params(run_dir):
+    analyzer = LogAnalyzer(verbose=False)
+    for params in (dict(sort_files=True), dict(sort_files=True, dedup=False), dict(sort_files=False),
+                   dict(sort_files=True, lsh=True), dict(sort_files=True, prefilter='filter')):
+        expected = LogAnalyzer(verbose=False).cmp_all_logs(run_dir, **params)
+        assert analyzer.cmp_all_logs(run_dir, store=True, **params) == expected
+        assert list(analyzer.cmp_all_logs(run_dir, store=True, **params).items()) == list(expected.items())
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_pair_records_mark_bounded_results(tmp_path, workers):
+    # Сильно зашумленные логи одного семейства: часть сравнений прерывается по порогу
+    run_dir = str(tmp_path / 'noisy_run')
+    LogCorpusGenerator(seed=2, families=3, noise=0.9).generate(run_dir, 12)
+    analyzer = LogAnalyzer(verbose=False)
+    output = str(tmp_path / 'pairs.jsonl')
+    analyzer.cmp_all_logs(run_dir, sort_files=True, dedup=False, workers=workers, output=output, output_format='jsonl')
+    with open(output) as output_file:
+        pairs = [record for record in map(json.loads, output_file) if record['type'] == 'pair']
+    bounded = [record for record in pairs if record.get('bounded')]
+    assert bounded and len(bounded) < len(pairs)
+    assert len(bounded) == analyzer.get_cmp_stats()['early_exits']
+    exact_analyzer = LogAnalyzer(verbose=False)
+    for record in pairs:
+        exact = exact_analyzer.cmp_log_files(run_dir, record['first_file'], run_dir, record['second_file'])
+        if record.get('bounded'):
+            assert 'score' not in record
+            assert exact <= record['bound'] + 1e-9 and record['bound'] <= LogAnalyzer.SAME_LOGS_THRESHOLD
+        else:
+            assert record['score'] == pytest.approx(exact)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_cmp_logs_from_runs_stats(tmp_path, workers):
+    first_run = str(tmp_path / 'first_run')
+    second_run = str(tmp_path / 'second_run')
+    LogCorpusGenerator(seed=2, families=3, noise=0.9).generate(first_run, 12)
+    LogCorpusGenerator(seed=3, families=5, noise=0.9).generate(second_run, 16)
+    expected_stats = dict()
+    expected_dicts = list()
+    for run in (first_run, second_run):
+        analyzer = LogAnalyzer(verbose=False, collect_stats=True)
+        expected_dicts.append(analyzer.cmp_all_logs(run))
+        for key, value in analyzer.get_cmp_stats().items():
+            expected_stats[key] = expected_stats.get(key, 0) + value
+    analyzer = LogAnalyzer(verbose=False, collect_stats=True)
+    result = analyzer.cmp_logs_from_runs(first_run, second_run, workers=workers)
+    assert analyzer.get_cmp_stats() == expected_stats
+    assert analyzer.stage_stats.to_dict()['counters']['pairs'] == expected_stats['pairs']
+    new_fails = set(expected_dicts[1]) - set(expected_dicts[0])
+    assert set(result) >= new_fails
+
+
+def test_store_does_not_rehash_unchanged_files(run_dir, monkeypatch):
+    expected = LogAnalyzer(verbose=False).cmp_all_logs(run_dir, store=True, sort_files=True)
+    hashed = list()
+    content_hash = SignatureStore.content_hash
+    monkeypatch.setattr(SignatureStore, 'content_hash', staticmethod(lambda path: hashed.append(path) or content_hash(path)))
+    assert LogAnalyzer(verbose=False).cmp_all_logs(run_dir, store=True, sort_files=True) == expected
+    assert hashed == []
+    # Изменился только лог устройства одного кейса: заново хэшируется только он
+    dev_log = sorted(os.path.join(run_dir, name) for name in os.listdir(run_dir) if name.startswith('parse_case_'))[0]
+    with open(dev_log, 'a') as dev_log_file:
+        dev_log_file.write(' appended_word')
+    LogAnalyzer(verbose=False).cmp_all_logs(run_dir, store=True, sort_files=True)
+    assert hashed == [dev_log]
+    with sqlite3.connect(os.path.join(run_dir, SignatureStore.STORE_NAME)) as connection:
+        assert {row[0] for row in connection.execute('SELECT typeof(data) FROM results')} == {'text'}
+
+
+def test_unavailable_store_is_skipped(run_dir):
+    expected = LogAnalyzer(verbose=False).cmp_all_logs(run_dir, sort_files=True)
+    # На месте файла хранилища директория: базу открыть нельзя
+    os.mkdir(os.path.join(run_dir, SignatureStore.STORE_NAME))
+    assert LogAnalyzer(verbose=False).cmp_all_logs(run_dir, store=True, sort_files=True) == expected
+
+
+def test_bound_skips_device_logs(tmp_path, monkeypatch):
+    run_dir = str(tmp_path / 'run')
+    LogCorpusGenerator(seed=2, families=3).generate(run_dir, 2)
+    # Одинаковая FAIL строка, остальной текст логов разный
+    for case_id, word in ((LogCorpusGenerator.FIRST_CASE_ID, 'first'), (LogCorpusGenerator.FIRST_CASE_ID + 1, 'second')):
+        with open(os.path.join(run_dir, 'log_%d.log' % case_id), 'w') as log_file:
+            log_file.write('%s\n' % LogAnalyzer.CONFIG_END_MARKER)
+            log_file.write(''.join('step %d %s_word_%d\n' % (line, word, line) for line in range(30)))
+            log_file.write('FAIL: no answer from gsm_module\n')
+    analyzer = LogAnalyzer(verbose=False)
+    first_profile, second_profile = (analyzer.get_log_profile(run_dir, 'log_%d.log' % case_id)
+                                     for case_id in (LogCorpusGenerator.FIRST_CASE_ID, LogCorpusGenerator.FIRST_CASE_ID + 1))
+    exact = analyzer.cmp_profiles(first_profile, second_profile, run_dir)
+    dev_log_calls = list()
+    monkeypatch.setattr(analyzer, 'cmp_device_log_files', lambda *args, **kwargs: dev_log_calls.append(args) or 0.0)
+    bound = analyzer.cmp_profiles(first_profile, second_profile, run_dir, cutoff=0.9)
+    assert dev_log_calls == []
+    assert exact <= bound < 0.9
+    assert analyzer.get_cmp_stats()['early_exits'] == 1
+    # Порог, который оценка до логов устройства не отсекает: логи устройства сравниваются
+    analyzer.cmp_profiles(first_profile, second_profile, run_dir, cutoff=LogAnalyzer.SAME_LOGS_THRESHOLD)
+    assert len(dev_log_calls) == 1
+
+
+@pytest.mark.parametrize('extension', ['', '.gz'])
+def test_bytes_read_counts_consumed_bytes(tmp_path, extension):
+    head = 'LOG_DEBUG :: %s\nstep :: 1\nLOG :: FAIL: timeout\n' % LogAnalyzer.CONFIG_END_MARKER
+    # Длинный несжимаемый хвост после FAIL строки не читается
+    tail = ''.join('%08x :: %s\n' % (line, os.urandom(16).hex()) for line in range(100000))
+    path = str(tmp_path / ('log_1.log' + extension))
+    with (gzip.open(path, 'wt') if extension else open(path, 'w')) as log_file:
+        log_file.write(head + tail)
+    analyzer = LogAnalyzer(verbose=False, collect_stats=True)
+    profile = analyzer.get_log_profile(None, path)
+    assert profile.fail_line == 'FAIL: timeout'
+    bytes_read = analyzer.get_stage_stats()['counters']['bytes_read']
+    assert 0 < bytes_read < os.path.getsize(path) // 10
+    if not extension:
+        assert bytes_read == len(head)
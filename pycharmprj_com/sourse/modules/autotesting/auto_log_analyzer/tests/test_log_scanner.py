@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_log_scanner.py
+
+    @brief     Содержит тесты разбора лога побайтным поиском (LogScanner) в сравнении с чтением через readlines
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import random
+import pytest
+from source.modules.autotesting.auto_log_analyzer.log_analyzer import LogAnalyzer
+from source.modules.autotesting.auto_log_analyzer.log_scanner import LogScanner
+
+pytestmark = pytest.mark.skipif(not LogScanner.is_supported(), reason=u'Кодировка по умолчанию не поддерживает побайтный поиск')
+
+
+def baseline_profile(path):
+    """Разбор лога так же, как до LogScanner: readlines, первая FAIL строка, первая строка смены настроек"""
+    with open(path, 'r') as log_file:
+        lines = log_file.readlines()
+    fail = None
+    for line_no, line in enumerate(lines):
+        fail_pos = line.find(LogAnalyzer.FAIL_MARKER)
+        if fail_pos != -1:
+            fail = (line[fail_pos:].strip('\n\r'), line_no)
+            break
+    if not fail or not fail[0]:
+        return (None, -1, 0, list())
+    config_end = 0
+    for line_id, line in enumerate(lines, 1):
+        if line.find(LogAnalyzer.CONFIG_END_MARKER) != -1:
+            config_end = line_id
+            break
+    cleared = list()
+    for line in lines[config_end:fail[1]][::-1]:
+        delimiter = line.find('::')
+        cleared.append(line[delimiter:].strip('\n\r') if delimiter != -1 else line.strip('\n\r'))
+    return (fail[0], fail[1], config_end, cleared)
+
+
+def scanned_profile(path):
+    profile = LogAnalyzer(verbose=False).get_log_profile(None, path, cache=False)
+    return (profile.fail_line, profile.fail_line_no, profile.config_end, profile.lines)
+
+
+def random_log(rnd):
+    """Текст лога со смешанными концами строк, кириллицей, метками и FAIL строкой в случайном месте"""
+    lines = list()
+    for line_no in range(rnd.randint(0, 12)):
+        lines.append(rnd.choice(['2017-05-17 15:00:%02d LOG_INFO :: step %d send' % (line_no, line_no),
+                                 u'ответ устройства %d' % line_no, '', 'x', 'value::%d' % line_no]))
+    for marker in (LogAnalyzer.FAIL_MARKER + u': нет ответа', LogAnalyzer.CONFIG_END_MARKER):
+        if rnd.random() < 0.8:
+            lines.insert(rnd.randint(0, len(lines)), 'LOG_DEBUG :: %s' % marker)
+    text = ''.join(line + rnd.choice(['\n', '\r', '\r\n']) for line in lines)
+    return text if rnd.random() < 0.7 else text.rstrip('\r\n')
+
+
+CASES = [('empty', ''),
+         ('no_fail', 'LOG_INFO :: Message code:    2\r\nstep 1\rstep 2\n'),
+         ('no_config', 'line 1\r\nline 2\rLOG :: FAIL: timeout\r\nafter\n'),
+         ('config_after_fail', 'line 1\nLOG :: FAIL: timeout\nline 3\r\nLOG_DEBUG :: Message code:    2\n'),
+         ('cr_only', 'a\rLOG_DEBUG :: Message code:    2\rb :: 1\rc\rFAIL last'),
+         ('crlf', 'a\r\nLOG_DEBUG :: Message code:    2\r\nb :: 1\r\n\r\nc\r\nFAIL: x\r\n'),
+         ('fail_first_line', 'FAIL at start\r\nLOG_DEBUG :: Message code:    2\n'),
+         ('cyrillic', u'тест :: шаг\r\nLOG_DEBUG :: Message code:    2\r\nшаг 2 :: ок\rFAIL: ошибка\n')]
+
+
+@pytest.mark.parametrize('block_size', [1, 2, 3, LogScanner.BLOCK_SIZE])
+@pytest.mark.parametrize('name, text', CASES, ids=[case[0] for case in CASES])
+def test_scanner_matches_readlines(tmp_path, monkeypatch, block_size, name, text):
+    monkeypatch.setattr(LogScanner, 'BLOCK_SIZE', block_size)
+    path = str(tmp_path / ('log_%s.log' % name))
+    with open(path, 'w', newline='') as log_file:
+        log_file.write(text)
+    assert scanned_profile(path) == baseline_profile(path)
+
+
+@pytest.mark.parametrize('block_size', [1, 2, 3, 5, LogScanner.BLOCK_SIZE])
+def test_scanner_matches_readlines_random(tmp_path, monkeypatch, block_size):
+    monkeypatch.setattr(LogScanner, 'BLOCK_SIZE', block_size)
+    rnd = random.Random(block_size)
+    for file_id in range(200):
+        path = str(tmp_path / ('log_%d.log' % file_id))
+        with open(path, 'w', newline='') as log_file:
+            log_file.write(random_log(rnd))
+        assert scanned_profile(path) == baseline_profile(path), path
+
+
+def test_find_counts_lines_across_blocks(tmp_path, monkeypatch):
+    # Конец строки \r\n разбит границей блока: строка считается один раз
+    monkeypatch.setattr(LogScanner, 'BLOCK_SIZE', 2)
+    path = str(tmp_path / 'log_1.log')
+    with open(path, 'wb') as log_file:
+        log_file.write(b'a\r\nb\r\rc\nFAIL here\r\nnext')
+    with LogScanner(path) as scanner:
+        line_no, pos, next_start = scanner.find('FAIL')
+        assert (line_no, pos, next_start) == (4, 8, 19)
+        assert scanner.line_from(pos) == 'FAIL here'
+        assert scanner.read_lines(0, scanner.line_start(pos)) == ['a\n', 'b\n', '\n', 'c\n']
+    with LogScanner(str(tmp_path / 'log_1.log')) as scanner:
+        assert scanner.find('missing') is None
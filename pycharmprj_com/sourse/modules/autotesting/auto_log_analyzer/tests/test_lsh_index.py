@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_lsh_index.py
+
+    @brief     Содержит тесты индекса LSH по MinHash сигнатурам (LshIndex)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import random
+import pytest
+from source.modules.autotesting.auto_log_analyzer.lsh_index import LshIndex
+from source.modules.autotesting.auto_log_analyzer.shingles_parser import MinHashSignature, ShinglesParser
+
+
+def make_text(seed, words=300):
+    rnd = random.Random(seed)
+    return ' '.join('word_%d_%d' % (seed, rnd.randrange(10 ** 6)) for _ in range(words))
+
+
+@pytest.fixture
+def index():
+    parser = ShinglesParser()
+    text = make_text(1)
+    # Похожий текст: заменено одно слово из трехсот
+    similar_text = text.replace(text.split()[150], 'changed_word')
+    index = LshIndex()
+    index.add('first', parser.minhash(text))
+    index.add('similar', parser.minhash(similar_text))
+    index.add('disjoint', parser.minhash(make_text(2)))
+    index.add('empty', parser.minhash(''))
+    return index
+
+
+def test_candidates(index):
+    assert index.candidates('first') == {'similar', 'empty'}
+    assert index.candidates('similar') == {'first', 'empty'}
+    assert index.candidates('disjoint') == {'empty'}
+    # Лог с пустой сигнатурой - кандидат для всех логов
+    assert index.candidates('empty') == {'first', 'similar', 'disjoint'}
+
+
+def test_stats(index):
+    assert len(index) == 4
+    assert index.stats() == {'keys': 4,
+                             'total_pairs': 6,
+                             'candidate_pairs': 4,
+                             'pruned_pairs': 2,
+                             'threshold': pytest.approx((1.0 / LshIndex.BANDS) ** (1.0 / LshIndex.ROWS))}
+
+
+def test_band_match():
+    params = (4, 0)
+    index = LshIndex(bands=2, rows=2)
+    index.add('first', MinHashSignature([1, 2, 3, 4], params))
+    # Совпадает только вторая полоса
+    index.add('second', MinHashSignature([1, 5, 3, 4], params))
+    # Совпадают значения, но не полосы целиком
+    index.add('third', MinHashSignature([1, 6, 3, 7], params))
+    assert index.candidates('first') == {'second'}
+    assert index.candidates('third') == set()
+    assert index.stats()['candidate_pairs'] == 1
+
+
+def test_invalid_params():
+    with pytest.raises(ValueError):
+        LshIndex(bands=0)
+    with pytest.raises(ValueError):
+        LshIndex(bands=4, rows=2).add('short', MinHashSignature([1, 2, 3], (3, 0)))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_numpy_line_cmp.py
+
+    @brief     Содержит тесты векторизованного сравнения слов строк (NumpyLineComparator)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import random
+import pytest
+from source.modules.autotesting.auto_log_analyzer.numpy_line_cmp import NumpyLineComparator
+from source.modules.autotesting.auto_log_analyzer.token_vocabulary import TokenVocabulary
+
+pytest.importorskip('numpy')
+
+
+def cmp_words(first_word, second_word):
+    """Сравнение слов так же, как в LogAnalyzer"""
+    max_len = max(len(first_word), len(second_word))
+    same = sum(1 for first_ch, second_ch in zip(first_word, second_word) if first_ch == second_ch)
+    return (float(same) / float(max_len), max_len - same)
+
+
+def match_python(vocabulary, first_lines, second_lines):
+    """Похожие пары слов, найденные вложенными циклами (эталон)"""
+    result = list()
+    for first_chunks, second_chunks in zip(first_lines, second_lines):
+        matches = list()
+        for first_index, (first_id, _) in enumerate(first_chunks):
+            for second_index, (second_id, _) in enumerate(second_chunks):
+                ratio, diff = vocabulary.cmp_ids(first_id, second_id)
+                if ratio > 0.75 and diff < 4:
+                    matches.append((first_index, second_index, ratio < 1.0))
+        result.append(matches)
+    return result
+
+
+def make_lines(vocabulary, rnd, lines_count, long_words=False):
+    words = ['send', 'sent', 'answer', 'answers', 'status', 'state', 'gsm_module', 'gsm_modulf', 'x']
+    if long_words:
+        words += ['a' * 3000, 'a' * 2999 + 'b', 'c' * 5000]
+    lines = list()
+    for _ in range(lines_count):
+        line = dict()
+        for _ in range(rnd.randint(0, 12)):
+            word_id = vocabulary.intern(rnd.choice(words) + rnd.choice(['', '', '1', '22']))
+            line[word_id] = line.get(word_id, 0) + 1
+        lines.append(list(line.items()))
+    return lines
+
+
+@pytest.mark.parametrize('max_batch_elements, long_words', [(NumpyLineComparator.MAX_BATCH_ELEMENTS, False),
+                                                            (NumpyLineComparator.MAX_BATCH_ELEMENTS, True),
+                                                            (2000, False),
+                                                            (2000, True),
+                                                            (1, False)])
+def test_match_lines_matches_python(monkeypatch, max_batch_elements, long_words):
+    monkeypatch.setattr(NumpyLineComparator, 'MAX_BATCH_ELEMENTS', max_batch_elements)
+    rnd = random.Random(7)
+    vocabulary = TokenVocabulary(cmp_words)
+    comparator = NumpyLineComparator(vocabulary, codes_cache_size=4)
+    first_lines = make_lines(vocabulary, rnd, 200, long_words)
+    second_lines = make_lines(vocabulary, rnd, 180, long_words)
+    assert comparator.match_lines(first_lines, second_lines) == match_python(vocabulary, first_lines, second_lines)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_online_clusterer.py
+
+    @brief     Содержит тесты пошаговой группировки логов (OnlineClusterer)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import os
+import pytest
+import source.modules.autotesting.auto_log_analyzer.compressed_file as compressed_file
+from source.modules.autotesting.auto_log_analyzer.log_analyzer import LogAnalyzer
+from source.modules.autotesting.auto_log_analyzer.log_corpus_generator import LogCorpusGenerator
+from source.modules.autotesting.auto_log_analyzer.online_clusterer import OnlineClusterer
+
+
+def log_files(run_dir):
+    return [os.path.join(run_dir, file) for file in sorted(os.listdir(run_dir))
+            if compressed_file.is_log_file(os.path.join(run_dir, file))]
+
+
+def add_all(clusterer, files):
+    for file in files:
+        assert clusterer.add(file) is not None
+
+
+@pytest.mark.parametrize('families, seed, noise', [(2, 3, None), (4, 5, 0.3), (4, 5, 0.5)])
+def test_add_matches_cmp_all_logs(tmp_path, families, seed, noise):
+    run_dir = str(tmp_path / 'run')
+    kwargs = dict(seed=seed, families=families)
+    if noise is not None:
+        kwargs['noise'] = noise
+    LogCorpusGenerator(**kwargs).generate(run_dir, 30)
+    expected = LogAnalyzer(verbose=False).cmp_all_logs(run_dir, sort_files=True)
+    clusterer = OnlineClusterer(LogAnalyzer(verbose=False))
+    add_all(clusterer, log_files(run_dir))
+    assert clusterer.result() == expected
+    assert len(clusterer) == len(log_files(run_dir))
+
+
+@pytest.mark.parametrize('seed', [2, 3, 5])
+def test_add_on_noisy_corpus_keeps_each_log_in_one_group(tmp_path, seed):
+    run_dir = str(tmp_path / 'run')
+    LogCorpusGenerator(seed=seed, families=3, noise=0.9).generate(run_dir, 30)
+    expected = LogAnalyzer(verbose=False).cmp_all_logs(run_dir, sort_files=True)
+    clusterer = OnlineClusterer(LogAnalyzer(verbose=False))
+    add_all(clusterer, log_files(run_dir))
+    result = clusterer.result()
+    # Те же группы в том же порядке; в cmp_all_logs лог может попасть в несколько групп,
+    # здесь - ровно в одну
+    assert list(result) == list(expected)
+    cases = list()
+    for key, members in result.items():
+        assert all(expected[key][case_id] == cmp_result for case_id, cmp_result in members.items())
+        cases.extend(members)
+    assert len(cases) == len(set(cases)) == len(log_files(run_dir))
+
+
+def test_save_load_mid_stream(tmp_path):
+    run_dir = str(tmp_path / 'run')
+    LogCorpusGenerator(seed=5, families=4, noise=0.3).generate(run_dir, 30)
+    files = log_files(run_dir)
+    uninterrupted = OnlineClusterer(LogAnalyzer(verbose=False))
+    add_all(uninterrupted, files)
+    state_path = str(tmp_path / 'state.pickle')
+    clusterer = OnlineClusterer(LogAnalyzer(verbose=False))
+    add_all(clusterer, files[:len(files) // 2])
+    clusterer.save(state_path)
+    restored = OnlineClusterer.load(state_path, LogAnalyzer(verbose=False))
+    assert len(restored) == len(files) // 2
+    assert restored.result() == clusterer.result()
+    assert restored.add(files[0]) is None
+    add_all(restored, files[len(files) // 2:])
+    assert restored.result() == uninterrupted.result()
+    assert restored.clusters_count == uninterrupted.clusters_count
+
+
+def test_poll_skips_temp_files(tmp_path):
+    run_dir = str(tmp_path / 'run')
+    LogCorpusGenerator(seed=3, families=2).generate(run_dir, 10)
+    files = log_files(run_dir)
+    last_file = files[-1]
+    tmp_file = '%s.tmp' % last_file
+    os.replace(last_file, tmp_file)
+    clusterer = OnlineClusterer(LogAnalyzer(verbose=False))
+    assert sorted(file for file, _, _ in clusterer.poll(run_dir)) == files[:-1]
+    assert tmp_file not in clusterer
+    # Лог дописан и перенесен на место - попадает в следующий опрос
+    os.replace(tmp_file, last_file)
+    assert [file for file, _, _ in clusterer.poll(run_dir)] == [last_file]
+    assert clusterer.poll(run_dir) == list()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_sharded_comparison.py
+
+    @brief     Содержит тесты сравнения логов прогона частями (ShardedComparison)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import pytest
+from source.modules.autotesting.auto_log_analyzer.log_analyzer import LogAnalyzer
+from source.modules.autotesting.auto_log_analyzer.log_corpus_generator import LogCorpusGenerator
+from source.modules.autotesting.auto_log_analyzer.sharded_comparison import ShardedComparison
+
+
+def run_shards(tmp_path, run_dir, shard_count):
+    """Частичные результаты всех шардов, каждый шард считается своим движком"""
+    paths = list()
+    for shard_index in range(shard_count):
+        path = str(tmp_path / ('shard_%d.json' % shard_index))
+        ShardedComparison(LogAnalyzer(verbose=False)).run_shard(run_dir, shard_index, shard_count, path)
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize('noise', [0.3, 0.9])
+@pytest.mark.parametrize('shard_count', [1, 2, 3])
+def test_merge_matches_cmp_all_logs(tmp_path, noise, shard_count):
+    run_dir = str(tmp_path / 'run')
+    LogCorpusGenerator(seed=4, families=5, noise=noise).generate(run_dir, 30)
+    expected = LogAnalyzer(verbose=False).cmp_all_logs(run_dir, sort_files=True)
+    paths = run_shards(tmp_path, run_dir, shard_count)
+    sharded = ShardedComparison(LogAnalyzer(verbose=False))
+    assert sharded.merge(run_dir, paths) == expected
+    assert sharded.get_merge_stats()['files'] == len(ShardedComparison.discover(run_dir))
+    assert sharded.merge(run_dir, list(reversed(paths))) == expected
+
+
+def test_merge_requires_all_shards(tmp_path):
+    run_dir = str(tmp_path / 'run')
+    LogCorpusGenerator(seed=4, families=5).generate(run_dir, 10)
+    paths = run_shards(tmp_path, run_dir, 3)
+    with pytest.raises(ValueError):
+        ShardedComparison(LogAnalyzer(verbose=False)).merge(run_dir, paths[:2])
+    with pytest.raises(ValueError):
+        ShardedComparison(LogAnalyzer(verbose=False)).run_shard(run_dir, 3, 3, paths[0])
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_shingles_parser.py
+
+    @brief     Содержит тесты сравнения текстов по шинглам (ShinglesParser)
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import binascii
+import os
+import pytest
+from source.modules.autotesting.auto_log_analyzer.log_corpus_generator import LogCorpusGenerator
+from source.modules.autotesting.auto_log_analyzer.shingles_parser import MinHashSignature, ShingleFingerprint, ShinglesParser
+
+
+class BaselineShingles(object):
+    """Исходный алгоритм Шинглов (CRC32 строки шингла, поиск по списку) - эталон для сравнения"""
+
+    SHINGLE_LEN = 10
+
+    STOP_SYMBOLS = '.,!?:;-\n\r()<>1234567890'
+
+    STOP_WORDS = (u'это', u'как', u'так', u'и', u'в', u'над', u'к', u'до', u'не', u'на', u'но', u'за',
+                  u'то', u'с', u'ли', u'а', u'во', u'от', u'со', u'для', u'о', u'же', u'ну', u'вы',
+                  u'бы', u'что', u'кто', u'он', u'она', u'при', u'LOG_DEBUG', u'LOG_INFO', u'LOG_TRACE')
+
+    def canonize(self, source):
+        return [x for x in [y.strip(self.STOP_SYMBOLS) for y in source.lower().split()]
+                if x and (x not in self.STOP_WORDS)]
+
+    def gen_shingle(self, source):
+        out = []
+        for i in range(len(source) - (self.SHINGLE_LEN - 1)):
+            out.append(binascii.crc32(' '.join([x for x in source[i:i + self.SHINGLE_LEN]]).encode('utf-8')))
+        return out
+
+    def compaire(self, source1, source2):
+        same = 0
+        if len(source1) < 1 or len(source2) < 1:
+            return 0.0
+        if len(source1) > len(source2):
+            source1, source2 = source2, source1
+        for i in range(len(source1)):
+            if source1[i] in source2:
+                same = same + 1
+        return same * 2 / float(len(source1) + len(source2))
+
+    def cmp_texts(self, text1, text2):
+        return self.compaire(self.gen_shingle(self.canonize(text1)), self.gen_shingle(self.canonize(text2)))
+
+
+def read_texts(run_dir):
+    """Тексты логов тестов и логов устройства прогона в порядке имен файлов"""
+    texts = list()
+    for name in sorted(os.listdir(run_dir)):
+        with open(os.path.join(run_dir, name)) as text_file:
+            texts.append(text_file.read())
+    return texts
+
+
+@pytest.fixture(scope='module')
+def corpus_texts(tmp_path_factory):
+    run_dir = str(tmp_path_factory.mktemp('corpus'))
+    LogCorpusGenerator(seed=3, families=4, noise=0.2).generate(run_dir, 12)
+    return read_texts(run_dir)
+
+
+@pytest.mark.parametrize('hash_mode', [ShinglesParser.HASH_CRC32, ShinglesParser.HASH_ROLLING])
+def test_cmp_texts_matches_baseline(corpus_texts, hash_mode):
+    parser = ShinglesParser(hash_mode=hash_mode)
+    baseline = BaselineShingles()
+    for text1 in corpus_texts:
+        for text2 in corpus_texts:
+            assert parser.cmp_texts(text1, text2) == pytest.approx(baseline.cmp_texts(text1, text2))
+
+
+def test_crc32_shingles_match_baseline(corpus_texts):
+    parser = ShinglesParser(hash_mode=ShinglesParser.HASH_CRC32)
+    baseline = BaselineShingles()
+    for text in corpus_texts:
+        expected = ShingleFingerprint(baseline.gen_shingle(baseline.canonize(text)))
+        assert parser.fingerprint(text).counts == expected.counts
+
+
+@pytest.mark.parametrize('hash_mode', [ShinglesParser.HASH_CRC32, ShinglesParser.HASH_ROLLING])
+def test_duplicate_shingles_match_baseline(hash_mode):
+    parser = ShinglesParser(hash_mode=hash_mode)
+    baseline = BaselineShingles()
+    phrase = u'send ARM addr value answer status GET_STATE read gps sensor '
+    texts = [phrase * 5,
+             phrase * 2 + u'wrong state of alarm_unit ' + phrase * 3,
+             phrase * 7 + u'test finished',
+             (phrase * 3).replace(u'gps', u'can')]
+    for text1 in texts:
+        for text2 in texts:
+            assert parser.cmp_texts(text1, text2) == pytest.approx(baseline.cmp_texts(text1, text2))
+
+
+@pytest.mark.parametrize('text1, text2', [(u'', u''),
+                                          (u'', u'send ARM addr value answer status GET_STATE read gps sensor'),
+                                          (u'short text', u'short text'),
+                                          (u'123 456 :: ()', u'123 456 :: ()')])
+def test_empty_texts(text1, text2):
+    parser = ShinglesParser()
+    assert parser.cmp_texts(text1, text2) == BaselineShingles().cmp_texts(text1, text2) == 0.0
+    assert parser.cmp_fingerprints(parser.fingerprint(text1), parser.fingerprint(text2)) == 0.0
+
+
+def set_dice(fingerprint1, fingerprint2):
+    """Коэффициент Дайса множеств шинглов (без учета повторов), который оценивает MinHash"""
+    shingles1, shingles2 = set(fingerprint1.counts), set(fingerprint2.counts)
+    if not shingles1 or not shingles2:
+        return 0.0
+    return 2.0 * len(shingles1 & shingles2) / (len(shingles1) + len(shingles2))
+
+
+@pytest.mark.parametrize('num_perm', [64, 128, 256])
+def test_minhash_within_error_bound(corpus_texts, num_perm):
+    parser = ShinglesParser(num_perm=num_perm)
+    bound = MinHashSignature.error_bound(num_perm)
+    signatures = [parser.minhash(text) for text in corpus_texts]
+    fingerprints = [parser.fingerprint(text) for text in corpus_texts]
+    for i, text1 in enumerate(corpus_texts):
+        for j, text2 in enumerate(corpus_texts):
+            exact = parser.cmp_texts(text1, text2)
+            estimate = parser.cmp_signatures(signatures[i], signatures[j])
+            # Погрешность оценки - относительно множеств шинглов, точный cmp_texts
+            # дополнительно смещен на вклад повторов шинглов
+            dice = set_dice(fingerprints[i], fingerprints[j])
+            assert abs(estimate - dice) <= bound
+            assert abs(estimate - exact) <= bound + abs(exact - dice)
+    assert parser.cmp_texts(corpus_texts[0], corpus_texts[1], ShinglesParser.MODE_MINHASH) == \
+        parser.cmp_signatures(signatures[0], signatures[1])
+
+
+def test_minhash_identical_and_empty_texts(corpus_texts):
+    parser = ShinglesParser()
+    for text in corpus_texts:
+        assert parser.cmp_signatures(parser.minhash(text), parser.minhash(text)) == 1.0
+    empty = parser.minhash(u'')
+    assert len(empty) == 0
+    assert parser.cmp_signatures(empty, parser.minhash(corpus_texts[0])) == 0.0
+    assert parser.cmp_texts(u'', corpus_texts[0], ShinglesParser.MODE_MINHASH) == 0.0
+
+
+def test_minhash_params_mismatch(corpus_texts):
+    signature1 = ShinglesParser(num_perm=64).minhash(corpus_texts[0])
+    signature2 = ShinglesParser(num_perm=128).minhash(corpus_texts[0])
+    with pytest.raises(ValueError):
+        signature1.similarity(signature2)
+
+
+def write_text(path, text):
+    with open(path, 'w') as text_file:
+        text_file.write(text)
+    return path
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64, 1000, ShinglesParser.STREAM_CHUNK_SIZE])
+def test_streaming_matches_in_memory(corpus_texts, tmp_path, chunk_size):
+    parser = ShinglesParser()
+    for i, text in enumerate(corpus_texts[:6]):
+        path = write_text(str(tmp_path / ('text_%d.txt' % i)), text)
+        assert parser.fingerprint_file(path, chunk_size).counts == parser.fingerprint(text).counts
+        assert parser.minhash_file(path, chunk_size).values == parser.minhash(text).values
+
+
+def test_streaming_chunk_boundary_inside_shingle(tmp_path):
+    parser = ShinglesParser(hash_mode=ShinglesParser.HASH_CRC32)
+    words = [u'word%s' % chr(ord('a') + i % 26) * (1 + i % 4) for i in range(60)]
+    text = u'  '.join(words) + u'\n'
+    path = write_text(str(tmp_path / 'words.txt'), text)
+    # Границы частей приходятся на середину слов, пробелы между словами и середину шингла
+    for chunk_size in range(1, 2 * len(text) // parser.shingle_len):
+        assert parser.fingerprint_file(path, chunk_size).counts == parser.fingerprint(text).counts
+        assert parser.minhash_file(path, chunk_size).values == parser.minhash(text).values
+
+
+@pytest.mark.parametrize('chunk_size', [1000, ShinglesParser.MAX_WORD_LEN, 5000, ShinglesParser.STREAM_CHUNK_SIZE])
+def test_streaming_text_without_whitespace(tmp_path, chunk_size):
+    parser = ShinglesParser(shingle_len=2)
+    max_len = ShinglesParser.MAX_WORD_LEN
+    texts = [u''.join(chr(ord('a') + i % 26) for i in range(12 * max_len + 17)),
+             u'head ' + u'x' * (3 * max_len) + u'y' * 5 + u' tail',
+             u'z' * (2 * max_len) + u' ' + u'z' * max_len]
+    for i, text in enumerate(texts):
+        path = write_text(str(tmp_path / ('dump_%d.txt' % i)), text)
+        fingerprint = parser.fingerprint(text)
+        assert len(fingerprint) > 0
+        assert parser.fingerprint_file(path, chunk_size).counts == fingerprint.counts
+        assert parser.minhash_file(path, chunk_size).values == parser.minhash(text).values
+
+
+def test_long_words_cut_by_max_word_len():
+    parser = ShinglesParser(shingle_len=1)
+    max_len = ShinglesParser.MAX_WORD_LEN
+    text = u'A' * max_len + u'B' * 10
+    assert parser.cmp_texts(text, u'a' * max_len + u' ' + u'b' * 10) == 1.0
+    assert parser.cmp_texts(u'short words only', u'SHORT words only') == 1.0
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      test_testrail_fetcher.py
+
+    @brief     Содержит тесты загрузки результатов тестов прогона TestRail на локальном сервере-заглушке
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import http.server
+import json
+import os
+import threading
+import pytest
+from source.modules.autotesting.auto_log_analyzer.log_analyzer import LogAnalyzer
+import source.modules.autotesting.auto_log_analyzer.testrail_fetcher as testrail_fetcher
+
+FAILED = 5
+PASSED = 1
+
+TESTS = [{'id': 100 + index, 'case_id': 2000 + index, 'status_id': FAILED if index % 3 else PASSED}
+         for index in range(12)]
+
+
+class StubTestRailHandler(http.server.BaseHTTPRequestHandler):
+    """Обработчик запросов API TestRail: прогон, тесты прогона двумя страницами, результаты тестов
+
+    Первые запросы результатов теста завершаются ошибками из server.failures
+    {номер теста: [HTTP код или None - разрыв соединения, ...]}.
+
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def __send(self, status, body=None, headers=()):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.client_address))
+        uri = self.path.split('/api/v2/', 1)[-1]
+        if uri.startswith('get_run/1'):
+            self.__send(200, {'id': 1, 'is_completed': self.server.run_completed})
+        elif uri.startswith('get_tests/1'):
+            offset = 6 if 'offset=6' in uri else 0
+            next_uri = '/api/v2/get_tests/1&offset=6' if offset == 0 else None
+            self.__send(200, {'tests': TESTS[offset:offset + 6], '_links': {'next': next_uri}})
+        elif uri.startswith('get_results/'):
+            test_id = int(uri.split('/')[1])
+            failures = self.server.failures.get(test_id)
+            if failures:
+                status = failures.pop(0)
+                if status is None:
+                    self.close_connection = True
+                    self.connection.shutdown(2)
+                    return
+                self.__send(status, {'error': 'stub failure'}, [('Retry-After', '0')] if status == 429 else [])
+                return
+            self.__send(200, {'results': [{'comment': ''},
+                                          {'comment': '%s %d failed: timeout\nsend status' % (self.server.comment, test_id)}],
+                              '_links': {'next': None}})
+        else:
+            self.__send(404)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    monkeypatch.setattr('source.modules.testrail_api.FAILED', FAILED, raising=False)
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubTestRailHandler)
+    server.requests = list()
+    server.failures = dict()
+    server.run_completed = True
+    server.comment = 'test'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv(testrail_fetcher.TestRailClient.URL_ENV, 'http://127.0.0.1:%d/' % server.server_address[1])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read_logs(log_files):
+    logs = dict()
+    for log_file_name in log_files:
+        with open(log_file_name, encoding='utf-8') as log_file:
+            logs[log_file_name] = log_file.read()
+    return logs
+
+
+def results_requests(server):
+    return [path for path, _ in server.requests if '/get_results/' in path]
+
+
+def test_create_logs_from_run_uses_default_client(stub_server, tmp_path):
+    on_file = list()
+    log_files = LogAnalyzer(verbose=False).create_logs_from_run(str(tmp_path), 1, workers=2, on_file=on_file.append)
+    failed_tests = [test for test in TESTS if test['status_id'] == FAILED]
+    assert sorted(log_files) == sorted(on_file) == sorted('%s/1/log_%d.log' % (str(tmp_path), test['case_id'])
+                                                          for test in failed_tests)
+    # Логи переносятся на место из временных файлов
+    assert not [file for file in os.listdir('%s/1' % str(tmp_path)) if file.endswith('.tmp')]
+    logs = read_logs(log_files)
+    for test in failed_tests:
+        assert logs['%s/1/log_%d.log' % (str(tmp_path), test['case_id'])] == 'test %d failed: timeout\nsend status' % test['id']
+    assert len(stub_server.requests) == 3 + len(failed_tests)
+    # Соединения переиспользуются: не больше одного соединения на поток загрузки и основной поток
+    assert len(set(client_address for _, client_address in stub_server.requests)) <= 3
+    # Повторная загрузка закрытого прогона берет результаты из кэша на диске
+    LogAnalyzer(verbose=False).create_logs_from_run(str(tmp_path), 1, workers=2)
+    assert len(results_requests(stub_server)) == len(failed_tests)
+
+
+def test_cache_not_used_for_open_run(stub_server, tmp_path):
+    stub_server.run_completed = False
+    LogAnalyzer(verbose=False).create_logs_from_run(str(tmp_path), 1, workers=2)
+    # Тесты открытого прогона перезапущены: логи пишутся по новым результатам
+    stub_server.comment = 'rerun'
+    log_files = LogAnalyzer(verbose=False).create_logs_from_run(str(tmp_path), 1, workers=2)
+    assert all(log.startswith('rerun ') for log in read_logs(log_files).values())
+    assert len(results_requests(stub_server)) == 2 * len(log_files)
+
+
+def test_cache_entry_without_version_ignored(stub_server, tmp_path):
+    test = TESTS[1]
+    cache_dir = tmp_path / '1' / testrail_fetcher.TestRailFetcher.CACHE_DIR_NAME
+    cache_dir.mkdir(parents=True)
+    # Запись без версии теста (список результатов) не используется
+    (cache_dir / ('results_%d.json' % test['id'])).write_text(json.dumps([{'comment': 'stale comment of old run'}]))
+    LogAnalyzer(verbose=False).create_logs_from_run(str(tmp_path), 1, workers=2)
+    with open('%s/1/log_%d.log' % (str(tmp_path), test['case_id']), encoding='utf-8') as log_file:
+        assert log_file.read() == 'test %d failed: timeout\nsend status' % test['id']
+
+
+def test_fetch_retries_failed_requests(stub_server):
+    failed_tests = [test['id'] for test in TESTS if test['status_id'] == FAILED]
+    stub_server.failures = {failed_tests[0]: [429, 429], failed_tests[1]: [503, 500], failed_tests[2]: [None]}
+    with testrail_fetcher.TestRailClient.from_env() as client:
+        fetcher = testrail_fetcher.TestRailFetcher(client.get_results, workers=2, retries=3, backoff=0.01)
+        results = dict(fetcher.fetch_all(failed_tests))
+    assert sorted(results) == sorted(failed_tests)
+    for test_id in failed_tests:
+        assert results[test_id][1]['comment'] == 'test %d failed: timeout\nsend status' % test_id
+    requests = results_requests(stub_server)
+    assert len(requests) == len(failed_tests) + 5
+    assert sum(1 for path in requests if path.endswith('/get_results/%d' % failed_tests[0])) == 3
+    assert sum(1 for path in requests if path.endswith('/get_results/%d' % failed_tests[1])) == 3
+    assert sum(1 for path in requests if path.endswith('/get_results/%d' % failed_tests[2])) == 2
+
+
+def test_fetch_gives_up(stub_server):
+    test_id = TESTS[1]['id']
+    with testrail_fetcher.TestRailClient.from_env() as client:
+        stub_server.failures = {test_id: [503, 503, 503]}
+        fetcher = testrail_fetcher.TestRailFetcher(client.get_results, retries=2, backoff=0.01)
+        with pytest.raises(testrail_fetcher.TestRailError) as error:
+            fetcher.fetch_results(test_id)
+        assert error.value.status == 503
+        # Ответы, кроме 429 и 5xx, не повторяются
+        stub_server.failures = {test_id: [403]}
+        with pytest.raises(testrail_fetcher.TestRailError) as error:
+            fetcher.fetch_results(test_id)
+        assert error.value.status == 403
+    assert len(results_requests(stub_server)) == 4
+
+
+def test_client_from_env(monkeypatch):
+    monkeypatch.delenv(testrail_fetcher.TestRailClient.URL_ENV, raising=False)
+    assert testrail_fetcher.TestRailClient.from_env() is None
+    monkeypatch.setenv(testrail_fetcher.TestRailClient.URL_ENV, 'ftp://testrail.example.com/')
+    with pytest.raises(ValueError):
+        testrail_fetcher.TestRailClient.from_env()
+    assert testrail_fetcher.TestRailClient.from_env('https://testrail.example.com/') is not None
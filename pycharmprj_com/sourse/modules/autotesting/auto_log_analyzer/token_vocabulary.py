@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+    @file      token_vocabulary.py
+
+    @brief     Содержит словарь слов логов с кэшем результатов попарного сравнения слов
+
+    @author    Пащенко Андрей <paschenko@starline.ru>
+
+"""
+
+import functools
+import threading
+
+
+class TokenVocabulary(object):
+    """Словарь слов логов: слова получают целочисленные номера, результаты сравнения пар слов кэшируются
+
+    Сравнение слов симметрично, поэтому пара (a, b) и пара (b, a) занимают одну запись кэша.
+    Одинаковые слова не сравниваются и не попадают в кэш.
+
+    Attributes:
+        CACHE_SIZE: размер кэша результатов сравнения по умолчанию
+        __cmp_words: функция сравнения двух слов
+        __lock: блокировка добавления слов
+        __ids: словарь {слово: номер}
+        __words: список слов по номерам
+        __cmp_ids: кэшированное сравнение слов по номерам
+
+    """
+
+    CACHE_SIZE = 1 << 18
+
+    def __init__(self, cmp_words, cache_size=CACHE_SIZE):
+        """Конструктор класса
+
+        Attributes:
+            :arg cmp_words -- Функция сравнения двух слов, возвращает (процент схожести, число различий)
+            :arg cache_size -- Максимальное количество пар слов в кэше
+
+        """
+        self.__cmp_words = cmp_words
+        self.__lock = threading.Lock()
+        self.__ids = dict()
+        self.__words = list()
+        self.__cmp_ids = functools.lru_cache(maxsize=cache_size)(self.__cmp_word_ids)
+
+    def __len__(self):
+        return len(self.__words)
+
+    def intern(self, word):
+        """Получить номер слова (слово добавляется в словарь, если его нет)
+
+        Attributes:
+            :arg word -- Слово
+
+        Returns:
+            :return Номер слова
+
+        """
+        word_id = self.__ids.get(word)
+        if word_id is None:
+            with self.__lock:
+                word_id = self.__ids.get(word)
+                if word_id is None:
+                    word_id = len(self.__words)
+                    self.__words.append(word)
+                    self.__ids[word] = word_id
+        return word_id
+
+    def word(self, word_id):
+        """Получить слово по номеру
+
+        Attributes:
+            :arg word_id -- Номер слова
+
+        Returns:
+            :return Слово
+
+        """
+        return self.__words[word_id]
+
+    def intern_counter(self, counter):
+        """Перевод счетчика слов в список номеров слов (порядок слов сохраняется)
+
+        Attributes:
+            :arg counter -- Счетчик слов {слово: количество}
+
+        Returns:
+            :return Список (номер слова, количество)
+
+        """
+        return [(self.intern(word), count) for word, count in counter.items()]
+
+    def __cmp_word_ids(self, first_id, second_id):
+        """Сравнение слов по номерам (без кэша)
+
+        Attributes:
+            :arg first_id -- Номер первого слова
+            :arg second_id -- Номер второго слова
+
+        Returns:
+            :return (процент схожести, число различий)
+
+        """
+        return self.__cmp_words(self.__words[first_id], self.__words[second_id])
+
+    def cmp_ids(self, first_id, second_id):
+        """Сравнение слов по номерам с использованием кэша
+
+        Attributes:
+            :arg first_id -- Номер первого слова
+            :arg second_id -- Номер второго слова
+
+        Returns:
+            :return (процент схожести, число различий)
+
+        """
+        if first_id == second_id:
+            return (1.0, 0)
+        if first_id > second_id:
+            return self.__cmp_ids(second_id, first_id)
+        return self.__cmp_ids(first_id, second_id)
+
+    def cmp_words(self, first_word, second_word):
+        """Сравнение слов с использованием кэша
+
+        Attributes:
+            :arg first_word -- Первое слово
+            :arg second_word -- Второе слово
+
+        Returns:
+            :return (процент схожести, число различий)
+
+        """
+        return self.cmp_ids(self.intern(first_word), self.intern(second_word))
+
+    def cache_info(self):
+        """Статистика кэша сравнения слов
+
+        Returns:
+            :return Статистика functools.lru_cache (hits, misses, maxsize, currsize)
+
+        """
+        return self.__cmp_ids.cache_info()
+
+    def clear(self):
+        """Очистка словаря и кэша"""
+        with self.__lock:
+            self.__cmp_ids.cache_clear()
+            self.__ids = dict()
+            self.__words = list()